@@ -1,9 +1,16 @@
-import pandas as pd
-from gurobipy import *
+from gurobipy import GRB, Model, quicksum
 import numpy as np
 import datetime
 import os
 
+from dataset import open_workbook
+from distance_store import DistanceStore, coordinates_from_frame
+from export import CapacityLayout, export_run
+from extract import SolutionLayout
+from feasibility import SheetRows, confirm_infeasible, diagnose, has_errors, print_iis, print_issues, screen_scenario
+from results_store import DEFAULT_PATH as RESULTS_DB, ResultsStore
+from scaling import Scaling, format_range
+
 # ==========================================
 # 1. DEFINE SCENARIOS
 # ==========================================
@@ -25,13 +32,56 @@ scenarios = {
     }
 }
 
+# Input workbook (or a dataset directory written by dataset.py)
+DATA_FILE = "Germany_data_v2_1512.xlsx"
+
 # Number of steps for the Pareto Curve
 NUM_STEPS = 10
 
+# Distance used for routes missing from the Transportation sheet (km)
+DEFAULT_DISTANCE_KM = 500
+
+# Road / great-circle distance ratio for routes synthesized from '14. Coordinates'
+ROAD_CIRCUITY = 1.3
+
+# Excel workbook the finished run is exported to (see export.py); None to skip
+EXPORT_FILE = "pareto_results.xlsx"
+SCALE_MODEL = True      # rescale rows, columns and objectives before solving (see scaling.py)
+
+# Meaning of each index position of the variable groups (for solution extraction)
+VARIABLE_ROLES = {
+    "X_pk": ("origin", "product"),
+    "X_pck": ("origin", "destination", "product"),
+    "Y_cok": ("origin", "destination", "product"),
+    "Y_ock": ("origin", "destination", "product"),
+    "Y_ofk": ("origin", "destination", "product"),
+    "Y_olk": ("origin", "destination", "product"),
+    "Y_fpk": ("origin", "destination", "product"),
+    "Y_flk": ("origin", "destination", "product"),
+    "S_ck": ("destination", "product"),
+    "W_o": ("origin",),
+    "W_f": ("origin",),
+    "Z_sp": ("origin", "destination"),
+}
+
+# Sheet rows each constraint family is built from (see feasibility.SheetRows)
+SHEET_ROWS = {
+    "BOM_Link": [("13. Supplier_BOM", 0, {"Supplier_ID": 0})],
+    "Demand": [("6. Demand & Returns", 0, {"Customer_Zone_ID": 0, "Module_Type_ID": 1})],
+    "Returns": [("6. Demand & Returns", 0, {"Customer_Zone_ID": 0, "Module_Type_ID": 1})],
+    "Cap_P": [("9. Capacities", 0, {"Facility_ID": 0})],
+    "Cap_O": [("9. Capacities", 0, {"Facility_ID": 0})],
+    "Cap_F": [("9. Capacities", 0, {"Facility_ID": 0})],
+}
+
 def log(msg):
     print(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {msg}")
 
-def solve_scenario_pareto(scenario_key, scenario_data):
+def solve_scenario_pareto(scenario_key, scenario_data, store, run_id):
+    """
+    Build the scenario model, trace both Pareto curves and record every
+    point (objective values and flows) in the results store under run_id.
+    """
     s_name = scenario_data["name"]
     reuse_lim = scenario_data["reuse_limit"]
     refurb_yld = scenario_data["refurb_yield"]
@@ -42,11 +92,11 @@ def solve_scenario_pareto(scenario_key, scenario_data):
     # -----------------------------------------------------
     # LOAD DATA (Standard)
     # -----------------------------------------------------
-    filename = "Germany_data_v2_1512.xlsx"
-    xls = pd.ExcelFile(filename)
+    filename = DATA_FILE
+    xls = open_workbook(filename)
     
     # Sets
-    df_sets = pd.read_excel(xls, '1. Sets')
+    df_sets = xls.parse('1. Sets')
     def get_set(df, col): return [x for x in df[col].dropna().unique()]
     
     P = get_set(df_sets, 'Plants (P)')
@@ -56,7 +106,7 @@ def solve_scenario_pareto(scenario_key, scenario_data):
     L = get_set(df_sets, 'Landfills (L)')
     S = get_set(df_sets, 'Suppliers (S)')
     
-    df_w_raw = pd.read_excel(xls, '7. Module Weights')
+    df_w_raw = xls.parse('7. Module Weights')
     K = [x for x in df_w_raw['Module_Type_ID'].dropna().unique()]
 
     # Parameters
@@ -64,42 +114,48 @@ def solve_scenario_pareto(scenario_key, scenario_data):
     if 'Prod' not in xls.sheet_names and '2. Production Costs' not in xls.sheet_names:
          possible = [s for s in xls.sheet_names if "Prod" in s]
          if possible: sheet_prod = possible[0]
-    PC = pd.read_excel(xls, sheet_prod).set_index('Plant_ID')['Production_Cost_per_KWp (PC_p)'].to_dict()
+    PC = xls.parse(sheet_prod).set_index('Plant_ID')['Production_Cost_per_KWp (PC_p)'].to_dict()
 
-    df_ops = pd.read_excel(xls, '3. Operational Costs').set_index('Facility_ID')['Cost_per_Unit (CC_o/FC_f for KWp)']
+    df_ops = xls.parse('3. Operational Costs').set_index('Facility_ID')['Cost_per_Unit (CC_o/FC_f for KWp)']
     CC = {o: df_ops.get(o, 0) for o in O}
     FC = {f: df_ops.get(f, 0) for f in F}
     DC = {l: df_ops.get(l, 0) for l in L}
 
-    df_fix = pd.read_excel(xls, '4. Fixed Costs').set_index('Facility_ID')['Fixed_Operational_Cost (Fix)']
+    df_fix = xls.parse('4. Fixed Costs').set_index('Facility_ID')['Fixed_Operational_Cost (Fix)']
     FixO = {o: df_fix.get(o, 0) for o in O}
     FixF = {f: df_fix.get(f, 0) for f in F} 
 
-    Penalty = pd.read_excel(xls, "5. Penalty Costs").set_index("Module_Type_ID")["Penalty_Cost_per_KWp (Pen_k)"].to_dict()
+    Penalty = xls.parse("5. Penalty Costs").set_index("Module_Type_ID")["Penalty_Cost_per_KWp (Pen_k)"].to_dict()
 
-    df_dem = pd.read_excel(xls, '6. Demand & Returns')
+    df_dem = xls.parse('6. Demand & Returns')
     DEM = {(r['Customer_Zone_ID'], r['Module_Type_ID']): r['Demand_KWp (DEM_ck)'] for _, r in df_dem.iterrows()}
     RET = {(r['Customer_Zone_ID'], r['Module_Type_ID']): r['Returns_KWp (RET_ck)'] for _, r in df_dem.iterrows()}
 
-    df_w = pd.read_excel(xls, '7. Module Weights')
+    df_w = xls.parse('7. Module Weights')
     omega = {r['Module_Type_ID']: float(str(r['Weight_kg_per_KWp (omega_k)']).replace(',','.')) for _, r in df_w.iterrows()}
 
-    CAP = pd.read_excel(xls, "9. Capacities").set_index("Facility_ID")["Capacity_Value_kWp"].to_dict()
+    CAP = xls.parse("9. Capacities").set_index("Facility_ID")["Capacity_Value_kWp"].to_dict()
 
-    df_rev = pd.read_excel(xls, "10. Revenues")
+    df_rev = xls.parse("10. Revenues")
     Rev_reuse  = df_rev[df_rev["Revenue_Stream"]=="Reuse"].set_index("Item_ID")["Revenue_per_Unit (Rev)_€"].to_dict()
     Rev_refurb = df_rev[df_rev["Revenue_Stream"]=="Refurbish"].set_index("Item_ID")["Revenue_per_Unit (Rev)_€"].to_dict()
 
-    df_trans = pd.read_excel(xls, "11. Transportation")
-    dist_map = {(r["Origin_ID"], r["Destination_ID"]): r["Distance_km"] for _, r in df_trans.iterrows()}
-    def DIST(a,b): return dist_map.get((a,b), 500)
+    df_trans = xls.parse("11. Transportation")
+    dist_store = DistanceStore.from_frame(df_trans, "Origin_ID", "Destination_ID", "Distance_km", default=DEFAULT_DISTANCE_KM)
+    coords = None
+    if "14. Coordinates" in xls.sheet_names:
+        coords = coordinates_from_frame(xls.parse("14. Coordinates"), "Node_ID", "Latitude", "Longitude")
+    dist_map = {}
+    for A, B in [(P, C), (C, O), (O, C), (O, F), (O, L), (F, P)]:
+        dist_map.update(dist_store.pair_map(A, B, coords, ROAD_CIRCUITY))
+    def DIST(a,b): return dist_map[a, b]
     T_cost = df_trans['Cost_per_kg_km'].iloc[0]
     T_emit = df_trans['Emission_per_kg_km'].iloc[0]
 
-    df_env = pd.read_excel(xls, "12. Environmental").set_index("Parameter_Name")["Value_kg_CO2e"]
+    df_env = xls.parse("12. Environmental").set_index("Parameter_Name")["Value_kg_CO2e"]
     E_p, E_co, E_f, E_l = df_env.get("E_p", 580), df_env.get("E_o", 0.4), df_env.get("E_f", 1.2), df_env.get("E_l", 0.3)
 
-    df_bom = pd.read_excel(xls, '13. Supplier_BOM')
+    df_bom = xls.parse('13. Supplier_BOM')
     BOM = df_bom.set_index('Supplier_ID')['Qty_per_Module'].to_dict()
     Mat_Cost = df_bom.set_index('Supplier_ID')['Cost_per_Unit'].to_dict()
     Em_Supplier = df_bom.set_index('Supplier_ID')['Emission_per_kWp'].fillna(0).to_dict()
@@ -109,6 +165,18 @@ def solve_scenario_pareto(scenario_key, scenario_data):
     # -----------------------------------------------------
     alpha = {f: refurb_yld for f in F} # Apply scenario yield to all F centers
 
+    # -----------------------------------------------------
+    # FEASIBILITY SCREENING (before building)
+    # -----------------------------------------------------
+    rows = SheetRows(xls, SHEET_ROWS)
+    issues = screen_scenario(P, O, F, L, DEM, RET, CAP, reuse_lim, alpha)
+    if issues:
+        log(f"    Feasibility screening for {s_name}:")
+        print_issues(issues, rows)
+    if has_errors(issues):
+        log(f"  [Error] Infeasible model for {s_name} (found by screening, model not built)")
+        return
+
     # -----------------------------------------------------
     # BUILD MODEL
     # -----------------------------------------------------
@@ -132,13 +200,13 @@ def solve_scenario_pareto(scenario_key, scenario_data):
 
     # Constraints
     for p in P:
-        for s in S: m.addConstr(Z_sp[s,p] == quicksum(X_pk[p,k] for k in K)*BOM[s])
+        for s in S: m.addConstr(Z_sp[s,p] == quicksum(X_pk[p,k] for k in K)*BOM[s], name=f"BOM_Link[{s},{p}]")
     for c in C:
-        for k in K: m.addConstr(quicksum(X_pck[p,c,k] for p in P) + quicksum(Y_ock[o,c,k] for o in O) + S_ck[c,k] == DEM.get((c,k),0))
+        for k in K: m.addConstr(quicksum(X_pck[p,c,k] for p in P) + quicksum(Y_ock[o,c,k] for o in O) + S_ck[c,k] == DEM.get((c,k),0), name=f"Demand[{c},{k}]")
     for c in C:
-        for k in K: m.addConstr(quicksum(Y_cok[c,o,k] for o in O) == RET.get((c,k),0))
+        for k in K: m.addConstr(quicksum(Y_cok[c,o,k] for o in O) == RET.get((c,k),0), name=f"Returns[{c},{k}]")
     for p in P:
-        for k in K: m.addConstr(X_pk[p,k] + quicksum(Y_fpk[f,p,k] for f in F) == quicksum(X_pck[p,c,k] for c in C))
+        for k in K: m.addConstr(X_pk[p,k] + quicksum(Y_fpk[f,p,k] for f in F) == quicksum(X_pck[p,c,k] for c in C), name=f"Plant_Balance[{p},{k}]")
 
     # --- SENSITIVITY CONSTRAINTS ---
     # Collection Center Balance
@@ -146,24 +214,25 @@ def solve_scenario_pareto(scenario_key, scenario_data):
         for k in K:
             In  = quicksum(Y_cok[c,o,k] for c in C)
             Out = quicksum(Y_ock[o,c,k] for c in C) + quicksum(Y_ofk[o,f,k] for f in F) + quicksum(Y_olk[o,l,k] for l in L)
-            m.addConstr(In == Out)
+            m.addConstr(In == Out, name=f"Collection_Balance[{o},{k}]")
             
             # Reuse Limit (Scenario Parameter)
-            m.addConstr(quicksum(Y_ock[o,c,k] for c in C) <= reuse_lim * In)
+            m.addConstr(quicksum(Y_ock[o,c,k] for c in C) <= reuse_lim * In, name=f"Reuse_Limit[{o},{k}]")
 
     # SCENARIO YIELD & WASTE GENERATION
     for f in F:
         for k in K:
             In_Refurb = quicksum(Y_ofk[o,f,k] for o in O)
             # Success
-            m.addConstr(quicksum(Y_fpk[f,p,k] for p in P) == alpha[f] * In_Refurb)
+            m.addConstr(quicksum(Y_fpk[f,p,k] for p in P) == alpha[f] * In_Refurb, name=f"Refurb_Yield[{f},{k}]")
             # Waste (Scenario Calculated)
-            m.addConstr(quicksum(Y_flk[f,l,k] for l in L) == (1 - alpha[f]) * In_Refurb)
+            m.addConstr(quicksum(Y_flk[f,l,k] for l in L) == (1 - alpha[f]) * In_Refurb, name=f"Refurb_Waste[{f},{k}]")
 
     # Capacities (UNIT FIXED: No Omega)
-    for p in P: m.addConstr(quicksum(X_pk[p,k] for k in K) <= CAP.get(p,1e12))
-    for o in O: m.addConstr(quicksum(Y_cok[c,o,k] for c in C for k in K) <= CAP.get(o,1e12)*W_o[o])
-    for f in F: m.addConstr(quicksum(Y_ofk[o,f,k] for o in O for k in K) <= CAP.get(f,1e12)*W_f[f])
+    cap_rows = {}
+    for p in P: cap_rows["Cap_P", p] = m.addConstr(quicksum(X_pk[p,k] for k in K) <= CAP.get(p,1e12), name=f"Cap_P[{p}]")
+    for o in O: cap_rows["Cap_O", o] = m.addConstr(quicksum(Y_cok[c,o,k] for c in C for k in K) <= CAP.get(o,1e12)*W_o[o], name=f"Cap_O[{o}]")
+    for f in F: cap_rows["Cap_F", f] = m.addConstr(quicksum(Y_ofk[o,f,k] for o in O for k in K) <= CAP.get(f,1e12)*W_f[f], name=f"Cap_F[{f}]")
 
     # Objectives
     Expr_Cost = (
@@ -211,29 +280,60 @@ def solve_scenario_pareto(scenario_key, scenario_data):
         quicksum(T_emit * DIST(f,p) * Y_fpk[f,p,k] * omega[k] for f in F for p in P for k in K)
     )
 
+    # Emissions reach the billions of kg: solve in scaled units, report in model units
+    scaling = Scaling(m) if SCALE_MODEL else None
+    if scaling:
+        Expr_Cost, Expr_Env = scaling.expr(Expr_Cost), scaling.expr(Expr_Env)
+        log(f"    Scaled: matrix range {format_range(scaling.before['matrix'])} -> {format_range(scaling.after['matrix'])}")
+
+    def minimize(expr):
+        if scaling:
+            scaling.set_objective(m, expr)
+        else:
+            m.setObjective(expr, GRB.MINIMIZE)
+
+    def limit(expr, eps):
+        return scaling.add_limit(m, expr, eps) if scaling else m.addConstr(expr <= eps)
+
     # -----------------------------------------------------
     # 1. COMPUTE EXTREMES (PAYOFF TABLE)
     # -----------------------------------------------------
     # Min Cost
-    m.setObjective(Expr_Cost, GRB.MINIMIZE)
+    minimize(Expr_Cost)
     m.optimize()
     if m.Status != GRB.OPTIMAL:
-        log(f"  [Error] Infeasible model for {s_name} (Cost Min)")
+        if confirm_infeasible(m):
+            log(f"  [Error] Infeasible model for {s_name} (Cost Min)")
+            print_iis(diagnose(m), rows)
+        else:
+            log(f"  [Error] No optimal solution for {s_name} (Cost Min, status {m.Status})")
         return
     
-    Zcost_min = m.ObjVal
+    Zcost_min = Expr_Cost.getValue()
     Zenv_at_costmin = Expr_Env.getValue()
     
     # Min Env
-    m.setObjective(Expr_Env, GRB.MINIMIZE)
+    minimize(Expr_Env)
     m.optimize()
     if m.Status != GRB.OPTIMAL:
-        log(f"  [Error] Infeasible model for {s_name} (Env Min)")
+        if confirm_infeasible(m):
+            log(f"  [Error] Infeasible model for {s_name} (Env Min)")
+            print_iis(diagnose(m), rows)
+        else:
+            log(f"  [Error] No optimal solution for {s_name} (Env Min, status {m.Status})")
         return
     
-    Zenv_min = m.ObjVal
+    Zenv_min = Expr_Env.getValue()
     Zcost_at_envmin = Expr_Cost.getValue()
     
+    # Flow-level results per Pareto point (layout and coefficients built once)
+    layout = SolutionLayout(m, {
+        "X_pk": X_pk, "X_pck": X_pck, "Y_cok": Y_cok, "Y_ock": Y_ock, "Y_ofk": Y_ofk, "Y_olk": Y_olk,
+        "Y_fpk": Y_fpk, "Y_flk": Y_flk, "S_ck": S_ck, "W_o": W_o, "W_f": W_f, "Z_sp": Z_sp,
+    }, VARIABLE_ROLES, Expr_Cost, Expr_Env)
+    capacity = CapacityLayout(m, cap_rows)
+    store.add_scenario(run_id, scenario_key, s_name, scenario_data)
+
     log(f"    Payoff Table: Cost Range=[{Zcost_min:,.0f}, {Zcost_at_envmin:,.0f}]")
     log(f"                  Env Range =[{Zenv_min:,.0f}, {Zenv_at_costmin:,.0f}]")
 
@@ -241,43 +341,43 @@ def solve_scenario_pareto(scenario_key, scenario_data):
     # 2. GENERATE CURVE A (Min Cost, Vary Env)
     # -----------------------------------------------------
     eps_env_values = np.linspace(Zenv_min, Zenv_at_costmin, NUM_STEPS)
-    results_A = []
+    n_A = 0
     
-    for eps in eps_env_values:
-        Con_eps = m.addConstr(Expr_Env <= eps)
-        m.setObjective(Expr_Cost, GRB.MINIMIZE)
+    for i, eps in enumerate(eps_env_values):
+        Con_eps = limit(Expr_Env, eps)
+        minimize(Expr_Cost)
         m.optimize()
         
         if m.Status == GRB.OPTIMAL:
-            results_A.append((eps, m.ObjVal, Expr_Env.getValue()))
+            store.add_point(run_id, scenario_key, "CostMin", i, eps, Expr_Cost.getValue(), Expr_Env.getValue(), layout.extract(m),
+                            capacity.evaluate(m))
+            n_A += 1
         m.remove(Con_eps)
         m.update()
         
-    df_A = pd.DataFrame(results_A, columns=["epsilon_env", "cost", "env"])
-    file_A = f"Pareto_{s_name}_CostMin.csv"
-    df_A.to_csv(file_A, index=False)
-    log(f"    Saved Curve A to {file_A}")
+    store.commit()
+    log(f"    Stored Curve A ({n_A} points)")
 
     # -----------------------------------------------------
     # 3. GENERATE CURVE B (Min Env, Vary Cost)
     # -----------------------------------------------------
     eps_cost_values = np.linspace(Zcost_min, Zcost_at_envmin, NUM_STEPS)
-    results_B = []
+    n_B = 0
     
-    for eps in eps_cost_values:
-        Con_eps = m.addConstr(Expr_Cost <= eps)
-        m.setObjective(Expr_Env, GRB.MINIMIZE)
+    for i, eps in enumerate(eps_cost_values):
+        Con_eps = limit(Expr_Cost, eps)
+        minimize(Expr_Env)
         m.optimize()
         
         if m.Status == GRB.OPTIMAL:
-            results_B.append((eps, Expr_Cost.getValue(), m.ObjVal))
+            store.add_point(run_id, scenario_key, "EnvMin", i, eps, Expr_Cost.getValue(), Expr_Env.getValue(), layout.extract(m),
+                            capacity.evaluate(m))
+            n_B += 1
         m.remove(Con_eps)
         m.update()
         
-    df_B = pd.DataFrame(results_B, columns=["epsilon_cost", "cost", "env"])
-    file_B = f"Pareto_{s_name}_EnvMin.csv"
-    df_B.to_csv(file_B, index=False)
-    log(f"    Saved Curve B to {file_B}")
+    store.commit()
+    log(f"    Stored Curve B ({n_B} points)")
 
 # ==========================================
 # MAIN EXECUTION LOOP
@@ -285,8 +385,15 @@ def solve_scenario_pareto(scenario_key, scenario_data):
 if __name__ == "__main__":
     print("\n=== STARTING MULTI-SCENARIO PARETO GENERATION ===\n")
     
-    for key, data in scenarios.items():
-        solve_scenario_pareto(key, data)
+    with ResultsStore(RESULTS_DB) as store:
+        run_id = store.new_run(source=DATA_FILE)
+        for key, data in scenarios.items():
+            solve_scenario_pareto(key, data, store, run_id)
+        store.commit()
+        if EXPORT_FILE:
+            export_run(EXPORT_FILE, store, run_id)
         
     print("\n=== ALL SCENARIOS COMPLETED ===")
-    print("Check your folder for the 6 CSV files.")
+    print(f"Results stored in {RESULTS_DB} (run {run_id}), flows per point under {store.flows_root}/.")
+    if EXPORT_FILE:
+        print(f"Results workbook: {EXPORT_FILE}")
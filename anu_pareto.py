@@ -1,47 +1,64 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
+import os
+
+from render import MAX_PLOT_POINTS, comparison_tasks, curve_style, downsample_frontier, pyplot, \
+    render_tasks
+from results_store import DEFAULT_PATH as RESULTS_DB, ResultsStore
 
 # ==========================================
-# 1. SETUP: INPUT FILES
+# 1. SETUP: SCENARIO STYLES
 # ==========================================
-files = {
-    "A": {
-        "name": "Scenario A: Linear (Baseline)",
-        "color": "#d62728", # Red
-        "cost_min_csv": "Pareto_Linear_Like_CostMin.csv",
-        "env_min_csv":  "Pareto_Linear_Like_EnvMin.csv"
-    },
-    "B": {
-        "name": "Scenario B: Industrial Refurb",
-        "color": "#1f77b4", # Blue
-        "cost_min_csv": "Pareto_Industrial_Refurb_CostMin.csv",
-        "env_min_csv":  "Pareto_Industrial_Refurb_EnvMin.csv"
-    },
-    "C": {
-        "name": "Scenario C: Consumer Reuse",
-        "color": "#2ca02c", # Green
-        "cost_min_csv": "Pareto_Consumer_Reuse_CostMin.csv",
-        "env_min_csv":  "Pareto_Consumer_Reuse_EnvMin.csv"
-    }
+# Display names / colours for known scenarios; any other scenario found in
+# the results store is labelled with its stored name and the next colour.
+styles = {
+    "A": {"name": "Scenario A: Linear (Baseline)", "color": "#d62728"},        # Red
+    "B": {"name": "Scenario B: Industrial Refurb", "color": "#1f77b4"},        # Blue
+    "C": {"name": "Scenario C: Consumer Reuse", "color": "#2ca02c"},           # Green
 }
+PALETTE = ["#ff7f0e", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
 
-def load_data():
-    """Reads all CSVs."""
-    data_store = {}
+def load_data(db_path=RESULTS_DB, run_id=None, scenarios=None):
+    """
+    Queries the Pareto points of one run (latest by default) from the results store.
+    Returns {scenario: {"c_min": curve A, "e_min": curve B, "meta": style}}.
+    """
     print("--- Loading Data ---")
-    for key, info in files.items():
-        try:
-            df_cost_min = pd.read_csv(info["cost_min_csv"]) # Curve A
-            df_env_min = pd.read_csv(info["env_min_csv"])   # Curve B
-            data_store[key] = {"c_min": df_cost_min, "e_min": df_env_min, "meta": info}
-            print(f"Loaded Scenario {key}")
-        except FileNotFoundError as e:
-            print(f"Error: Missing {e.filename}")
+    if not os.path.exists(db_path):
+        print(f"Error: Missing {db_path}")
+        return None
+    with ResultsStore(db_path) as store:
+        run_id = run_id or store.latest_run()
+        if run_id is None:
+            print(f"Error: No runs in {db_path}")
             return None
+        names = store.scenarios(run_id).set_index("scenario")["name"].to_dict()
+        points = store.points(run_id, scenarios=scenarios)
+    print(f"Run {run_id}: {points['scenario'].nunique()} scenarios, {len(points)} points")
+
+    data_store = {}
+    extra = 0
+    for key, df in points.groupby("scenario", sort=True):
+        if key in styles:
+            meta = styles[key]
+        else:
+            meta = {"name": f"Scenario {key}: {names.get(key, key)}", "color": PALETTE[extra % len(PALETTE)]}
+            extra += 1
+        df_cost_min = df[df["curve"] == "CostMin"].rename(columns={"epsilon": "epsilon_env"})  # Curve A
+        df_env_min = df[df["curve"] == "EnvMin"].rename(columns={"epsilon": "epsilon_cost"})   # Curve B
+        data_store[key] = {"c_min": df_cost_min, "e_min": df_env_min, "meta": meta}
     return data_store
 
+def styled_pyplot():
+    """
+    matplotlib.pyplot with the seaborn whitegrid style. Both are imported
+    here, on first plot, so loading results does not pay for them.
+    """
+    import seaborn as sns
+
+    plt = pyplot()
+    sns.set_style("whitegrid")
+    return plt
+
 def format_billions(x, pos):
     return f'{x*1e-9:.1f}B'
 
@@ -49,11 +66,12 @@ def format_billions(x, pos):
 # 2. PLOTTING FUNCTIONS
 # ==========================================
 
-def plot_perspective_env_on_x(data):
+def plot_perspective_env_on_x(data, out_file="Comparison_1_Env_on_X.png", dpi=300, max_points=MAX_PLOT_POINTS):
     """
     Research Question: "If we enforce an emission limit (X), what is the cost (Y)?"
     Data Source: Cost-Minimization Curves (Curve A)
     """
+    plt = styled_pyplot()
     plt.figure(figsize=(10, 7))
     ax = plt.gca()
     
@@ -63,12 +81,13 @@ def plot_perspective_env_on_x(data):
         df = val["c_min"] # Use Cost-Min data
         meta = val["meta"]
         
-        # Sort by Env (X-axis) to ensure clean line
-        df = df.sort_values("epsilon_env")
+        # Sort by Env (X-axis) to ensure clean line; long curves are thinned
+        x, y = downsample_frontier(df["epsilon_env"].values, df["cost"].values, max_points)
+        style = curve_style(len(x))
         
-        plt.plot(df["epsilon_env"], df["cost"], 
-                 marker='o', linewidth=2.5, markersize=6,
-                 label=meta["name"], color=meta["color"])
+        plt.plot(x, y, 
+                 marker='o' if style["marker_on"] else None, linewidth=2.5, markersize=6,
+                 label=meta["name"], color=meta["color"], rasterized=style["rasterized"])
 
     # Formatting
     ax.xaxis.set_major_formatter(plt.FuncFormatter(format_billions))
@@ -80,15 +99,18 @@ def plot_perspective_env_on_x(data):
     plt.legend(fontsize=11)
     plt.grid(True, linestyle='--', alpha=0.6)
     
-    plt.savefig("Comparison_1_Env_on_X.png", dpi=300)
-    print("Saved: Comparison_1_Env_on_X.png")
+    plt.savefig(out_file, dpi=dpi)
+    plt.close()
+    print(f"Saved: {out_file}")
+    return out_file
 
 
-def plot_perspective_cost_on_x(data):
+def plot_perspective_cost_on_x(data, out_file="Comparison_2_Cost_on_X.png", dpi=300, max_points=MAX_PLOT_POINTS):
     """
     Research Question: "If we have a budget limit (X), what is the environmental impact (Y)?"
     Data Source: Env-Minimization Curves (Curve B)
     """
+    plt = styled_pyplot()
     plt.figure(figsize=(10, 7))
     ax = plt.gca()
     
@@ -97,11 +119,12 @@ def plot_perspective_cost_on_x(data):
         meta = val["meta"]
         
         # Sort by Cost (X-axis)
-        df = df.sort_values("epsilon_cost")
+        x, y = downsample_frontier(df["epsilon_cost"].values, df["env"].values, max_points)
+        style = curve_style(len(x))
         
-        plt.plot(df["epsilon_cost"], df["env"], 
-                 marker='s', linewidth=2.5, markersize=6,
-                 label=meta["name"], color=meta["color"])
+        plt.plot(x, y, 
+                 marker='s' if style["marker_on"] else None, linewidth=2.5, markersize=6,
+                 label=meta["name"], color=meta["color"], rasterized=style["rasterized"])
 
     # Formatting
     ax.xaxis.set_major_formatter(plt.FuncFormatter(format_billions))
@@ -113,16 +136,16 @@ def plot_perspective_cost_on_x(data):
     plt.legend(fontsize=11)
     plt.grid(True, linestyle='--', alpha=0.6)
     
-    plt.savefig("Comparison_2_Cost_on_X.png", dpi=300)
-    print("Saved: Comparison_2_Cost_on_X.png")
+    plt.savefig(out_file, dpi=dpi)
+    plt.close()
+    print(f"Saved: {out_file}")
+    return out_file
 
 if __name__ == "__main__":
-    sns.set_style("whitegrid")
     data = load_data()
     
     if data:
         # Plot 1: X = Env (Constraint), Y = Cost (Result)
-        plot_perspective_env_on_x(data)
-        
         # Plot 2: X = Cost (Constraint), Y = Env (Result)
-        plot_perspective_cost_on_x(data)
+        # Both are drawn in parallel worker processes
+        render_tasks(comparison_tasks(data))
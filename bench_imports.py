@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+
+# ============================================================================
+# IMPORT-TIME BENCHMARK
+# ============================================================================
+# Imports each entry point in a fresh interpreter under `python -X importtime`
+# and reports its cumulative import time plus any heavy module that was
+# pulled in at import. Plotting and spreadsheet-writing libraries must only
+# load when a figure or workbook is actually produced, so their presence is
+# a failure (exit code 1).
+#
+#   python bench_imports.py
+#   python bench_imports.py integrate render --repeat 5 --budget-ms 800
+
+ENTRY_POINTS = [
+    'integrate', 'model_anu', 'anu_combine_model', 'anu_pareto', 'render',
+    'curve', 'pareto_curve', 'excelfile', 'dataset', 'distance_store',
+    'extract', 'results_store', 'evaluate', 'sensitivity', 'whatif', 'montecarlo',
+    'stochastic', 'multiperiod', 'cuts', 'export', 'feasibility', 'reduction',
+    'scaling', 'tuning',
+]
+LAZY_MODULES = ('matplotlib', 'seaborn', 'openpyxl', 'odf')
+REPORTED_MODULES = ('numpy', 'pandas', 'pyarrow', 'gurobipy') + LAZY_MODULES
+
+
+def import_profile(module, cwd=None):
+    """
+    Import `module` in a fresh interpreter.
+    Returns {top-level module name: cumulative microseconds} for every
+    module imported, including `module` itself.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=cwd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        times[name] = max(times.get(name, 0), int(cumulative))
+    return times
+
+
+def benchmark(modules, repeat=3, cwd=None):
+    """
+    Best-of-`repeat` cumulative import time (ms) per module, and the lazy
+    modules each one loaded. Returns a list of (module, ms, loaded, breakdown).
+    """
+    rows = []
+    for module in modules:
+        runs = [import_profile(module, cwd) for _ in range(repeat)]
+        best = min(runs, key=lambda t: t.get(module, 0))
+        loaded = [lib for lib in LAZY_MODULES if lib in best]
+        breakdown = {lib: best[lib] / 1000 for lib in REPORTED_MODULES if lib in best}
+        rows.append((module, best.get(module, 0) / 1000, loaded, breakdown))
+    return rows
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure import time of the entry points.")
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--repeat', type=int, default=3, help="runs per module (best is kept)")
+    parser.add_argument('--budget-ms', type=float, help="fail if any import takes longer")
+    args = parser.parse_args(argv)
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    failed = False
+    print(f"{'module':<20}{'import ms':>10}  heavy imports (cumulative ms)")
+    for module, ms, loaded, breakdown in benchmark(args.modules, args.repeat, cwd):
+        detail = ', '.join(f'{lib} {t:.0f}' for lib, t in breakdown.items())
+        flags = []
+        if loaded:
+            flags.append(f"eagerly loads {', '.join(loaded)}")
+        if args.budget_ms is not None and ms > args.budget_ms:
+            flags.append(f"over budget ({args.budget_ms:.0f} ms)")
+        failed |= bool(flags)
+        print(f"{module:<20}{ms:>10.0f}  {detail}" + (f"  ✗ {'; '.join(flags)}" if flags else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,465 @@
+import json
+import os
+import re
+import sys
+import zipfile
+from xml.etree import ElementTree
+
+import pandas as pd
+
+# ============================================================================
+# COLUMNAR DATASET FORMAT
+# ============================================================================
+# A converted workbook is a directory holding one Arrow IPC (or Parquet) file
+# per sheet plus a manifest.json. The manifest records, for every sheet, the
+# header row that was detected, the rows above it (titles / instructions) and
+# the stored column names, so any loader can ask for the sheet with the same
+# `header=` offset it would pass to pd.read_excel.
+#
+#   python dataset.py supply_chain_data.xlsx
+#   python dataset.py supply_chain_table_2.ods -o data/sc2.dataset --format parquet
+#
+# Arrow files are written uncompressed so they can be memory-mapped.
+#
+# .ods workbooks are read by OdsWorkbook: one streaming pass over the
+# document's content.xml for all sheets, instead of odfpy building the whole
+# document tree. open_workbook(path, cache=True) keeps a converted copy next
+# to the workbook and reads that while the workbook is unchanged.
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+HEADER_SCAN_ROWS = 20
+FILE_EXTENSIONS = {'arrow': '.arrow', 'parquet': '.parquet'}
+
+
+def is_dataset(path):
+    """Return True if `path` is a converted dataset directory."""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST_NAME))
+
+
+def default_dataset_path(source):
+    """Directory a workbook is converted into when no output is given."""
+    stem, _ = os.path.splitext(source)
+    return stem + '.dataset'
+
+
+def open_workbook(path, engine=None, cache=False):
+    """
+    Open an .xlsx/.ods workbook or a converted dataset directory.
+    All returned objects expose `sheet_names` and `parse(sheet_name, header=0)`,
+    so loaders do not need to know which one they got.
+    .ods files are read with OdsWorkbook unless another `engine` is given.
+    With `cache` (True, or the dataset directory to use) the workbook is read
+    through a columnar copy that is rebuilt whenever the workbook changes.
+    """
+    if is_dataset(path):
+        return ColumnarWorkbook(path)
+    if cache:
+        return ColumnarWorkbook(cached_dataset(path, None if cache is True else cache, engine=engine))
+    if engine in (None, 'odf') and str(path).lower().endswith('.ods'):
+        return OdsWorkbook(path)
+    return pd.ExcelFile(path, engine=engine)
+
+
+def cached_dataset(source, out_dir=None, engine=None):
+    """
+    Dataset directory holding a converted copy of `source`; it is
+    (re)converted when missing or when the workbook's size or mtime changed.
+    """
+    out_dir = out_dir or default_dataset_path(source)
+    if is_dataset(out_dir):
+        with open(os.path.join(out_dir, MANIFEST_NAME), encoding='utf-8') as fh:
+            manifest = json.load(fh)
+        stat = os.stat(source)
+        if (manifest.get('version') == FORMAT_VERSION and manifest.get('source_size') == stat.st_size
+                and manifest.get('source_mtime') == stat.st_mtime):
+            return out_dir
+    return convert_workbook(source, out_dir, engine=engine)
+
+
+def read_sheet(path, sheet_name, header=0, engine=None):
+    """Read a single sheet from a workbook or dataset directory."""
+    return open_workbook(path, engine=engine).parse(sheet_name, header=header)
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+class ColumnarWorkbook:
+    """
+    Read-only view over a converted dataset directory.
+    Mirrors the subset of pd.ExcelFile used by the loaders.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_NAME), encoding='utf-8') as fh:
+            self.manifest = json.load(fh)
+        if self.manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported dataset version {self.manifest.get('version')}")
+        self.format = self.manifest['format']
+        self._sheets = {s['name']: s for s in self.manifest['sheets']}
+        self.sheet_names = [s['name'] for s in self.manifest['sheets']]
+
+    def _entry(self, sheet_name):
+        if isinstance(sheet_name, int):
+            sheet_name = self.sheet_names[sheet_name]
+        if sheet_name not in self._sheets:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found in {self.path}")
+        return self._sheets[sheet_name]
+
+    def header_row(self, sheet_name):
+        """Header row the sheet was stored with."""
+        return self._entry(sheet_name)['header']
+
+    def table(self, sheet_name):
+        """
+        Return the stored sheet as a pyarrow.Table.
+        Arrow files are memory-mapped, so large sheets are not copied into RAM.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        entry = self._entry(sheet_name)
+        file_path = os.path.join(self.path, entry['file'])
+        if self.format == 'arrow':
+            return pa.ipc.open_file(pa.memory_map(file_path, 'r')).read_all()
+        return pq.read_table(file_path, memory_map=True)
+
+    def parse(self, sheet_name=0, header=0):
+        """
+        Return a sheet as a DataFrame, like pd.ExcelFile.parse.
+        When `header` matches the stored header row the typed columns are
+        returned directly; any other offset is rebuilt from the raw rows.
+        """
+        entry = self._entry(sheet_name)
+        df = self.table(entry['name']).to_pandas()
+        df.columns = entry['columns']
+        for col in entry['mixed']:
+            df[col] = _restore_mixed(df[col])
+        if header == entry['header']:
+            return df
+        return _apply_header(self._raw_grid(entry, df), header)
+
+    def _raw_grid(self, entry, df):
+        rows = [list(r) for r in entry['preamble']]
+        rows.append(list(entry['header_values']))
+        width = max([len(df.columns)] + [len(r) for r in rows])
+        rows = [r + [None] * (width - len(r)) for r in rows]
+        body = df.astype(object).where(df.notna(), None).values.tolist()
+        body = [r + [None] * (width - len(r)) for r in body]
+        grid = [[float('nan') if v is None else v for v in row] for row in rows + body]
+        return pd.DataFrame(grid, dtype=object)
+
+
+# ============================================================================
+# STREAMING ODS READER
+# ============================================================================
+
+_TABLE = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+_OFFICE = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+_TEXT = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+_ODS_EMPTY = ''     # empty cell marker, as in pandas' own excel readers
+
+
+def _ods_string(elem):
+    """Text of a cell or paragraph: text:s runs expanded, annotations skipped."""
+    parts = [(elem.text or '').strip('\n')]
+    for child in elem:
+        if child.tag == _TEXT + 's':
+            parts.append(' ' * int(child.get(_TEXT + 'c', 1)))
+        elif child.tag != _OFFICE + 'annotation':
+            parts.append(_ods_string(child))
+        parts.append((child.tail or '').strip('\n'))
+    return ''.join(parts)
+
+
+def _ods_value(cell):
+    """Cell value with the conversions of pandas' odf reader."""
+    if cell.tag != _TABLE + 'table-cell':
+        return _ODS_EMPTY
+    text = _ods_string(cell)
+    if text == '#N/A':
+        return float('nan')
+    kind = cell.get(_OFFICE + 'value-type')
+    if kind is None:
+        return _ODS_EMPTY
+    if kind == 'boolean':
+        return text == 'TRUE'
+    if kind == 'float':
+        value = float(cell.get(_OFFICE + 'value'))
+        return int(value) if int(value) == value else value
+    if kind in ('percentage', 'currency'):
+        return float(cell.get(_OFFICE + 'value'))
+    if kind == 'string':
+        return text
+    if kind == 'date':
+        return pd.Timestamp(cell.get(_OFFICE + 'date-value'))
+    if kind == 'time':
+        return pd.Timestamp(text).time()
+    raise ValueError(f"Unrecognized type {kind}")
+
+
+def read_ods_grids(path):
+    """
+    Parse every sheet of an .ods file in one streaming pass over content.xml.
+    Returns {sheet name: rows} with rows as lists, padded to the sheet's width;
+    repeated rows / cells are expanded and trailing empties dropped, so the
+    grids match what pandas' odf reader builds. Parsed rows are freed as the
+    pass goes, so memory holds the values, not the XML tree.
+    """
+    grids = {}
+    stack = []
+    with zipfile.ZipFile(path) as archive, archive.open('content.xml') as content:
+        for event, elem in ElementTree.iterparse(content, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem)
+                if elem.tag == _TABLE + 'table':
+                    table, empty_rows, width = [], 0, 0
+                continue
+            stack.pop()
+            tag = elem.tag
+            if tag == _TABLE + 'table-row':
+                row, empty_cells = [], 0
+                for cell in elem:
+                    if cell.tag not in (_TABLE + 'table-cell', _TABLE + 'covered-table-cell'):
+                        continue
+                    value = _ods_value(cell)
+                    repeat = int(cell.get(_TABLE + 'number-columns-repeated', 1))
+                    if isinstance(value, str) and value == _ODS_EMPTY:
+                        empty_cells += repeat
+                    else:
+                        row.extend([_ODS_EMPTY] * empty_cells)
+                        empty_cells = 0
+                        row.extend([value] * repeat)
+                width = max(width, len(row))
+                repeat = int(elem.get(_TABLE + 'number-rows-repeated', 1))
+                if row:
+                    table.extend([_ODS_EMPTY] for _ in range(empty_rows))
+                    empty_rows = 0
+                    table.extend(list(row) for _ in range(repeat))
+                else:
+                    empty_rows += repeat
+                stack[-1].remove(elem)
+            elif tag == _TABLE + 'table':
+                for row in table:
+                    row.extend([_ODS_EMPTY] * (width - len(row)))
+                grids[elem.get(_TABLE + 'name')] = table
+                elem.clear()
+    return grids
+
+
+class OdsWorkbook:
+    """
+    .ods workbook with all sheets parsed up front by read_ods_grids.
+    parse() returns the same frames as pd.ExcelFile(path, engine='odf').parse.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._grids = read_ods_grids(path)
+        self.sheet_names = list(self._grids)
+
+    def parse(self, sheet_name=0, header=0):
+        """Return a sheet as a DataFrame, like pd.ExcelFile.parse."""
+        from pandas.io.parsers import TextParser
+
+        if isinstance(sheet_name, int):
+            sheet_name = self.sheet_names[sheet_name]
+        if sheet_name not in self._grids:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        grid = [list(row) for row in self._grids[sheet_name]]
+        if not grid:
+            return pd.DataFrame()
+        try:
+            return TextParser(grid, header=header, skip_blank_lines=False).read()
+        except Exception as err:
+            err.args = (f"{err.args[0]} (sheet: {sheet_name})", *err.args[1:])
+            raise
+
+
+def _restore_mixed(series):
+    """Turn numeric strings of a mixed-type column back into numbers."""
+    def convert(value):
+        if not isinstance(value, str):
+            return value
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return series.astype(object).map(convert)
+
+
+# ============================================================================
+# HEADER HANDLING
+# ============================================================================
+
+def detect_header_row(raw):
+    """
+    Guess the header row of a raw (header=None) sheet: the first row within
+    HEADER_SCAN_ROWS that is as wide as the widest row in that window.
+    """
+    head = raw.head(HEADER_SCAN_ROWS)
+    if head.empty:
+        return 0
+    widths = head.notna().sum(axis=1).tolist()
+    return widths.index(max(widths))
+
+
+def _column_names(values):
+    """Column names the way pandas builds them from a header row."""
+    names = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = f'Unnamed: {i}' if value is None or (isinstance(value, float) and pd.isna(value)) else value
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _apply_header(raw, header):
+    """Apply a header offset to a raw grid and infer column types."""
+    if header is None:
+        return raw.infer_objects()
+    df = raw.iloc[header + 1:].reset_index(drop=True)
+    df.columns = _column_names(raw.iloc[header].tolist())
+    return df.infer_objects()
+
+
+def _to_json_value(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def _typed_frame(raw, header):
+    """
+    Split a raw sheet at its header row into a typed DataFrame.
+    Returns the frame plus the names of columns that mix numbers and text;
+    those are stored as text and restored on read.
+    """
+    body = raw.iloc[header + 1:].reset_index(drop=True)
+    names = _column_names(raw.iloc[header].tolist()) if len(raw) else []
+    columns = {}
+    mixed = []
+    for pos, name in enumerate(names):
+        col = body.iloc[:, pos]
+        kind = pd.api.types.infer_dtype(col, skipna=True)
+        if kind in ('integer', 'floating', 'mixed-integer-float', 'decimal'):
+            col = pd.to_numeric(col)
+        elif kind == 'empty':
+            col = pd.Series([float('nan')] * len(col), dtype='float64')
+        elif kind in ('boolean', 'datetime', 'datetime64', 'date'):
+            col = col.infer_objects()
+        elif kind != 'string':
+            col = col.map(lambda v: None if v is None or (isinstance(v, float) and pd.isna(v)) else str(v))
+            mixed.append(name)
+        columns[str(name)] = col.reset_index(drop=True)
+    return pd.DataFrame(columns), names, mixed
+
+
+# ============================================================================
+# CONVERTER
+# ============================================================================
+
+def _sheet_file_name(index, name, fmt):
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '_', str(name)).strip('_') or 'sheet'
+    return f'{index:02d}_{slug}{FILE_EXTENSIONS[fmt]}'
+
+
+def convert_workbook(source, out_dir=None, fmt='arrow', headers=None, engine=None):
+    """
+    Convert an .xlsx/.ods workbook into a columnar dataset directory.
+    The workbook is parsed once; every sheet is written as its own file.
+    `headers` optionally maps sheet name -> header row, overriding detection.
+    Returns the dataset directory.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    if fmt not in FILE_EXTENSIONS:
+        raise ValueError(f"Unknown dataset format '{fmt}' (use 'arrow' or 'parquet')")
+    headers = headers or {}
+    out_dir = out_dir or default_dataset_path(source)
+    os.makedirs(out_dir, exist_ok=True)
+
+    xls = open_workbook(source, engine=engine)
+    sheets = []
+    for index, name in enumerate(xls.sheet_names):
+        raw = xls.parse(name, header=None)
+        raw = raw.astype(object).where(raw.notna(), None)
+        header = headers.get(name, detect_header_row(raw))
+        df, names, mixed = _typed_frame(raw, header)
+
+        file_name = _sheet_file_name(index, name, fmt)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if fmt == 'arrow':
+            feather.write_feather(table, os.path.join(out_dir, file_name), compression='uncompressed')
+        else:
+            pq.write_table(table, os.path.join(out_dir, file_name))
+
+        sheets.append({
+            'name': name,
+            'file': file_name,
+            'header': header,
+            'columns': [_to_json_value(n) for n in names],
+            'header_values': [_to_json_value(v) for v in raw.iloc[header].tolist()] if len(raw) else [],
+            'preamble': [[_to_json_value(v) for v in row] for row in raw.iloc[:header].values.tolist()],
+            'mixed': [_to_json_value(n) for n in mixed],
+            'rows': len(df),
+        })
+
+    stat = os.stat(source)
+    manifest = {
+        'version': FORMAT_VERSION,
+        'format': fmt,
+        'source': os.path.basename(source),
+        'source_size': stat.st_size,
+        'source_mtime': stat.st_mtime,
+        'sheets': sheets,
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=2, ensure_ascii=False)
+    return out_dir
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert .xlsx/.ods workbooks into columnar datasets.")
+    parser.add_argument('sources', nargs='+', help="workbooks to convert")
+    parser.add_argument('-o', '--output', help="output directory (only with a single source)")
+    parser.add_argument('--format', choices=sorted(FILE_EXTENSIONS), default='arrow',
+                        help="per-sheet file format (arrow files can be memory-mapped)")
+    parser.add_argument('--header', action='append', default=[], metavar='SHEET=ROW',
+                        help="header row for a sheet, overriding auto-detection")
+    args = parser.parse_args(argv)
+
+    if args.output and len(args.sources) > 1:
+        parser.error("--output can only be used with a single source")
+    headers = {}
+    for item in args.header:
+        sheet, _, row = item.rpartition('=')
+        if not sheet or not row.isdigit():
+            parser.error(f"invalid --header '{item}' (expected SHEET=ROW)")
+        headers[sheet] = int(row)
+
+    for source in args.sources:
+        out_dir = convert_workbook(source, args.output, fmt=args.format, headers=headers)
+        book = ColumnarWorkbook(out_dir)
+        print(f"✓ {source} → {out_dir} ({len(book.sheet_names)} sheets, {book.format})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
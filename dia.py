@@ -1,18 +1,23 @@
 # paste into your script or run in a Python REPL in the same environment
-import pandas as pd
 from pprint import pprint
-EXCEL_PATH = "supply_chain_table_2.ods"
-
-# load sheets (engine odf)
-bS_df = pd.read_excel(EXCEL_PATH, sheet_name="bS_supply_capacity", engine='odf')
-bMH_df = pd.read_excel(EXCEL_PATH, sheet_name="bMH_facility_capacity", engine='odf')
-demand_df = pd.read_excel(EXCEL_PATH, sheet_name="demand", engine='odf')
-bom_df = pd.read_excel(EXCEL_PATH, sheet_name="BOM", engine='odf')
-r_df = pd.read_excel(EXCEL_PATH, sheet_name="r", engine='odf')
-transport_df = pd.read_excel(EXCEL_PATH, sheet_name="transport_cost", engine='odf')
-proc_df = pd.read_excel(EXCEL_PATH, sheet_name="procurement_cost", engine='odf')
-manu_df = pd.read_excel(EXCEL_PATH, sheet_name="manufacturing_cost", engine='odf')
-fixed_df = pd.read_excel(EXCEL_PATH, sheet_name="fixed_cost", engine='odf')
+
+from dataset import open_workbook
+
+EXCEL_PATH = "supply_chain_table_2.ods"   # or a dataset directory written by dataset.py
+USE_CACHE = False                          # True: read a columnar copy kept next to the workbook
+
+book = open_workbook(EXCEL_PATH, engine='odf', cache=USE_CACHE)
+
+# load sheets (all parsed in one pass when the workbook is opened)
+bS_df = book.parse("bS_supply_capacity")
+bMH_df = book.parse("bMH_facility_capacity")
+demand_df = book.parse("demand")
+bom_df = book.parse("BOM")
+r_df = book.parse("r")
+transport_df = book.parse("transport_cost")
+proc_df = book.parse("procurement_cost")
+manu_df = book.parse("manufacturing_cost")
+fixed_df = book.parse("fixed_cost")
 
 product = "P2"   # change if your product name differs exactly (case sensitive)
 nodes_of_interest = ["S1","S2","M1","M2","W1","C1","C2"]
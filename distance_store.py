@@ -0,0 +1,318 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# DISTANCE STORE
+# ============================================================================
+# Distances (km) between network nodes held in a dense float32 matrix with an
+# id -> row/column index, instead of a dict keyed by (origin, destination).
+# On disk a store is a directory with `matrix.npy` (opened as a memmap) and
+# `ids.json`, so a 10k-node matrix (~400 MB) never has to be loaded whole.
+# Missing pairs are stored as NaN. When node coordinates are known, gaps are
+# synthesized as great-circle (haversine) distance times a road circuity
+# factor; explicitly supplied distances always take precedence. Whatever is
+# still missing is answered with the store's explicit `default`; with
+# default=None a missing pair raises KeyError.
+#
+#   python distance_store.py supply_chain_data.xlsx -o dist.store --sheet Distance_Matrix --header 3
+#   python distance_store.py data.dataset -o dist.store --coords-sheet Coordinates --circuity 1.3
+
+MATRIX_FILE = 'matrix.npy'
+IDS_FILE = 'ids.json'
+BUILD_BATCH_ROWS = 1_000_000
+EARTH_RADIUS_KM = 6371.0088
+SYNTH_CHUNK_PAIRS = 4_000_000   # pairs computed per haversine chunk (~100 MB of temporaries)
+
+
+# ============================================================================
+# DISTANCE SYNTHESIS
+# ============================================================================
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; inputs in degrees, broadcast like NumPy."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def coordinates_from_frame(df, id_col='Code', lat_col='Latitude', lon_col='Longitude'):
+    """Node coordinates as a DataFrame indexed by id with `lat` / `lon` columns."""
+    df = df.dropna(subset=[id_col, lat_col, lon_col])
+    coords = pd.DataFrame({'lat': df[lat_col].astype(float).values,
+                           'lon': df[lon_col].astype(float).values}, index=pd.Index(df[id_col]))
+    return coords[~coords.index.duplicated(keep='last')]
+
+
+def fill_missing(block, origins, destinations, coords, circuity=1.0, chunk_pairs=SYNTH_CHUNK_PAIRS):
+    """
+    Fill NaN entries of an origins x destinations block in place with
+    haversine distance x circuity, for pairs whose two ends have coordinates.
+    Works through the block in row chunks so temporaries stay bounded.
+    Returns the number of entries filled.
+    """
+    if coords is None or len(coords) == 0 or block.size == 0:
+        return 0
+    o_pos = coords.index.get_indexer(pd.Index(origins))
+    d_pos = coords.index.get_indexer(pd.Index(destinations))
+    cols = np.flatnonzero(d_pos >= 0)
+    rows = np.flatnonzero(o_pos >= 0)
+    if not len(cols) or not len(rows):
+        return 0
+    lat, lon = coords['lat'].values, coords['lon'].values
+    lat_d, lon_d = lat[d_pos[cols]], lon[d_pos[cols]]
+    step = max(1, chunk_pairs // len(cols))
+    filled = 0
+    for start in range(0, len(rows), step):
+        r = rows[start:start + step]
+        sub = block[np.ix_(r, cols)]
+        gaps = np.isnan(sub)
+        if not gaps.any():
+            continue
+        synth = haversine_km(lat[o_pos[r]][:, None], lon[o_pos[r]][:, None], lat_d[None, :], lon_d[None, :]) * circuity
+        sub[gaps] = synth[gaps]
+        block[np.ix_(r, cols)] = sub
+        filled += int(gaps.sum())
+    return filled
+
+
+class DistanceStore:
+    """
+    Origin/destination distance lookups backed by a float32 matrix.
+    Supports scalar lookups, row slices and vectorized batch lookups.
+    """
+
+    def __init__(self, ids, matrix, default=None, path=None):
+        self.ids = list(ids)
+        self.matrix = matrix
+        self.default = default
+        self.path = path
+        self._pos = pd.Index(self.ids)
+        if not self._pos.is_unique:
+            raise ValueError("DistanceStore ids must be unique")
+        if matrix.shape != (len(self.ids), len(self.ids)):
+            raise ValueError(f"matrix shape {matrix.shape} does not match {len(self.ids)} ids")
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    @classmethod
+    def create(cls, ids, path=None, default=None):
+        """Empty (all-missing) store, memory-mapped at `path` or held in RAM."""
+        ids = list(ids)
+        n = len(ids)
+        if path is None:
+            matrix = np.full((n, n), np.nan, dtype=np.float32)
+        else:
+            os.makedirs(path, exist_ok=True)
+            matrix = np.lib.format.open_memmap(os.path.join(path, MATRIX_FILE), mode='w+',
+                                               dtype=np.float32, shape=(n, n))
+            matrix[:] = np.nan
+            with open(os.path.join(path, IDS_FILE), 'w', encoding='utf-8') as fh:
+                json.dump({'ids': ids}, fh)
+        return cls(ids, matrix, default=default, path=path)
+
+    @classmethod
+    def open(cls, path, default=None, mode='r'):
+        """Open an on-disk store; the matrix is memory-mapped, not read."""
+        with open(os.path.join(path, IDS_FILE), encoding='utf-8') as fh:
+            ids = json.load(fh)['ids']
+        matrix = np.load(os.path.join(path, MATRIX_FILE), mmap_mode=mode)
+        return cls(ids, matrix, default=default, path=path)
+
+    @classmethod
+    def from_pairs(cls, origins, destinations, distances, ids=None, path=None, default=None):
+        """Build a store from parallel origin / destination / distance sequences."""
+        origins = pd.Index(origins)
+        destinations = pd.Index(destinations)
+        if ids is None:
+            ids = origins.append(destinations).unique().tolist()
+        store = cls.create(ids, path=path, default=default)
+        store.set_pairs(origins, destinations, distances)
+        return store
+
+    @classmethod
+    def from_frame(cls, df, from_col='From', to_col='To', value_col='Distance (km)', ids=None,
+                   path=None, default=None):
+        """Build a store from a From/To/Distance table, skipping blank rows."""
+        df = df.dropna(subset=[from_col, to_col, value_col])
+        return cls.from_pairs(df[from_col], df[to_col], df[value_col].astype(float),
+                              ids=ids, path=path, default=default)
+
+    @classmethod
+    def from_arrow(cls, table, from_col='From', to_col='To', value_col='Distance (km)', extra_ids=None,
+                   path=None, default=None, batch_rows=BUILD_BATCH_ROWS):
+        """
+        Build a store from a (memory-mapped) pyarrow.Table in record batches,
+        so a full distance table never has to be converted to pandas at once.
+        """
+        import pyarrow.compute as pc
+
+        table = table.select([from_col, to_col, value_col])
+        table = table.filter(pc.and_(pc.is_valid(table[from_col]), pc.is_valid(table[to_col])))
+        ids = pd.Index(pc.unique(table[from_col]).to_pylist()).append(
+            pd.Index(pc.unique(table[to_col]).to_pylist()))
+        if extra_ids is not None:
+            ids = ids.append(pd.Index(extra_ids))
+        ids = ids.unique().tolist()
+        store = cls.create(ids, path=path, default=default)
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            store.set_pairs(batch.column(0).to_numpy(zero_copy_only=False),
+                            batch.column(1).to_numpy(zero_copy_only=False),
+                            batch.column(2).to_numpy(zero_copy_only=False).astype(np.float64))
+        return store
+
+    def set_pairs(self, origins, destinations, distances):
+        """Write distances for the given pairs (ids must already be indexed)."""
+        i = self._indexer(origins, strict=True)
+        j = self._indexer(destinations, strict=True)
+        self.matrix[i, j] = np.asarray(distances, dtype=np.float32)
+
+    def synthesize(self, coords, circuity=1.0, chunk_pairs=SYNTH_CHUNK_PAIRS):
+        """
+        Write haversine x circuity distances into every missing pair of the
+        store whose two ends have coordinates, chunk of rows by chunk of rows.
+        Returns the number of pairs filled.
+        """
+        step = max(1, chunk_pairs // max(1, len(self.ids)))
+        filled = 0
+        for start in range(0, len(self.ids), step):
+            origins = self.ids[start:start + step]
+            block = np.asarray(self.matrix[start:start + step], dtype=np.float64)
+            n = fill_missing(block, origins, self.ids, coords, circuity, chunk_pairs)
+            if n:
+                self.matrix[start:start + step] = block
+                filled += n
+        return filled
+
+    def flush(self):
+        if isinstance(self.matrix, np.memmap):
+            self.matrix.flush()
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def _indexer(self, ids, strict=False):
+        pos = self._pos.get_indexer(pd.Index(ids))
+        if strict and (pos < 0).any():
+            unknown = pd.Index(ids)[pos < 0].unique().tolist()
+            raise KeyError(f"Unknown distance ids: {unknown[:10]}")
+        return pos
+
+    def apply_default(self, values):
+        """Replace NaN (missing) entries with `default` in place, or raise KeyError."""
+        missing = np.isnan(values)
+        if missing.any():
+            if self.default is None:
+                raise KeyError(f"{int(missing.sum())} distance pairs missing and no default set")
+            values[missing] = self.default
+        return values
+
+    def __contains__(self, pair):
+        i, j = self._indexer([pair[0]])[0], self._indexer([pair[1]])[0]
+        return i >= 0 and j >= 0 and not np.isnan(self.matrix[i, j])
+
+    def get(self, origin, destination):
+        """Distance for one pair, falling back to `default`."""
+        return float(self.lookup([origin], [destination])[0])
+
+    def __getitem__(self, pair):
+        return self.get(*pair)
+
+    def row(self, origin):
+        """All distances from `origin` (a view into the matrix, NaN = missing)."""
+        i = self._indexer([origin], strict=True)[0]
+        return self.matrix[i]
+
+    def lookup(self, origins, destinations):
+        """Vectorized lookup for parallel sequences of pairs (float64 array)."""
+        i = self._indexer(origins)
+        j = self._indexer(destinations)
+        values = np.full(len(i), np.nan)
+        known = (i >= 0) & (j >= 0)
+        values[known] = self.matrix[i[known], j[known]]
+        return self.apply_default(values)
+
+    def _block(self, origins, destinations):
+        i = self._indexer(origins)
+        j = self._indexer(destinations)
+        values = np.full((len(i), len(j)), np.nan)
+        ki, kj = np.flatnonzero(i >= 0), np.flatnonzero(j >= 0)
+        if len(ki) and len(kj):
+            values[np.ix_(ki, kj)] = self.matrix[np.ix_(i[ki], j[kj])]
+        return values
+
+    def resolve(self, origins, destinations, coords=None, circuity=1.0):
+        """
+        Distance block with gaps synthesized from `coords` where possible.
+        Returns (block with NaN still marking missing pairs, number synthesized).
+        """
+        block = self._block(origins, destinations)
+        return block, fill_missing(block, origins, destinations, coords, circuity)
+
+    def grid(self, origins, destinations, coords=None, circuity=1.0):
+        """len(origins) x len(destinations) distance block (float64 array)."""
+        return self.apply_default(self.resolve(origins, destinations, coords, circuity)[0])
+
+    def missing_count(self, origins, destinations, coords=None, circuity=1.0):
+        """Number of pairs in the origins x destinations block that fall back to the default."""
+        return int(np.isnan(self.resolve(origins, destinations, coords, circuity)[0]).sum())
+
+    def pair_map(self, origins, destinations, coords=None, circuity=1.0):
+        """{(origin, destination): km} for a block, looked up in one batch."""
+        values = self.grid(origins, destinations, coords, circuity)
+        return {(o, d): float(values[a, b])
+                for a, o in enumerate(origins) for b, d in enumerate(destinations)}
+
+
+def main(argv=None):
+    import argparse
+
+    from dataset import ColumnarWorkbook, open_workbook
+
+    parser = argparse.ArgumentParser(description="Build an on-disk distance store from a workbook sheet.")
+    parser.add_argument('source', help="workbook or dataset directory")
+    parser.add_argument('-o', '--output', required=True, help="store directory to create")
+    parser.add_argument('--sheet', default='Distance_Matrix')
+    parser.add_argument('--header', type=int, default=3)
+    parser.add_argument('--from-col', default='From')
+    parser.add_argument('--to-col', default='To')
+    parser.add_argument('--value-col', default='Distance (km)')
+    parser.add_argument('--coords-sheet', help="sheet with node coordinates used to fill missing pairs")
+    parser.add_argument('--coords-header', type=int, default=3)
+    parser.add_argument('--id-col', default='Code')
+    parser.add_argument('--lat-col', default='Latitude')
+    parser.add_argument('--lon-col', default='Longitude')
+    parser.add_argument('--circuity', type=float, default=1.0, help="road / great-circle distance ratio")
+    args = parser.parse_args(argv)
+
+    book = open_workbook(args.source)
+    coords = None
+    if args.coords_sheet:
+        coords = coordinates_from_frame(book.parse(args.coords_sheet, header=args.coords_header),
+                                        args.id_col, args.lat_col, args.lon_col)
+    extra_ids = None if coords is None else coords.index
+    if isinstance(book, ColumnarWorkbook) and book.header_row(args.sheet) == args.header:
+        store = DistanceStore.from_arrow(book.table(args.sheet), args.from_col, args.to_col,
+                                         args.value_col, extra_ids=extra_ids, path=args.output)
+    else:
+        df = book.parse(args.sheet, header=args.header)
+        ids = None
+        if extra_ids is not None:
+            ids = pd.Index(df[args.from_col].dropna()).append(pd.Index(df[args.to_col].dropna()))
+            ids = ids.append(extra_ids).unique().tolist()
+        store = DistanceStore.from_frame(df, args.from_col, args.to_col, args.value_col, ids=ids,
+                                         path=args.output)
+    if coords is not None:
+        filled = store.synthesize(coords, args.circuity)
+        print(f"  {filled} missing pairs synthesized (circuity {args.circuity:g})")
+    store.flush()
+    print(f"✓ {len(store.ids)} nodes → {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,318 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from extract import KEY_COLUMNS
+from integrate import TRANSPORT_STAGES, VARIABLE_ROLES, transport_distances
+
+# ============================================================================
+# PLAN EVALUATOR
+# ============================================================================
+# Scores flow plans of the integrate.py model without a solver. A plan is a
+# solution in the tidy form written by extract.py (group, origin,
+# destination, product, flow); a parameter set is the data dictionary of
+# read_excel_data, optionally with some values overridden (e.g. {'E_T': 7e-5}).
+#
+# Every variable of the model gets a fixed slot (same order as addVars), so
+# plans become rows of a dense matrix X and each parameter set becomes a
+# coefficient matrix with one row per cost component plus one for emissions.
+# All plan x parameter combinations are then a single matrix product:
+#
+#   ev = PlanEvaluator(data)
+#   scores = ev.evaluate([plan_a, plan_b], [{}, {'T': 0.005}, {'E_T': 8e-5}])
+#
+# Z_Cost = Fixed + Op + Transport + Shortage - Revenue, with the same terms
+# and coefficients as build_circular_supply_chain_model.
+#
+# The CLI re-prices plans written by integrate.py (solution_path):
+#
+#   python evaluate.py supply_chain_data.xlsx plans/ --params '{"E_T": 8e-5}'
+
+PARTS = ('Fixed', 'Op', 'Transport', 'Shortage', 'Revenue')
+# Data the evaluator's network is built from; parameter sets cannot override it
+STRUCTURAL = ('P', 'C', 'O', 'F', 'R', 'L', 'S', 'K', 'M', 'DIST', 'COORD', 'circuity', 'index')
+RESULT_COLUMNS = ('Z_Cost', 'Env_Total') + PARTS
+
+# Index sets of every variable group, in model order
+GROUP_SETS = {
+    'X_pk': ('P', 'K'),
+    'X_pck': ('P', 'C', 'K'),
+    'Y_cok': ('C', 'O', 'K'),
+    'Y_ock': ('O', 'C', 'K'),
+    'Y_ofk': ('O', 'F', 'K'),
+    'Y_ork': ('O', 'R', 'K'),
+    'Y_olk': ('O', 'L', 'K'),
+    'Y_fpk': ('F', 'P', 'K'),
+    'S_ck': ('C', 'K'),
+    'Z_rsm': ('R', 'S', 'M'),
+    'W_o': ('O',),
+    'W_f': ('F',),
+    'W_r': ('R',),
+}
+
+# Transport variable group -> (origin set, destination set); the first two key
+# positions of these groups are the route
+TRANSPORT_GROUPS = dict(zip(['X_pck', 'Y_cok', 'Y_ock', 'Y_ofk', 'Y_ork', 'Y_olk', 'Y_fpk', 'Z_rsm'],
+                            TRANSPORT_STAGES))
+# Product flows are weighted by panel weight (kg/KWp); Z_rsm is already in kg
+WEIGHTED_GROUPS = ('X_pck', 'Y_cok', 'Y_ock', 'Y_ofk', 'Y_ork', 'Y_olk', 'Y_fpk')
+
+# group -> (part, cost parameter, key position, weighted) of its non-transport cost
+NODE_COSTS = {
+    'X_pk': ('Op', 'PC', 0, False),
+    'Y_cok': ('Op', 'CC', 1, False),
+    'Y_ofk': ('Op', 'FC', 1, False),
+    'Y_ork': ('Op', 'RC', 1, True),
+    'Y_olk': ('Op', 'DC', 1, True),
+    'W_o': ('Fixed', 'FixO', 0, False),
+    'W_f': ('Fixed', 'FixF', 0, False),
+    'W_r': ('Fixed', 'FixR', 0, False),
+}
+# group -> (emission factor, key position, weighted) of its non-transport emissions
+NODE_EMISSIONS = {
+    'X_pk': ('E_p', 0, False),
+    'Y_cok': ('E_o', 1, False),
+    'Y_ofk': ('E_f', 1, False),
+    'Y_ork': ('E_r', 1, True),
+    'Y_olk': ('E_l', 1, True),
+}
+# group -> (revenue parameter, key position); missing entries earn nothing
+REVENUES = {
+    'Y_ock': ('Rev_reuse', 2),
+    'Y_fpk': ('Rev_refurb', 2),
+    'Z_rsm': ('Rev_recycle', 2),
+}
+
+
+class PlanEvaluator:
+    """
+    Vectorized cost / emission evaluation of flow plans for one network
+    (the sets and distances of `data`).
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.sets = {s: list(data[s]) for s in ('P', 'C', 'O', 'F', 'R', 'L', 'S', 'K', 'M')}
+        dist = transport_distances(data)[0]
+
+        self.codes, self.slices = {}, {}
+        self.route_km = {}
+        offset = 0
+        for group, sets in GROUP_SETS.items():
+            grids = np.meshgrid(*[np.arange(len(self.sets[s])) for s in sets], indexing='ij')
+            codes = [g.ravel() for g in grids]
+            self.codes[group] = codes
+            self.slices[group] = slice(offset, offset + len(codes[0]))
+            offset += len(codes[0])
+            if group in TRANSPORT_GROUPS:
+                a, b = (self.sets[s] for s in TRANSPORT_GROUPS[group])
+                self.route_km[group] = np.array([dist[a[i], b[j]] for i, j in zip(codes[0], codes[1])], dtype=float)
+        self.num_vars = offset
+        self._slot_index = None
+
+    # ------------------------------------------------------------------
+    # Coefficients
+    # ------------------------------------------------------------------
+    def resolve(self, params=None):
+        """
+        The data dictionary with `params` overriding it (dict values are merged).
+        Sets, distances and coordinates (STRUCTURAL) are fixed by the network: KeyError.
+        """
+        if not params:
+            return self.data
+        fixed = [name for name in params if name in STRUCTURAL]
+        if fixed:
+            raise KeyError(f"{', '.join(fixed)} cannot be overridden: build a PlanEvaluator for the changed network")
+        merged = dict(self.data)
+        for name, value in params.items():
+            if isinstance(self.data.get(name), dict) and isinstance(value, dict):
+                merged[name] = {**self.data[name], **value}
+            else:
+                merged[name] = value
+        return merged
+
+    def _per_node(self, values, group, pos, default=None):
+        set_name = GROUP_SETS[group][pos]
+        if default is None:
+            vec = np.array([values[x] for x in self.sets[set_name]], dtype=float)
+        else:
+            vec = np.array([values.get(x, default) for x in self.sets[set_name]], dtype=float)
+        return vec[self.codes[group][pos]]
+
+    def group_terms(self, group, p):
+        """
+        Coefficients of one variable group under parameters `p`:
+        ({part: array}, emission array). Terms follow the model's expressions.
+        """
+        n = len(self.codes[group][0])
+        parts = {}
+        env = np.zeros(n)
+        # Panel weight (kg/KWp) of each slot's product
+        weight = self._per_node(p['omega'], group, -1) if group in WEIGHTED_GROUPS else None
+        if group in NODE_COSTS:
+            part, name, pos, weighted = NODE_COSTS[group]
+            coef = self._per_node(p[name], group, pos)
+            parts[part] = coef * weight if weighted else coef
+        if group in NODE_EMISSIONS:
+            name, pos, weighted = NODE_EMISSIONS[group]
+            coef = self._per_node(p[name], group, pos)
+            env = env + (coef * weight if weighted else coef)
+        if group in TRANSPORT_GROUPS:
+            d = self.route_km[group]
+            if group in WEIGHTED_GROUPS:
+                parts['Transport'] = p['T'] * d * weight
+                env = env + p['E_T'] * d * weight
+            else:
+                parts['Transport'] = p['T'] * d
+                env = env + p['E_T'] * d
+        if group == 'S_ck':
+            parts['Shortage'] = np.full(n, float(p['Penalty']))
+        if group in REVENUES:
+            name, pos = REVENUES[group]
+            parts['Revenue'] = self._per_node(p[name], group, pos, default=0.0)
+        return parts, env
+
+    def group_coefficients(self, group, p):
+        """Total cost and emission coefficients of one variable group."""
+        parts, env = self.group_terms(group, p)
+        cost = np.zeros(len(env))
+        for part in ('Fixed', 'Op', 'Transport', 'Shortage'):
+            if part in parts:
+                cost = cost + parts[part]
+        if 'Revenue' in parts:
+            cost = cost - parts['Revenue']
+        return cost, env
+
+    def coefficients(self, params=None):
+        """
+        Coefficient matrix (len(PARTS) + 1, num_vars) of one parameter set:
+        one row per cost part (revenue positive) and a last row of emissions.
+        """
+        p = self.resolve(params)
+        coef = np.zeros((len(PARTS) + 1, self.num_vars))
+        for group, sl in self.slices.items():
+            parts, env = self.group_terms(group, p)
+            for i, part in enumerate(PARTS):
+                if part in parts:
+                    coef[i, sl] = parts[part]
+            coef[-1, sl] = env
+        return coef
+
+    # ------------------------------------------------------------------
+    # Plans
+    # ------------------------------------------------------------------
+    def slot_index(self):
+        """Index of 'group|origin|destination|product' labels, one per variable slot."""
+        if self._slot_index is None:
+            labels = []
+            for group, sets in GROUP_SETS.items():
+                roles = VARIABLE_ROLES[group]
+                columns = {col: np.full(len(self.codes[group][0]), '', dtype=object) for col in KEY_COLUMNS}
+                for role, s, codes in zip(roles, sets, self.codes[group]):
+                    columns[role] = np.asarray(self.sets[s], dtype=object)[codes].astype(str)
+                labels.append(group + '|' + pd.Series(columns['origin'], dtype=object) + '|'
+                              + pd.Series(columns['destination'], dtype=object) + '|'
+                              + pd.Series(columns['product'], dtype=object))
+            self._slot_index = pd.Index(pd.concat(labels, ignore_index=True))
+        return self._slot_index
+
+    def plan_vector(self, frame):
+        """Dense variable vector of a tidy plan (extract.py format)."""
+        labels = frame['group'].astype(str)
+        for col in KEY_COLUMNS:
+            values = frame[col].astype(object)
+            labels = labels + '|' + values.where(values.notna(), '').astype(str)
+        idx = self.slot_index().get_indexer(labels)
+        if (idx < 0).any():
+            unknown = labels[idx < 0].unique()[:5].tolist()
+            raise KeyError(f"Plan rows do not match the network: {unknown}")
+        x = np.zeros(self.num_vars)
+        np.add.at(x, idx, frame['flow'].to_numpy(dtype=float))
+        return x
+
+    def plan_matrix(self, plans):
+        """Stack plans (tidy frames or dense vectors) into a (n_plans, num_vars) matrix."""
+        if isinstance(plans, (pd.DataFrame, np.ndarray)):
+            plans = [plans] if isinstance(plans, pd.DataFrame) or np.ndim(plans) == 1 else list(plans)
+        return np.vstack([self.plan_vector(p) if isinstance(p, pd.DataFrame) else np.asarray(p, dtype=float)
+                          for p in plans])
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+    def values(self, X, coef):
+        """
+        Raw evaluation: X (n_plans, num_vars) and coef (n_params, len(PARTS) + 1,
+        num_vars) -> (n_plans, n_params, len(RESULT_COLUMNS)).
+        """
+        raw = np.einsum('qkn,pn->pqk', coef, X, optimize=True)
+        parts = raw[..., :len(PARTS)]
+        z = parts[..., 0] + parts[..., 1] + parts[..., 2] + parts[..., 3] - parts[..., 4]
+        return np.concatenate([z[..., None], raw[..., -1:], parts], axis=-1)
+
+    def evaluate(self, plans, params=None):
+        """
+        Z_Cost, Env_Total and the cost breakdown of every plan under every
+        parameter set. `params` is None, one override dict or a list of them.
+        Returns a DataFrame with one row per (plan, params) pair.
+        """
+        X = self.plan_matrix(plans)
+        param_sets = [params] if params is None or isinstance(params, dict) else list(params)
+        coef = np.stack([self.coefficients(p) for p in param_sets])
+        vals = self.values(X, coef).reshape(-1, len(RESULT_COLUMNS))
+        out = pd.DataFrame(vals, columns=list(RESULT_COLUMNS))
+        out.insert(0, 'params', np.tile(np.arange(len(param_sets)), len(X)))
+        out.insert(0, 'plan', np.repeat(np.arange(len(X)), len(param_sets)))
+        return out
+
+
+def plan_files(paths):
+    """Parquet plans among `paths`: files as given, directories searched for flows.parquet (extract.point_path)."""
+    import glob
+    import os
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob.glob(os.path.join(path, '**', 'flows.parquet'), recursive=True))
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv=None):
+    import argparse
+    import json
+    import time
+
+    from integrate import read_excel_data
+
+    parser = argparse.ArgumentParser(description="Re-price integrate.py plans under new parameters without solving.")
+    parser.add_argument('workbook', help="workbook or dataset directory the plans were solved on")
+    parser.add_argument('plans', nargs='+',
+                        help="Parquet plans written by integrate.py (solution_path), or directories of them")
+    parser.add_argument('--params', action='append', default=[], metavar='JSON',
+                        help="parameter override set, e.g. '{\"E_T\": 8e-5}' (repeatable)")
+    args = parser.parse_args(argv)
+
+    files = plan_files(args.plans)
+    if not files:
+        print(f"✗ No plans found in: {', '.join(args.plans)}")
+        return 1
+    data = read_excel_data(args.workbook)
+    ev = PlanEvaluator(data)
+    plans = [pd.read_parquet(f) for f in files]
+    param_sets = [None] + [json.loads(p) for p in args.params]
+
+    start = time.perf_counter()
+    scores = ev.evaluate(plans, param_sets)
+    elapsed = time.perf_counter() - start
+    scores.insert(0, 'file', [files[i] for i in scores['plan']])
+    print(scores.drop(columns='plan').to_string(index=False, float_format=lambda v: f'{v:,.2f}'))
+    print(f"✓ {len(scores)} plan x parameter evaluations in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,50 @@
 # model_from_excel.py
+import re
+import sys
+from collections import defaultdict
+
+import numpy as np
 import pandas as pd
 import gurobipy as gp
 from gurobipy import GRB
 
 from math import isfinite
 
-EXCEL_PATH = "supply_chain_table_2.ods"
-
-bS_df = pd.read_excel(EXCEL_PATH, sheet_name="bS_supply_capacity", engine='odf')        # supplier, product, capacity
-bMH_df = pd.read_excel(EXCEL_PATH, sheet_name="bMH_facility_capacity", engine='odf')   # facility, capacity
-demand_df = pd.read_excel(EXCEL_PATH, sheet_name="demand", engine='odf')               # customer, product, demand
-bom_df = pd.read_excel(EXCEL_PATH, sheet_name="BOM", engine='odf')                     # material_q, product_p, amount
-r_df = pd.read_excel(EXCEL_PATH, sheet_name="r", engine='odf')                     # facility, product, r
-transport_df = pd.read_excel(EXCEL_PATH, sheet_name="transport_cost", engine='odf')    # i, j, product, cost
-proc_df = pd.read_excel(EXCEL_PATH, sheet_name="procurement_cost", engine='odf')       # supplier, product, cost
-manu_df = pd.read_excel(EXCEL_PATH, sheet_name="manufacturing_cost", engine='odf')     # facility, product, cost
-fixed_df = pd.read_excel(EXCEL_PATH, sheet_name="fixed_cost", engine='odf')           # facility, fixed_cost
+from dataset import open_workbook
+from feasibility import (Issue, SheetRows, confirm_infeasible, diagnose, has_errors, print_iis, print_issues,
+                         reaching, stage_capacity)
+
+EXCEL_PATH = sys.argv[1] if len(sys.argv) > 1 else "supply_chain_table_2.ods"   # or a dataset directory (dataset.py)
+USE_CACHE = False                          # True: read a columnar copy kept next to the workbook
+
+# Sheet rows each constraint family is built from (see feasibility.SheetRows)
+SHEET_ROWS = {
+    "demand": [("demand", 0, {"customer": 0, "product": 1})],
+    "cap": [("bMH_facility_capacity", 0, {"facility": 0}), ("r", 0, {"facility": 0})],
+    "bigM": [("bMH_facility_capacity", 0, {"facility": 0}), ("r", 0, {"facility": 0, "product": 1})],
+    "supp": [("bS_supply_capacity", 0, {"supplier": 0, "product": 1})],
+    "wh_in": [("transport_cost", 0, {"j": 0, "product": 1})],
+    "wh_out": [("transport_cost", 0, {"i": 0, "product": 1})],
+    "mf_inout": [("BOM", 0, {"material_q": 1})],
+    "mf_out": [("transport_cost", 0, {"i": 0, "product": 1})],
+}
+
+def parse_constraint(name):
+    """'demand_C1_P1' -> ('demand', ('C1', 'P1'))."""
+    match = re.fullmatch(r"(demand|cap|bigM|supp|wh_in|wh_out|mf_inout|mf_out)_(.*)", name)
+    return (match.group(1), tuple(match.group(2).split("_"))) if match else (name, ())
+
+book = open_workbook(EXCEL_PATH, engine='odf', cache=USE_CACHE)
+
+bS_df = book.parse("bS_supply_capacity")        # supplier, product, capacity
+bMH_df = book.parse("bMH_facility_capacity")   # facility, capacity
+demand_df = book.parse("demand")               # customer, product, demand
+bom_df = book.parse("BOM")                     # material_q, product_p, amount
+r_df = book.parse("r")                     # facility, product, r
+transport_df = book.parse("transport_cost")    # i, j, product, cost
+proc_df = book.parse("procurement_cost")       # supplier, product, cost
+manu_df = book.parse("manufacturing_cost")     # facility, product, cost
+fixed_df = book.parse("fixed_cost")           # facility, fixed_cost
 
 
 ### Build sets
@@ -27,13 +56,6 @@ M = facilities_from_bMH.copy()
 
 C = sorted(demand_df["customer"].unique().astype(str).tolist())
 
-prods = set()
-if "product" in proc_df.columns: prods.update(proc_df["product"].astype(str).unique())
-if "product" in demand_df.columns: prods.update(demand_df["product"].astype(str).unique())
-if "product" in transport_df.columns: prods.update(transport_df["product"].astype(str).unique())
-if "product_p" in bom_df.columns: prods.update(bom_df["product_p"].astype(str).unique())
-P = sorted([p for p in prods if pd.notna(p)])
-
 materials = []
 if "material_q" in bom_df.columns:
     materials = sorted(bom_df["material_q"].astype(str).unique().tolist())
@@ -48,11 +70,20 @@ arcs = set( (row.i, row.j, row[3]) for row in transport_df.itertuples() )
 src_nodes = sorted(transport_df["i"].unique())
 dst_nodes = sorted(transport_df["j"].unique())
 
-W_candidates = [n for n in dst_nodes if (n not in S) and (n not in C) and (n not in M)]
+# Warehouses are the nodes that ship to customers (they may have a capacity row too)
+W_candidates = [i for (i, j, p) in arcs if j in C and i not in S]
 W = sorted(list(set(W_candidates)))
 
 M = [m for m in M if m not in W]
 
+# Finished products: demanded, made by the BOM, or shipped into a warehouse.
+# BOM materials only flow supplier -> plant and are not products (no z, r or U).
+prods = set()
+if "product" in demand_df.columns: prods.update(demand_df["product"].astype(str).unique())
+if "product_p" in bom_df.columns: prods.update(bom_df["product_p"].astype(str).unique())
+prods.update(p for (i, j, p) in arcs if j in W)
+P = sorted([p for p in prods if pd.notna(p) and p not in materials])
+
 
 ### Parameter
 # b_{j p}^S : supplier-product capacities
@@ -94,17 +125,110 @@ if len(a_qp)==0 or not (set(materials) & supplier_items):
 else:
     materials = sorted(list(set(materials)))
 
+### Bill of materials as a sparse material x product matrix (CSR)
+# Row q holds the products using material q (bom_cols, positions in P) and the
+# amounts a_qp (bom_vals), so material balances cost O(nonzeros) to build
+# instead of a |materials| x |P| double loop per facility.
+_q_pos = {q: n for n, q in enumerate(materials)}
+_p_pos = {p: n for n, p in enumerate(P)}
+_bom = np.array([(_q_pos[q], _p_pos[p], a) for (q, p), a in a_qp.items()
+                 if q in _q_pos and p in _p_pos and a != 0.0], dtype=float).reshape(-1, 3)
+_bom = _bom[np.lexsort((_bom[:, 1], _bom[:, 0]))]
+bom_indptr = np.searchsorted(_bom[:, 0], np.arange(len(materials) + 1))
+bom_cols = _bom[:, 1].astype(int)
+bom_vals = _bom[:, 2]
 
 
 
 
 
 
-m = gp.Model("SupplyChain_MultiProduct")
 
 # Das sind alle Pfeile x
 arcs = sorted(arcs)
 
+### Arc index
+# In- and out-neighbours per (node, product), built once from the transport
+# sheet. Constraints sum over the arcs that exist only, so building is
+# O(|arcs|) and arcs missing from a sparse network are simply not there.
+in_arcs = defaultdict(list)     # (j, p) -> [i with arc (i, j, p)]
+out_arcs = defaultdict(list)    # (i, p) -> [j with arc (i, j, p)]
+for (i, j, p) in arcs:
+    out_arcs[i, p].append(j)
+    in_arcs[j, p].append(i)
+S_set, M_set, W_set, C_set = set(S), set(M), set(W), set(C)
+
+
+### Bound propagation for the big-M values
+# U[j,p]: most of product p facility j can ever handle, from the network data.
+# Warehouses pass on at most the demand of the customers they have arcs to and
+# receive at most what their suppliers (b_s_p) and plants can send; plants make
+# at most what the warehouses they reach can pass on, and at most what their
+# material supply covers through the BOM. Two sweeps reach the fixpoint for
+# the supplier -> plant -> warehouse -> customer network.
+U = { (j,p): b_MH[j] / r[(j,p)] for j in (M + W) for p in P }
+material_supply = { (j,q): 0.0 for j in M for q in materials }
+for (i,k,q) in arcs:
+    if i in S_set and (k,q) in material_supply:
+        material_supply[k,q] += b_s_p.get((i,q), 0.0)
+for j in M:
+    for n, q in enumerate(materials):
+        lo, hi = bom_indptr[n], bom_indptr[n + 1]
+        for c, a in zip(bom_cols[lo:hi], bom_vals[lo:hi]):
+            U[j,P[c]] = min(U[j,P[c]], material_supply[j,q] / a)
+for j in W:
+    for p in P:
+        U[j,p] = min(U[j,p], sum(d.get((k,p), 0.0) for k in out_arcs.get((j,p), ()) if k in C_set))
+for sweep in range(2):
+    downstream = { (j,p): 0.0 for j in M for p in P }
+    upstream = { (j,p): 0.0 for j in W for p in P }
+    for (i,k,p) in arcs:
+        if i in M_set and k in W_set:
+            downstream[i,p] += U[k,p]
+        if k in W_set and i in S_set:
+            upstream[k,p] += b_s_p.get((i,p), 0.0)
+        elif k in W_set and i in M_set:
+            upstream[k,p] += U[i,p]
+    for (j,p), u in downstream.items():
+        U[j,p] = min(U[j,p], u)
+    for (j,p), u in upstream.items():
+        U[j,p] = min(U[j,p], u)
+
+### Feasibility screening (before building)
+# Demand rows have no slack: every (customer, product) with demand needs
+# warehouse arcs into it and enough propagated warehouse throughput U behind
+# them. Errors prove the model infeasible, so it is not built.
+issues = []
+for p in P:
+    # nodes a supplier or plant can reach with p (reversed arcs: reachable from them)
+    supplied = reaching([(k, i) for (i, k, q) in arcs if q == p], S_set | M_set)
+    for j in C:
+        need = d.get((j,p), 0.0)
+        if need <= 0:
+            continue
+        via = [i for i in in_arcs.get((j, p), ()) if i in W_set]
+        if not via or j not in supplied:
+            issues.append(Issue('error', 'reachability', 'demand', (j, p),
+                                f"demand {need:g} of {p} at {j} has no supply path through a warehouse"))
+            continue
+        issue = stage_capacity('demand', need, sum(U[i,p] for i in via), f"demand of {p} at {j}")
+        if issue:
+            issues.append(issue._replace(key=(j, p)))
+rows = SheetRows(book, SHEET_ROWS, parse=parse_constraint)
+if issues:
+    print_issues(issues, rows)
+if has_errors(issues):
+    print("✗ STATUS: INFEASIBLE (found by screening, model not built)")
+    sys.exit(1)
+
+m = gp.Model("SupplyChain_MultiProduct")
+
+def arcs_in(j, p, sources):
+    return [x[i, j, p] for i in in_arcs.get((j, p), ()) if i in sources]
+
+def arcs_out(i, p, targets):
+    return [x[i, j, p] for j in out_arcs.get((i, p), ()) if j in targets]
+
 # Decision variables
 x = m.addVars(arcs, lb=0.0, name="x")                      # flow on arcs (i,j,p)
 z = m.addVars([(j,p) for j in (M + W) for p in P], lb=0.0, name="z")  # produced/handled at M and W
@@ -113,7 +237,7 @@ y = m.addVars((M + W), vtype=GRB.BINARY, name="y")         # open facility
 # Objective components
 C_P = gp.quicksum( cP.get((i,p), 0.0) * x[i,j,p]
                    for (i,j,p) in arcs
-                   if i in S and j in (M+W) )
+                   if i in S_set and (j in M_set or j in W_set) )
 
 # C^M: manufacturing/handling cost 
 C_M = gp.quicksum( cM.get((j,p), 0.0) * z[j,p] for j in (M+W) for p in P )
@@ -136,10 +260,7 @@ m.setObjective(C_P + C_M + C_T + C_F, GRB.MINIMIZE)
 # $\sum_{i \in W} x_{ijp} = d_{jp} \quad \forall j \in C, p \in P$
 for j in C:
     for p in P:
-        m.addConstr(gp.quicksum(
-            x[(i, j, p)]
-            for i in W
-            ) 
+        m.addConstr(gp.quicksum(arcs_in(j, p, W_set))
             == 
             d.get((j,p), 0.0),name=f"demand_{j}_{p}")
 
@@ -149,61 +270,101 @@ for j in C:
 for j in W:
     for p in P:
         m.addConstr(
-            gp.quicksum(x[(i,j,p)] for i in (S+M)) 
+            gp.quicksum(arcs_in(j, p, S_set | M_set))
             == 
             z[(j,p)]
             , name=f"wh_in_{j}_{p}")
         m.addConstr(
             z[(j,p)] 
             == 
-            gp.quicksum(x[(j,k,p)] for k in C)
+            gp.quicksum(arcs_out(j, p, C_set))
             , name=f"wh_out_{j}_{p}")
 
 # 3. Flow Conservation in Manufacturing Plants
 # $\sum_{i \in S} x_{ijq} = \sum_{p \in P} a_{qp} \cdot z_{jp} \quad \forall j \in M, q \in P$
 # $z_{jp} = \sum_{k \in W} x_{jkp} \quad \forall j \in M, p \in P$
+# Material balances of a plant: one row per BOM material, built from the CSR rows
 for j in M:
-    ## TODO !!! implement bill of materials 
-    # for q in P:
-    #     m.addConstr(
-    #         gp.quicksum(x[(i, j, q)] for i in S)
-    #         ==
-    #         gp.quicksum(a[q, p] * z[(j, p)] for p in P),
-    #         name=f"mf_inout_{j}_{q}"
-    #     )
+    z_j = [z[j, p] for p in P]
+    for n, q in enumerate(materials):
+        lo, hi = bom_indptr[n], bom_indptr[n + 1]
+        m.addLConstr(
+            gp.quicksum(arcs_in(j, q, S_set)),
+            GRB.EQUAL,
+            gp.LinExpr(bom_vals[lo:hi].tolist(), [z_j[c] for c in bom_cols[lo:hi]]),
+            name=f"mf_inout_{j}_{q}"
+        )
     for p in P:
         m.addConstr(
             z[(j, p)]
-            == gp.quicksum(x[(j, k, p)] for k in W),
+            == gp.quicksum(arcs_out(j, p, W_set)),
             name=f"mf_out_{j}_{p}"
         )
 
 # 4. Manufacturing/Handling Capacity
 # $\sum_{p \in P} r_{jp} \cdot z_{jp} \leq b_j^{M/H} \cdot y_j \quad \forall j \in (M \cup W)$
+# (b_j^{M/H} capped at the largest load the propagated bounds allow)
+cap_MH = { j: min(b_MH[j], sum(r[(j,p)] * U[j,p] for p in P)) for j in (M + W) }
 for j in M + W:
     m.addConstr(
         gp.quicksum(r[(j, p)] * z[(j, p)] for p in P)
-        <= b_MH[j] * y[j],
+        <= cap_MH[j] * y[j],
         name=f"cap_{j}"
     )
 
 # Add Big-M: z_{j p} <= M_{j p} * y_j for tightening
+# M_{j p} = min(b_MH[j] / r_{j p}, U_{j p})
 for j in (M + W):
     for p in P:
-        r_jp = r.get((j,p), None)
-        Mjp = b_MH.get(j, 1e6) / r_jp
+        Mjp = U[j,p]
         m.addConstr(z[j,p] <= Mjp * y[j], name=f"bigM_{j}_{p}")
 
 # 5. Supply Capacity
 # $\sum_{k \in (M \cup W)} x_{jkp} \leq b_{jp}^S \quad \forall j \in S, p \in P$
+# (over products and BOM materials a supplier has arcs for; no b_s_p entry means no supply)
 for j in S:
-    for p in P:
+    for p in sorted(set(P) | set(materials)):
+        if not out_arcs.get((j, p)):
+            continue
         m.addConstr(
-            gp.quicksum(x[(j, k, p)] for k in M + W)
-            <= b_s_p[j, p],
+            gp.quicksum(arcs_out(j, p, M_set | W_set))
+            <= b_s_p.get((j, p), 0.0),
             name=f"supp_{j}_{p}"
         )
 
 
+### Relaxation gap before / after the bound propagation
+# The same model with the capacity-only big-Ms, for comparison
+m.update()
+loose = m.copy()
+for j in (M + W):
+    loose.chgCoeff(loose.getConstrByName(f"cap_{j}"), loose.getVarByName(y[j].VarName), -b_MH[j])
+    for p in P:
+        loose.chgCoeff(loose.getConstrByName(f"bigM_{j}_{p}"), loose.getVarByName(y[j].VarName),
+                       -b_MH[j] / r[(j,p)])
+loose.update()
+
+def lp_bound(model):
+    relaxed = model.relax()
+    relaxed.setParam("OutputFlag", 0)
+    relaxed.optimize()
+    return relaxed.ObjVal if relaxed.Status == GRB.OPTIMAL else None
+
+lp_before = lp_bound(loose)
+lp_after = lp_bound(m)
+
 m.optimize()
+if confirm_infeasible(m):
+    print("✗ STATUS: INFEASIBLE")
+    print_iis(diagnose(m), rows)
+    sys.exit(1)
+
+print("\nRelaxation gap (big-M from capacity only -> propagated bounds):")
+if m.Status == GRB.OPTIMAL and lp_before is not None and lp_after is not None:
+    gap = lambda lp: (m.ObjVal - lp) / abs(m.ObjVal) if m.ObjVal else 0.0
+    print(f"  MIP optimum:      {m.ObjVal:,.2f}")
+    print(f"  LP bound before:  {lp_before:,.2f}  (gap {gap(lp_before):.2%})")
+    print(f"  LP bound after:   {lp_after:,.2f}  (gap {gap(lp_after):.2%})")
+else:
+    print(f"  no optimal solution (status {m.Status}); LP bounds before / after: {lp_before} / {lp_after}")
 
@@ -0,0 +1,246 @@
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from extract import CHUNK_ROWS
+from scaling import row_scale
+
+# ============================================================================
+# RESULT EXPORT TO EXCEL
+# ============================================================================
+# Writes optimization results to a multi-sheet .xlsx for planners:
+#
+#   Summary      objective values (and the cost parts of integrate.py)
+#   Pareto       objective values of every Pareto point (results store runs)
+#   Breakdown    cost and emissions per variable group
+#   Utilization  load / capacity of every capacitated facility
+#   Flows <grp>  one sheet per flow stage (X_pck, Y_cok, ...)
+#
+# Workbooks are written with xlsxwriter in constant_memory mode: each row is
+# flushed to the sheet's temp file as soon as the next one starts, and flows
+# arrive in chunks (SolutionLayout.iter_extract, or a cursor over the
+# results store), so memory stays flat however many flows a solution has.
+# Sheets that reach Excel's row limit continue in 'Flows <grp> (2)', ...
+#
+#   python export.py results.xlsx --workbook supply_chain_data.xlsx
+#   python export.py pareto.xlsx --store pareto_results.sqlite --run 20250101-120000-abc123
+
+EXCEL_MAX_ROWS = 1_048_576
+FLOW_COLUMNS = ['origin', 'destination', 'product', 'flow', 'cost', 'emissions']
+POINT_COLUMNS = ['scenario', 'curve', 'point']
+
+
+# ============================================================================
+# FACILITY UTILIZATION
+# ============================================================================
+
+class CapacityLayout:
+    """
+    Capacity rows of a built model, read once. Each row has the form
+    load terms - capacity x W <= rhs (W an optional binary opening variable),
+    so the capacity of a facility is rhs + its W coefficient negated.
+    `rows` maps (family, facility) -> Constr. Rows of a model scaled by
+    scaling.py are divided by their factor (W is a binary, never scaled).
+    """
+
+    def __init__(self, m, rows):
+        from gurobipy import GRB
+
+        m.update()
+        self.keys = list(rows)
+        self.row_scale = row_scale(m, [c.index for c in rows.values()])
+        self.rhs = np.array([c.RHS for c in rows.values()], dtype=np.float64)
+        self.w_coef = np.zeros(len(self.keys))
+        self.w_vars = [None] * len(self.keys)
+        owner, coef, variables = [], [], []
+        for r, constr in enumerate(rows.values()):
+            row = m.getRow(constr)
+            for i in range(row.size()):
+                v, a = row.getVar(i), row.getCoeff(i)
+                if v.VType == GRB.BINARY:
+                    self.w_vars[r], self.w_coef[r] = v, a
+                else:
+                    owner.append(r)
+                    coef.append(a)
+                    variables.append(v)
+        self.owner = np.array(owner, dtype=np.int64)
+        self.coef = np.array(coef, dtype=np.float64)
+        self.variables = variables
+
+    def evaluate(self, m):
+        """Utilization of the current solution of `m` as a DataFrame."""
+        x = np.asarray(m.getAttr('X', self.variables), dtype=np.float64) if self.variables else np.zeros(0)
+        load = np.bincount(self.owner, weights=self.coef * x, minlength=len(self.keys)) / self.row_scale
+        has_w = [v is not None for v in self.w_vars]
+        w = np.ones(len(self.keys))
+        if any(has_w):
+            w[has_w] = m.getAttr('X', [v for v in self.w_vars if v is not None])
+        capacity = (self.rhs - self.w_coef) / self.row_scale
+        with np.errstate(divide='ignore', invalid='ignore'):
+            utilization = np.where(capacity > 0, load / capacity, np.nan)
+        return pd.DataFrame({'family': [k[0] for k in self.keys], 'facility': [k[1] for k in self.keys],
+                             'open': np.round(w), 'load': load, 'capacity': capacity,
+                             'utilization': utilization})
+
+
+# ============================================================================
+# STREAMING WORKBOOK
+# ============================================================================
+
+class _Table:
+    """Rows of one logical table, continued on new sheets at the row limit."""
+
+    def __init__(self, book, name, columns):
+        self.book, self.name, self.columns = book, name, list(columns)
+        self.parts = 0
+        self.rows = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.parts += 1
+        title = self.name if self.parts == 1 else f"{self.name} ({self.parts})"
+        self.ws = self.book.wb.add_worksheet(title[:31])
+        self.ws.freeze_panes(1, 0)
+        for col, name in enumerate(self.columns):
+            self.ws.set_column(col, col, max(12, len(str(name)) + 2),
+                               self.book.number if name in self.book.numeric else None)
+        self.ws.write_row(0, 0, self.columns, self.book.header)
+        self.row = 1
+
+    def append(self, values):
+        if self.row == EXCEL_MAX_ROWS:
+            self._new_sheet()
+        self.ws.write_row(self.row, 0, values)
+        self.row += 1
+        self.rows += 1
+
+    def extend(self, rows):
+        for values in rows:
+            self.append(values)
+
+    def write_frame(self, frame):
+        """Append a DataFrame whose columns are the table's columns."""
+        frame = frame[self.columns]
+        self.extend(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
+
+
+class ResultWorkbook:
+    """
+    Write-once .xlsx of result tables in constant memory. Usable as a
+    context manager; the file is completed on exit.
+    """
+
+    def __init__(self, path):
+        import xlsxwriter
+
+        self.path = path
+        self.wb = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True,
+                                              'strings_to_urls': False, 'strings_to_formulas': False})
+        self.header = self.wb.add_format({'bold': True, 'bg_color': '#D9E1F2', 'border': 1})
+        self.number = self.wb.add_format({'num_format': '#,##0.00'})
+        self.numeric = {'flow', 'cost', 'emissions', 'load', 'capacity', 'epsilon', 'env', 'value'}
+        self.tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.wb.close()
+
+    def table(self, name, columns):
+        self.tables[name] = _Table(self, name, columns)
+        return self.tables[name]
+
+    def write_frame(self, name, frame):
+        self.table(name, frame.columns).write_frame(frame)
+
+
+# ============================================================================
+# EXPORTS
+# ============================================================================
+
+def export_solution(path, m, layout, roles, capacity=None, summary=None, chunk_rows=CHUNK_ROWS):
+    """
+    Export the current solution of a built model: `layout` is its
+    extract.SolutionLayout, `roles` the model's VARIABLE_ROLES, `capacity`
+    an optional CapacityLayout and `summary` optional (item, value) rows.
+    Returns {sheet name: rows written}.
+    """
+    # Groups keyed by a facility alone are the opening decisions, reported under Utilization
+    groups = {g for g in layout.group_names if tuple(roles.get(g, ())) != ('origin',)}
+    totals = {}
+    with ResultWorkbook(path) as book:
+        book.table('Summary', ['item', 'value']).extend(summary or [])
+        breakdown = book.table('Breakdown', ['group', 'cost', 'emissions'])
+        if capacity is not None:
+            book.write_frame('Utilization', capacity.evaluate(m))
+        sheets = {}
+        for group, chunk in layout.iter_extract(m, chunk_rows=chunk_rows):
+            totals[group] = totals.get(group, 0.0) + chunk[['cost', 'emissions']].sum().to_numpy()
+            if group in groups:
+                if group not in sheets:
+                    sheets[group] = book.table(f"Flows {group}", FLOW_COLUMNS)
+                sheets[group].write_frame(chunk)
+        breakdown.extend((g, float(c), float(e)) for g, (c, e) in totals.items())
+        return {name: t.rows for name, t in book.tables.items()}
+
+
+def export_run(path, store, run_id=None, chunk_rows=CHUNK_ROWS):
+    """
+    Export a Pareto run from a results_store.ResultsStore: the Pareto table,
+    the per-point breakdown and utilization, and the flows of every point
+    (one sheet per variable group, streamed from the database).
+    Returns {sheet name: rows written}.
+    """
+    run_id = run_id or store.latest_run()
+    with ResultWorkbook(path) as book:
+        book.write_frame('Pareto', store.points(run_id))
+        book.write_frame('Breakdown', store.breakdown(run_id))
+        book.write_frame('Utilization', store.utilization(run_id))
+        for group in store.flow_groups(run_id):
+            book.table(f"Flows {group}", POINT_COLUMNS + FLOW_COLUMNS).extend(
+                store.iter_flows(group, run_id, chunk_rows))
+        return {name: t.rows for name, t in book.tables.items()}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export optimization results to an Excel workbook.")
+    parser.add_argument('output', help=".xlsx file to write")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--workbook', help="solve integrate.py on this input workbook and export the solution")
+    source.add_argument('--store', help="results store (SQLite) of a Pareto run")
+    parser.add_argument('--run', help="run id in the store (default: latest)")
+    parser.add_argument('--distance-store', help="on-disk DistanceStore instead of the Distance_Matrix sheet")
+    args = parser.parse_args(argv)
+
+    if args.workbook:
+        from integrate import solve_circular_supply_chain_model
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            status, _, _ = solve_circular_supply_chain_model(excel_file=args.workbook,
+                                                             distance_store=args.distance_store,
+                                                             export_path=args.output)
+        if status != 'Optimal':
+            print(f"✗ STATUS: {status}, nothing exported")
+            return 1
+    else:
+        from results_store import ResultsStore
+
+        with ResultsStore(args.store) as store:
+            for name, rows in export_run(args.output, store, args.run).items():
+                print(f"  {name}: {rows:,} rows")
+    print(f"✓ Results written to: {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from scaling import column_scale
+
+# ============================================================================
+# SOLUTION EXTRACTION
+# ============================================================================
+# Pulls a solved model's variable values into one tidy DataFrame:
+#
+#   group | origin | destination | product | flow | cost | emissions
+#
+# `cost` and `emissions` are each variable's contribution (coefficient in the
+# cost / emission expression x value), so grouping and summing them
+# reproduces the objective values. The expensive part, walking the model
+# layout and the objective expressions, is done once per built model in
+# SolutionLayout; each extraction is then one getAttr('X') call per variable
+# group plus NumPy arithmetic. Models scaled by scaling.py report flows in
+# model units (their expressions must be the rewritten ones).
+
+KEY_COLUMNS = ('origin', 'destination', 'product')
+CHUNK_ROWS = 100_000        # variables per chunk in SolutionLayout.iter_extract
+
+
+def expression_coefficients(expr, num_vars):
+    """
+    Per-variable coefficients of a LinExpr as a dense array indexed by
+    Var.index (duplicate terms are summed, the constant is ignored).
+    """
+    coef = np.zeros(num_vars)
+    if expr is None or not hasattr(expr, 'size'):
+        return coef
+    n = expr.size()
+    idx = np.fromiter((expr.getVar(i).index for i in range(n)), dtype=np.int64, count=n)
+    val = np.fromiter((expr.getCoeff(i) for i in range(n)), dtype=np.float64, count=n)
+    np.add.at(coef, idx, val)
+    return coef
+
+
+class SolutionLayout:
+    """
+    Index layout of a built model's variable groups, computed once.
+    `groups` maps group name -> tupledict of variables, `roles` maps group
+    name -> tuple naming each key position ('origin', 'destination' or
+    'product'); `cost_expr` / `env_expr` are the model's objective expressions.
+    """
+
+    def __init__(self, m, groups, roles, cost_expr=None, env_expr=None):
+        m.update()
+        # Flow per scaled variable value, and cost / emissions per unit of flow
+        self.flow_scale = column_scale(m, np.arange(m.NumVars))
+        self.cost_coef = expression_coefficients(cost_expr, m.NumVars) / self.flow_scale
+        self.env_coef = expression_coefficients(env_expr, m.NumVars) / self.flow_scale
+
+        raw = []
+        labels = {col: [] for col in KEY_COLUMNS}
+        for name, td in groups.items():
+            keys = list(td.keys())
+            variables = list(td.values())
+            idx = np.fromiter((v.index for v in variables), dtype=np.int64, count=len(variables))
+            columns = {}
+            if keys:
+                parts = list(zip(*[k if isinstance(k, tuple) else (k,) for k in keys]))
+                for col, values in zip(roles[name], parts):
+                    columns[col] = np.asarray(values, dtype=object)
+                    labels[col].append(pd.unique(columns[col]))
+            raw.append((name, variables, idx, columns))
+
+        # Shared categories so per-group frames concatenate as categoricals
+        self.categories = {col: pd.Index(np.concatenate(v) if v else []).unique()
+                           for col, v in labels.items()}
+        self.group_names = pd.Index([name for name, _, _, _ in raw])
+        self.groups = []
+        for g, (name, variables, idx, columns) in enumerate(raw):
+            codes = {col: (self.categories[col].get_indexer(columns[col]) if col in columns
+                           else np.full(len(idx), -1))
+                     for col in KEY_COLUMNS}
+            self.groups.append((g, variables, idx, codes))
+
+    def extract(self, m, drop_zeros=True, tol=1e-9):
+        """
+        Current solution of `m` as a tidy DataFrame (one row per variable,
+        zero-valued variables dropped unless drop_zeros=False).
+        """
+        group_codes, flows, idxs = [], [], []
+        key_codes = {col: [] for col in KEY_COLUMNS}
+        for g, variables, idx, codes in self.groups:
+            if not variables:
+                continue
+            x = np.asarray(m.getAttr('X', variables), dtype=np.float64) * self.flow_scale[idx]
+            keep = np.abs(x) > tol if drop_zeros else np.ones(len(x), dtype=bool)
+            group_codes.append(np.full(int(keep.sum()), g))
+            flows.append(x[keep])
+            idxs.append(idx[keep])
+            for col in KEY_COLUMNS:
+                key_codes[col].append(codes[col][keep])
+
+        flow = np.concatenate(flows) if flows else np.zeros(0)
+        idx = np.concatenate(idxs) if idxs else np.zeros(0, dtype=np.int64)
+        frame = {'group': pd.Categorical.from_codes(
+            np.concatenate(group_codes) if group_codes else np.zeros(0, dtype=np.int64), self.group_names)}
+        for col in KEY_COLUMNS:
+            codes = np.concatenate(key_codes[col]) if key_codes[col] else np.zeros(0, dtype=np.int64)
+            frame[col] = pd.Categorical.from_codes(codes, self.categories[col])
+        frame['flow'] = flow
+        frame['cost'] = flow * self.cost_coef[idx]
+        frame['emissions'] = flow * self.env_coef[idx]
+        return pd.DataFrame(frame)
+
+    def iter_extract(self, m, chunk_rows=CHUNK_ROWS, drop_zeros=True, tol=1e-9):
+        """
+        Current solution of `m` as (group name, DataFrame) chunks of at most
+        `chunk_rows` variables, in layout order. Frames have the columns of
+        extract() except 'group'; only one chunk is held at a time.
+        """
+        for g, variables, idx, codes in self.groups:
+            for start in range(0, len(variables), chunk_rows):
+                stop = start + chunk_rows
+                x = np.asarray(m.getAttr('X', variables[start:stop]), dtype=np.float64) * self.flow_scale[idx[start:stop]]
+                keep = np.abs(x) > tol if drop_zeros else np.ones(len(x), dtype=bool)
+                if not keep.any():
+                    continue
+                frame = {col: pd.Categorical.from_codes(codes[col][start:stop][keep], self.categories[col])
+                         for col in KEY_COLUMNS}
+                chunk_idx = idx[start:stop][keep]
+                frame['flow'] = x[keep]
+                frame['cost'] = x[keep] * self.cost_coef[chunk_idx]
+                frame['emissions'] = x[keep] * self.env_coef[chunk_idx]
+                yield self.group_names[g], pd.DataFrame(frame)
+
+
+def point_path(root, **keys):
+    """Hive-style path root/key=value/.../flows.parquet for one solution point."""
+    return os.path.join(root, *[f'{k}={v}' for k, v in keys.items()], 'flows.parquet')
+
+
+def write_flows(frame, path):
+    """Write an extracted solution to Parquet, creating parent directories."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    frame.to_parquet(path, index=False)
+    return path
@@ -0,0 +1,328 @@
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+from typing import NamedTuple
+
+import numpy as np
+
+from dataset import open_workbook
+
+# ============================================================================
+# FEASIBILITY SCREENING AND INFEASIBILITY DIAGNOSIS
+# ============================================================================
+# Two cheap layers around a full build and solve:
+#
+# * Screening, before the model is built: aggregate capacity against the flow
+#   that must pass each stage (demand / returns without slack) and
+#   reachability over the arc set. Errors prove the model infeasible, so the
+#   build can be skipped; warnings flag data that only forces shortage or
+#   keeps a facility closed.
+# * Diagnosis, after an infeasible solve: an IIS, computed once per model and
+#   cached under IIS_CACHE_DIR by the model's Fingerprint (a hash of its
+#   data), with the offending constraints mapped back to the sheet rows they
+#   were built from. The IIS is also written there as an .ilp file.
+#
+#   python feasibility.py supply_chain_data.xlsx
+#   python feasibility.py supply_chain_data.xlsx --epsilon -1 --iis
+
+IIS_CACHE_DIR = '.iis_cache'
+MAX_LISTED_BOUNDS = 10       # variable bounds printed per IIS
+
+# Sheet rows each integrate.py constraint family is built from:
+# family -> [(sheet, header row, {column: position in the constraint key, or a literal})]
+INTEGRATE_SHEET_ROWS = {
+    'Env_Limit': [('Parameters', 2, {'Parameter': 'Epsilon Limit'})],
+    'Demand': [('Customers', 3, {'Customer Code': 0, 'Product Type': 1})],
+    'Returns': [('Customers', 3, {'Customer Code': 0, 'Product Type': 1})],
+    'Collection_Balance': [('Collection_Centers', 3, {'Code': 0})],
+    'Reuse_Mix': [('Collection_Centers', 3, {'Code': 0}), ('Parameters', 2, {'Parameter': 'Reuse Capacity'})],
+    'Refurb_Mix': [('Collection_Centers', 3, {'Code': 0}),
+                   ('Parameters', 2, {'Parameter': 'Refurbishment Capacity'})],
+    'Plant_Balance': [('Plants', 3, {'Plant Code': 0})],
+    'Refurb_Yield': [('Refurbishment_Centers', 3, {'Code': 0})],
+    'Recycle_Yield': [('Recycling_Centers', 3, {'Code': 0}), ('Materials', 3, {'Material': 1})],
+    'Cap_O': [('Collection_Centers', 3, {'Code': 0})],
+    'Cap_F': [('Refurbishment_Centers', 3, {'Code': 0})],
+    'Cap_R': [('Recycling_Centers', 3, {'Code': 0})],
+}
+
+
+class Issue(NamedTuple):
+    """One screening finding, keyed like the constraint it concerns."""
+    severity: str       # 'error' (model is infeasible) or 'warning'
+    check: str          # 'data', 'capacity' or 'reachability'
+    family: str         # constraint family
+    key: tuple          # index within the family; () for a whole stage
+    message: str
+
+
+def parse_name(name):
+    """'Family[a,b]' -> ('Family', ('a', 'b')); other names -> (name, ())."""
+    match = re.fullmatch(r'(.+?)\[(.*)\]', name)
+    if not match:
+        return name, ()
+    return match.group(1), tuple(match.group(2).split(','))
+
+
+def _ranges(rows):
+    """Compress sorted row numbers: [5, 6, 7, 9] -> ['5:7', '9']."""
+    out = []
+    for r in rows:
+        if out and r == out[-1][1] + 1:
+            out[-1][1] = r
+        else:
+            out.append([r, r])
+    return [str(a) if a == b else f"{a}:{b}" for a, b in out]
+
+
+class SheetRows:
+    """
+    Maps constraints to the workbook rows they were built from. `sources`
+    maps a family to [(sheet, header, {column: key position or literal})];
+    a row matches when every column equals its key entry. Key positions past
+    the end of a short key (stage-level issues) match any row.
+    """
+
+    def __init__(self, book, sources, parse=parse_name):
+        self._book = book
+        self.sources = sources
+        self.parse = parse
+        self._frames = {}
+
+    @property
+    def book(self):
+        """The workbook, opened on first use (only when there is something to report)."""
+        if not hasattr(self._book, 'parse'):
+            self._book = open_workbook(self._book)
+        return self._book
+
+    def _frame(self, sheet, header):
+        if (sheet, header) not in self._frames:
+            df = self.book.parse(sheet, header=header)
+            df.columns = [str(c).strip() for c in df.columns]
+            self._frames[sheet, header] = df
+        return self._frames[sheet, header]
+
+    def rows(self, family, key):
+        """Sheet references ('Sheet!5:7') of one constraint."""
+        refs = []
+        for sheet, header, match in self.sources.get(family, ()):
+            if sheet not in self.book.sheet_names:
+                continue
+            df = self._frame(sheet, header)
+            mask = np.ones(len(df), dtype=bool)
+            for col, ref in match.items():
+                if isinstance(ref, int) and ref >= len(key):
+                    continue
+                value = key[ref] if isinstance(ref, int) else ref
+                if col not in df:
+                    mask[:] = False
+                    break
+                mask &= (df[col].astype(str).str.strip() == str(value)).to_numpy()
+            found = np.flatnonzero(mask) + header + 2
+            refs += [f"{sheet}!{r}" for r in _ranges(found.tolist())]
+        return refs
+
+    def constraint_rows(self, name):
+        return self.rows(*self.parse(name))
+
+
+# ============================================================================
+# REACHABILITY AND STAGE CAPACITY
+# ============================================================================
+
+def reaching(arcs, targets):
+    """Nodes with a path over `arcs` ((i, j) pairs) into `targets` (targets included)."""
+    into = {}
+    for i, j in arcs:
+        into.setdefault(j, []).append(i)
+    seen = set(targets)
+    stack = list(seen)
+    while stack:
+        for i in into.get(stack.pop(), ()):
+            if i not in seen:
+                seen.add(i)
+                stack.append(i)
+    return seen
+
+
+def stage_capacity(family, need, capacity, what, severity='error'):
+    """Issue when a stage's total `capacity` is below the flow it must carry."""
+    if need > capacity + 1e-9 * max(1.0, abs(need)):
+        return Issue(severity, 'capacity', family, (),
+                     f"{what}: {need:,.2f} must pass, capacity {capacity:,.2f}")
+    return None
+
+
+def _negative(values, family, what, severity='error', effect=''):
+    return [Issue(severity, 'data', family, key if isinstance(key, tuple) else (key,),
+                  f"{what} {value:g} is negative{effect}")
+            for key, value in values.items() if value < 0]
+
+
+def screen_integrate(data):
+    """Screen an integrate.py data dictionary (see read_excel_data)."""
+    issues = _negative(data['DEM'], 'Demand', 'demand')
+    issues += _negative(data['RET'], 'Returns', 'returns')
+    # load <= CAP x W holds with W = 0, so a negative capacity only keeps the facility closed
+    for family, cap in (('Cap_O', 'CAP_o'), ('Cap_F', 'CAP_f'), ('Cap_R', 'CAP_r')):
+        issues += _negative(data[cap], family, 'capacity', 'warning', ": the facility can never open")
+    # With the shortage slack every constraint but the emission cap holds at
+    # zero flow, and zero flow emits nothing
+    if not data.get('minimize_emissions_only') and data['epsilon_limit'] < 0:
+        issues.append(Issue('error', 'data', 'Env_Limit', (),
+                            f"emission limit {data['epsilon_limit']:g} is below the minimum of 0"))
+    returns = sum(max(v, 0.0) for v in data['RET'].values()) * data['omega'][data['K'][0]]
+    if returns > 0 and not data['O']:
+        issues.append(Issue('warning', 'reachability', 'Returns', (), "returns but no collection centers"))
+    issue = stage_capacity('Cap_O', returns, sum(data['CAP_o'].values()), "returns (kg) to collection",
+                           severity='warning')
+    if issue:
+        issues.append(issue)
+    return issues
+
+
+def screen_scenario(P, O, F, L, DEM, RET, CAP, reuse_limit, alpha):
+    """
+    Screen an anu_combine_model scenario: all returns must be collected
+    (Returns is an equality), and collected units must leave the collection
+    centers through reuse, refurbishment or landfill.
+    """
+    issues = _negative(DEM, 'Demand', 'demand') + _negative(RET, 'Returns', 'returns')
+    returns = sum(max(v, 0.0) for v in RET.values())
+    if returns <= 0:
+        return issues
+    if not O:
+        return issues + [Issue('error', 'reachability', 'Returns', (), "returns but no collection centers")]
+    issue = stage_capacity('Cap_O', returns, sum(CAP.get(o, 1e12) for o in O), "returns to collection")
+    if issue:
+        issues.append(issue)
+    if not L:
+        # Without landfills everything not reused is refurbished, and refurbishment waste has nowhere to go
+        to_refurb = (1 - reuse_limit) * returns
+        if to_refurb > 0:
+            if not F or not P or all(alpha[f] < 1 for f in F):
+                issues.append(Issue('error', 'reachability', 'Refurb_Waste', (),
+                                    f"{to_refurb:,.2f} returns cannot be reused and there is no landfill"))
+            else:
+                issue = stage_capacity('Cap_F', to_refurb, sum(CAP.get(f, 1e12) for f in F),
+                                       "returns to refurbishment")
+                if issue:
+                    issues.append(issue)
+    demand = sum(max(v, 0.0) for v in DEM.values())
+    supply = sum(CAP.get(p, 1e12) for p in P) + reuse_limit * returns
+    issue = stage_capacity('Demand', demand, supply, "demand vs plant capacity and reuse", severity='warning')
+    if issue:
+        issues.append(issue)
+    return issues
+
+
+def print_issues(issues, rows=None):
+    """Print screening issues (with sheet rows when a SheetRows is given)."""
+    for issue in issues:
+        mark = '✗' if issue.severity == 'error' else '!'
+        where = f"{issue.family}[{','.join(map(str, issue.key))}]" if issue.key else issue.family
+        refs = rows.rows(issue.family, tuple(map(str, issue.key))) if rows is not None else []
+        print(f"  {mark} {issue.check} {where}: {issue.message}" + (f"  ({', '.join(refs)})" if refs else ""))
+
+
+def has_errors(issues):
+    return any(issue.severity == 'error' for issue in issues)
+
+
+# ============================================================================
+# IIS
+# ============================================================================
+
+def confirm_infeasible(m):
+    """
+    True if a solved model is infeasible. An INF_OR_UNBD status is resolved
+    by re-solving without dual reductions.
+    """
+    from gurobipy import GRB
+
+    if m.Status == GRB.INF_OR_UNBD:
+        reductions = m.Params.DualReductions
+        m.Params.DualReductions = 0
+        m.optimize()
+        m.Params.DualReductions = reductions
+    return m.Status == GRB.INFEASIBLE
+
+
+def diagnose(m, cache_dir=IIS_CACHE_DIR):
+    """
+    IIS of an infeasible model as {'constraints': [...], 'bounds': [...],
+    'cached': bool}. Results are cached per model fingerprint, so re-running
+    the same data skips computeIIS.
+    """
+    m.update()
+    key = f"{re.sub(r'[^A-Za-z0-9]+', '_', m.ModelName) or 'model'}_{m.Fingerprint & 0xFFFFFFFF:08x}"
+    path = os.path.join(cache_dir, key + '.json')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as fh:
+            return {**json.load(fh), 'cached': True}
+
+    m.computeIIS()
+    constrs, variables = m.getConstrs(), m.getVars()
+    result = {
+        'constraints': [c.ConstrName for c, flag in zip(constrs, m.getAttr('IISConstr', constrs)) if flag],
+        'bounds': [v.VarName for v, lb, ub in zip(variables, m.getAttr('IISLB', variables),
+                                                   m.getAttr('IISUB', variables)) if lb or ub],
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    m.write(os.path.join(cache_dir, key + '.ilp'))
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(result, fh, indent=2)
+    return {**result, 'cached': False}
+
+
+def print_iis(iis, rows=None):
+    """Print an IIS from diagnose(), constraint by constraint with sheet rows."""
+    print(f"  IIS: {len(iis['constraints'])} constraints, {len(iis['bounds'])} bounds"
+          + (" (cached)" if iis['cached'] else ""))
+    for name in iis['constraints']:
+        refs = rows.constraint_rows(name) if rows is not None else []
+        print(f"    {name}" + (f"  ({', '.join(refs)})" if refs else ""))
+    if iis['bounds']:
+        shown = iis['bounds'][:MAX_LISTED_BOUNDS]
+        more = len(iis['bounds']) - len(shown)
+        print(f"    bounds: {', '.join(shown)}" + (f", ... ({more} more)" if more else ""))
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Screen an integrate.py workbook for infeasibility.")
+    parser.add_argument('workbook', nargs='?', default='supply_chain_data.xlsx')
+    parser.add_argument('--epsilon', type=float, help="emission limit instead of the workbook's")
+    parser.add_argument('--iis', action='store_true', help="also build and solve, and diagnose if infeasible")
+    parser.add_argument('--distance-store', help="on-disk DistanceStore instead of the Distance_Matrix sheet")
+    args = parser.parse_args(argv)
+
+    from integrate import build_circular_supply_chain_model, read_excel_data
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = read_excel_data(args.workbook, distance_store=args.distance_store)
+    if args.epsilon is not None:
+        data['epsilon_limit'] = args.epsilon
+    rows = SheetRows(args.workbook, INTEGRATE_SHEET_ROWS)
+    issues = screen_integrate(data)
+    print_issues(issues, rows)
+    print(f"✓ Screening: {sum(i.severity == 'error' for i in issues)} errors, "
+          f"{sum(i.severity == 'warning' for i in issues)} warnings")
+    if args.iis:
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = build_circular_supply_chain_model(data)
+            model['m'].optimize()
+        if confirm_infeasible(model['m']):
+            print_iis(diagnose(model['m']), rows)
+        else:
+            print(f"→ Solve status {model['m'].Status}, no IIS needed")
+    return 1 if has_errors(issues) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,58 @@
+from itertools import product
+
+import numpy as np
 import pandas as pd
-from gurobipy import *
+from gurobipy import GRB, Model
+
+from dataset import open_workbook
+from distance_store import DistanceStore, coordinates_from_frame
+from extract import SolutionLayout, write_flows
+from tuning import apply_profile
+
+# Distance used for routes missing from the Distance_Matrix sheet (km)
+DEFAULT_DISTANCE_KM = 50.0
+
+# (origin set, destination set) of every transport flow in the model
+TRANSPORT_STAGES = [('P', 'C'), ('C', 'O'), ('O', 'C'), ('O', 'F'), ('O', 'R'), ('O', 'L'), ('F', 'P'), ('R', 'S')]
+
+# Meaning of each index position of the variable groups (for solution extraction)
+VARIABLE_ROLES = {
+    'X_pk': ('origin', 'product'),
+    'X_pck': ('origin', 'destination', 'product'),
+    'Y_cok': ('origin', 'destination', 'product'),
+    'Y_ock': ('origin', 'destination', 'product'),
+    'Y_ofk': ('origin', 'destination', 'product'),
+    'Y_ork': ('origin', 'destination', 'product'),
+    'Y_olk': ('origin', 'destination', 'product'),
+    'Y_fpk': ('origin', 'destination', 'product'),
+    'S_ck': ('destination', 'product'),
+    'Z_rsm': ('origin', 'destination', 'product'),
+    'W_o': ('origin',),
+    'W_f': ('origin',),
+    'W_r': ('origin',),
+}
+
+# Constraint families of the model, each keyed like its index sets
+CONSTRAINT_FAMILIES = [
+    'Env_Limit', 'Demand', 'Returns', 'Collection_Balance', 'Reuse_Mix', 'Refurb_Mix',
+    'Plant_Balance', 'Refurb_Yield', 'Recycle_Yield', 'Cap_O', 'Cap_F', 'Cap_R',
+]
 
-def read_excel_data(filepath='supply_chain_data.xlsx'):
+def read_excel_data(filepath='supply_chain_data.xlsx', distance_store=None):
     """
     Read all supply chain parameters from Excel file.
+    `filepath` may also be a dataset directory written by dataset.py.
+    `distance_store` is an optional on-disk DistanceStore used instead of the
+    Distance_Matrix sheet (for networks too large to keep as a sheet).
     Returns a dictionary containing all model parameters.
     """
     data = {}
+    book = open_workbook(filepath)
     
     # ============================================================================
     # SHEET 1: PLANTS
     # ============================================================================
-    df_plants = pd.read_excel(filepath, sheet_name='Plants', header=3)
+    df_plants = book.parse('Plants', header=3)
     df_plants = df_plants.dropna(subset=['Plant Code'])
     
     data['P'] = df_plants['Plant Code'].tolist()
@@ -22,7 +63,7 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     # ============================================================================
     # SHEET 2: CUSTOMERS
     # ============================================================================
-    df_customers = pd.read_excel(filepath, sheet_name='Customers', header=3)
+    df_customers = book.parse('Customers', header=3)
     df_customers = df_customers.dropna(subset=['Customer Code'])
     
     data['C'] = df_customers['Customer Code'].unique().tolist()
@@ -37,7 +78,7 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     # ============================================================================
     # SHEET 3: COLLECTION CENTERS
     # ============================================================================
-    df_collection = pd.read_excel(filepath, sheet_name='Collection_Centers', header=3)
+    df_collection = book.parse('Collection_Centers', header=3)
     df_collection = df_collection.dropna(subset=['Code'])
     
     data['O'] = df_collection['Code'].tolist()
@@ -49,7 +90,7 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     # ============================================================================
     # SHEET 4: REFURBISHMENT CENTERS
     # ============================================================================
-    df_refurb = pd.read_excel(filepath, sheet_name='Refurbishment_Centers', header=3)
+    df_refurb = book.parse('Refurbishment_Centers', header=3)
     df_refurb = df_refurb.dropna(subset=['Code'])
     
     data['F'] = df_refurb['Code'].tolist()
@@ -62,7 +103,7 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     # ============================================================================
     # SHEET 5: RECYCLING CENTERS
     # ============================================================================
-    df_recycle = pd.read_excel(filepath, sheet_name='Recycling_Centers', header=3)
+    df_recycle = book.parse('Recycling_Centers', header=3)
     df_recycle = df_recycle.dropna(subset=['Code'])
     
     data['R'] = df_recycle['Code'].tolist()
@@ -75,7 +116,7 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     # ============================================================================
     # SHEET 6: LANDFILLS
     # ============================================================================
-    df_landfill = pd.read_excel(filepath, sheet_name='Landfills', header=3)
+    df_landfill = book.parse('Landfills', header=3)
     df_landfill = df_landfill.dropna(subset=['Code'])
     
     data['L'] = df_landfill['Code'].tolist()
@@ -85,7 +126,7 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     # ============================================================================
     # SHEET 7: SECONDARY MARKETS
     # ============================================================================
-    df_secondary = pd.read_excel(filepath, sheet_name='Secondary_Markets', header=3)
+    df_secondary = book.parse('Secondary_Markets', header=3)
     df_secondary = df_secondary.dropna(subset=['Code'])
     
     data['S'] = df_secondary['Code'].tolist()
@@ -93,17 +134,16 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     # ============================================================================
     # SHEET 8: DISTANCE MATRIX
     # ============================================================================
-    df_dist = pd.read_excel(filepath, sheet_name='Distance_Matrix', header=3)
-    df_dist = df_dist.dropna(subset=['From'])
-    
-    data['DIST'] = {}
-    for _, row in df_dist.iterrows():
-        data['DIST'][(row['From'], row['To'])] = float(row['Distance (km)'])
+    if distance_store is not None:
+        data['DIST'] = DistanceStore.open(distance_store, default=DEFAULT_DISTANCE_KM)
+    else:
+        df_dist = book.parse('Distance_Matrix', header=3)
+        data['DIST'] = DistanceStore.from_frame(df_dist, 'From', 'To', 'Distance (km)', default=DEFAULT_DISTANCE_KM)
     
     # ============================================================================
     # SHEET 9: REVENUES
     # ============================================================================
-    df_rev = pd.read_excel(filepath, sheet_name='Revenues')
+    df_rev = book.parse('Revenues')
     
     # Product revenues
     product_rev_start = df_rev[df_rev.iloc[:, 0] == 'Product Type'].index[0]
@@ -133,7 +173,7 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     # ============================================================================
     # SHEET 10: MATERIALS
     # ============================================================================
-    df_materials = pd.read_excel(filepath, sheet_name='Materials', header=3)
+    df_materials = book.parse('Materials', header=3)
     df_materials = df_materials.dropna(subset=['Material'])
     
     data['M'] = df_materials['Material'].tolist()
@@ -145,7 +185,7 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     # ============================================================================
     # SHEET 11: PARAMETERS
     # ============================================================================
-    df_params = pd.read_excel(filepath, sheet_name='Parameters', header=2)
+    df_params = book.parse('Parameters', header=2)
     
     param_dict = dict(zip(df_params['Parameter'], df_params['Value']))
     
@@ -160,41 +200,57 @@ def read_excel_data(filepath='supply_chain_data.xlsx'):
     data['epsilon_limit'] = float(param_dict['Epsilon Limit'])
     minimize_str = str(param_dict['Minimize Emissions Only']).upper()
     data['minimize_emissions_only'] = minimize_str == 'TRUE'
+    data['circuity'] = float(param_dict.get('Road Circuity Factor', 1.0))
+    
+    # ============================================================================
+    # SHEET 13 (optional): COORDINATES
+    # ============================================================================
+    # Routes missing from Distance_Matrix are synthesized from these
+    if 'Coordinates' in book.sheet_names:
+        df_coords = book.parse('Coordinates', header=3)
+        data['COORD'] = coordinates_from_frame(df_coords, 'Code', 'Latitude', 'Longitude')
+    else:
+        data['COORD'] = None
     
     return data
 
 
-def solve_circular_supply_chain_model(epsilon_limit=None, minimize_emissions_only=False, excel_file='supply_chain_data.xlsx'):
+def transport_distances(data):
     """
-    Solve the circular supply chain optimization model.
-    Can read from Excel or use provided parameters.
+    Distances for every route the model can use, looked up from the
+    DistanceStore in one batch per transport stage. Routes missing from the
+    distance data are synthesized from node coordinates (haversine x circuity)
+    when available, otherwise they take the store's default.
+    Returns ({(i, j): km}, number of routes synthesized, number defaulted).
+    """
+    DIST = data['DIST']
+    coords = data.get('COORD')
+    circuity = data.get('circuity', 1.0)
+    dist = {}
+    n_synth = n_default = 0
+    for a, b in TRANSPORT_STAGES:
+        origins, destinations = data[a], data[b]
+        block, n = DIST.resolve(origins, destinations, coords, circuity)
+        n_synth += n
+        n_default += int(np.isnan(block).sum())
+        block = DIST.apply_default(block)
+        for x, i in enumerate(origins):
+            for y, j in enumerate(destinations):
+                dist[i, j] = float(block[x, y])
+    return dist, n_synth, n_default
+
+
+def build_circular_supply_chain_model(data):
+    """
+    Build the optimization model from a data dictionary (see read_excel_data).
+    Variable groups and constraint families span all combinations of their
+    index sets unless data['index'] lists the keys to build (see reduction.py).
+    Returns a dictionary with the Gurobi model ('m'), the variable groups
+    ('vars'), the named constraints by family ('constrs'), the route
+    distances ('dist'), the objective
+    expressions ('Z_Cost', 'Env_Total'), the cost breakdown ('parts') and
+    the solver profile applied to the model ('profile', see tuning.py).
     """
-    
-    print("="*70)
-    print("CIRCULAR SUPPLY CHAIN OPTIMIZATION MODEL")
-    print("="*70)
-    
-    # Read data from Excel
-    if excel_file:
-        print(f"Reading data from: {excel_file}")
-        data = read_excel_data(excel_file)
-        
-        # Override with function parameters if provided
-        if epsilon_limit is not None:
-            data['epsilon_limit'] = epsilon_limit
-        if minimize_emissions_only is not None:
-            data['minimize_emissions_only'] = minimize_emissions_only
-        
-        print(f"✓ Data loaded successfully")
-        print(f"  - Plants: {len(data['P'])}")
-        print(f"  - Customers: {len(data['C'])}")
-        print(f"  - Collection Centers: {len(data['O'])}")
-        print(f"  - Refurbishment Centers: {len(data['F'])}")
-        print(f"  - Recycling Centers: {len(data['R'])}")
-        print(f"  - Landfills: {len(data['L'])}")
-        print(f"  - Secondary Markets: {len(data['S'])}")
-        print(f"  - Product Types: {len(data['K'])}")
-        print(f"  - Materials: {len(data['M'])}")
     
     # Extract all parameters
     P = data['P']
@@ -239,9 +295,13 @@ def solve_circular_supply_chain_model(epsilon_limit=None, minimize_emissions_onl
     Rev_refurb = data['Rev_refurb']
     Rev_recycle = data['Rev_recycle']
     
-    DIST = data['DIST']
+    dist, n_synth, n_default = transport_distances(data)
+    if n_synth:
+        print(f"  - {n_synth} routes synthesized from coordinates (circuity {data.get('circuity', 1.0):g})")
+    if n_default:
+        print(f"  ! {n_default} routes missing from the distance data, using {data['DIST'].default:g} km")
     def get_dist(i, j):
-        return DIST.get((i, j), 50.0)
+        return dist[i, j]
     
     E_p = data['E_p']
     E_o = data['E_o']
@@ -253,28 +313,28 @@ def solve_circular_supply_chain_model(epsilon_limit=None, minimize_emissions_onl
     epsilon_limit = data['epsilon_limit']
     minimize_emissions_only = data['minimize_emissions_only']
     
-    print("\n" + "="*70)
-    print("BUILDING OPTIMIZATION MODEL...")
-    print("="*70)
+    index = data.get('index', {})
+    def keys(name, *sets):
+        return index[name] if name in index else list(product(*sets))
     
     # --- 3. MODEL ---
     m = Model("Circular_Supply_Chain_Germany")
     m.setParam('OutputFlag', 0)
 
     # Variables
-    X_pk = m.addVars(P, K, name="X_pk", vtype=GRB.CONTINUOUS, lb=0)
-    X_pck = m.addVars(P, C, K, name="X_pck", vtype=GRB.CONTINUOUS, lb=0)
-    Y_cok = m.addVars(C, O, K, name="Y_cok", vtype=GRB.CONTINUOUS, lb=0)
-    Y_ock = m.addVars(O, C, K, name="Y_ock", vtype=GRB.CONTINUOUS, lb=0)
-    Y_ofk = m.addVars(O, F, K, name="Y_ofk", vtype=GRB.CONTINUOUS, lb=0)
-    Y_ork = m.addVars(O, R, K, name="Y_ork", vtype=GRB.CONTINUOUS, lb=0)
-    Y_olk = m.addVars(O, L, K, name="Y_olk", vtype=GRB.CONTINUOUS, lb=0)
-    Y_fpk = m.addVars(F, P, K, name="Y_fpk", vtype=GRB.CONTINUOUS, lb=0)
-    S_ck = m.addVars(C, K, name="S_ck", vtype=GRB.CONTINUOUS, lb=0)
-    Z_rsm = m.addVars(R, S, M, name="Z_rsm", vtype=GRB.CONTINUOUS, lb=0)
-    W_o = m.addVars(O, vtype=GRB.BINARY)
-    W_f = m.addVars(F, vtype=GRB.BINARY)
-    W_r = m.addVars(R, vtype=GRB.BINARY)
+    X_pk = m.addVars(keys('X_pk', P, K), name="X_pk", vtype=GRB.CONTINUOUS, lb=0)
+    X_pck = m.addVars(keys('X_pck', P, C, K), name="X_pck", vtype=GRB.CONTINUOUS, lb=0)
+    Y_cok = m.addVars(keys('Y_cok', C, O, K), name="Y_cok", vtype=GRB.CONTINUOUS, lb=0)
+    Y_ock = m.addVars(keys('Y_ock', O, C, K), name="Y_ock", vtype=GRB.CONTINUOUS, lb=0)
+    Y_ofk = m.addVars(keys('Y_ofk', O, F, K), name="Y_ofk", vtype=GRB.CONTINUOUS, lb=0)
+    Y_ork = m.addVars(keys('Y_ork', O, R, K), name="Y_ork", vtype=GRB.CONTINUOUS, lb=0)
+    Y_olk = m.addVars(keys('Y_olk', O, L, K), name="Y_olk", vtype=GRB.CONTINUOUS, lb=0)
+    Y_fpk = m.addVars(keys('Y_fpk', F, P, K), name="Y_fpk", vtype=GRB.CONTINUOUS, lb=0)
+    S_ck = m.addVars(keys('S_ck', C, K), name="S_ck", vtype=GRB.CONTINUOUS, lb=0)
+    Z_rsm = m.addVars(keys('Z_rsm', R, S, M), name="Z_rsm", vtype=GRB.CONTINUOUS, lb=0)
+    W_o = m.addVars(O, name="W_o", vtype=GRB.BINARY)
+    W_f = m.addVars(F, name="W_f", vtype=GRB.BINARY)
+    W_r = m.addVars(R, name="W_r", vtype=GRB.BINARY)
 
     m.update()
 
@@ -282,31 +342,31 @@ def solve_circular_supply_chain_model(epsilon_limit=None, minimize_emissions_onl
     Fixed_Cost = (sum(FixO[o]*W_o[o] for o in O) + sum(FixF[f]*W_f[f] for f in F) + sum(FixR[r]*W_r[r] for r in R))
 
     Op_Cost = (
-        sum(PC[p] * X_pk[p, k] for p in P for k in K) +
-        sum(CC[o] * Y_cok[c, o, k] for c in C for o in O for k in K) +
-        sum(FC[f] * Y_ofk[o, f, k] for o in O for f in F for k in K) +
-        sum(RC[r] * Y_ork[o, r, k] * omega[k] for o in O for r in R for k in K) +
-        sum(DC[l] * Y_olk[o, l, k] * omega[k] for o in O for l in L for k in K)
+        sum(PC[p] * X_pk[p, k] for p, k in X_pk) +
+        sum(CC[o] * Y_cok[c, o, k] for c, o, k in Y_cok) +
+        sum(FC[f] * Y_ofk[o, f, k] for o, f, k in Y_ofk) +
+        sum(RC[r] * Y_ork[o, r, k] * omega[k] for o, r, k in Y_ork) +
+        sum(DC[l] * Y_olk[o, l, k] * omega[k] for o, l, k in Y_olk)
     )
 
     Transport_Cost = (
-        sum(T * get_dist(p, c) * X_pck[p, c, k] * omega[k] for p in P for c in C for k in K) +
-        sum(T * get_dist(c, o) * Y_cok[c, o, k] * omega[k] for c in C for o in O for k in K) +
-        sum(T * get_dist(o, c) * Y_ock[o, c, k] * omega[k] for o in O for c in C for k in K) +
-        sum(T * get_dist(o, f) * Y_ofk[o, f, k] * omega[k] for o in O for f in F for k in K) +
-        sum(T * get_dist(o, r) * Y_ork[o, r, k] * omega[k] for o in O for r in R for k in K) +
-        sum(T * get_dist(o, l) * Y_olk[o, l, k] * omega[k] for o in O for l in L for k in K) +
-        sum(T * get_dist(f, p) * Y_fpk[f, p, k] * omega[k] for f in F for p in P for k in K) +
-        sum(T * get_dist(r, s) * Z_rsm[r, s, mat] for r in R for s in S for mat in M)
+        sum(T * get_dist(p, c) * X_pck[p, c, k] * omega[k] for p, c, k in X_pck) +
+        sum(T * get_dist(c, o) * Y_cok[c, o, k] * omega[k] for c, o, k in Y_cok) +
+        sum(T * get_dist(o, c) * Y_ock[o, c, k] * omega[k] for o, c, k in Y_ock) +
+        sum(T * get_dist(o, f) * Y_ofk[o, f, k] * omega[k] for o, f, k in Y_ofk) +
+        sum(T * get_dist(o, r) * Y_ork[o, r, k] * omega[k] for o, r, k in Y_ork) +
+        sum(T * get_dist(o, l) * Y_olk[o, l, k] * omega[k] for o, l, k in Y_olk) +
+        sum(T * get_dist(f, p) * Y_fpk[f, p, k] * omega[k] for f, p, k in Y_fpk) +
+        sum(T * get_dist(r, s) * Z_rsm[r, s, mat] for r, s, mat in Z_rsm)
     )
 
     Revenue = (
-        sum(Rev_reuse[k] * Y_ock[o, c, k] for o in O for c in C for k in K if k in Rev_reuse) +
-        sum(Rev_refurb[k] * Y_fpk[f, p, k] for f in F for p in P for k in K if k in Rev_refurb) +
-        sum(Rev_recycle[mat] * Z_rsm[r, s, mat] for r in R for s in S for mat in M if mat in Rev_recycle)
+        sum(Rev_reuse[k] * Y_ock[o, c, k] for o, c, k in Y_ock if k in Rev_reuse) +
+        sum(Rev_refurb[k] * Y_fpk[f, p, k] for f, p, k in Y_fpk if k in Rev_refurb) +
+        sum(Rev_recycle[mat] * Z_rsm[r, s, mat] for r, s, mat in Z_rsm if mat in Rev_recycle)
     )
 
-    Shortage_Cost = sum(Penalty * S_ck[c, k] for c in C for k in K)
+    Shortage_Cost = sum(Penalty * S_ck[c, k] for c, k in S_ck)
 
     Z_Cost = Fixed_Cost + Op_Cost + Transport_Cost + Shortage_Cost - Revenue
 
@@ -314,30 +374,33 @@ def solve_circular_supply_chain_model(epsilon_limit=None, minimize_emissions_onl
     Env_Total = 0
 
     # Production emissions (kg CO2e)
-    Env_Total += sum(E_p[p] * X_pk[p, k] for p in P for k in K)
+    Env_Total += sum(E_p[p] * X_pk[p, k] for p, k in X_pk)
 
     # Collection emissions (per KWp moved through collection)
-    Env_Total += sum(E_o[o] * Y_cok[c, o, k] for c in C for o in O for k in K)
+    Env_Total += sum(E_o[o] * Y_cok[c, o, k] for c, o, k in Y_cok)
 
     # Refurbishing emissions (per KWp refurbished)
-    Env_Total += sum(E_f[f] * Y_ofk[o, f, k] for o in O for f in F for k in K)
+    Env_Total += sum(E_f[f] * Y_ofk[o, f, k] for o, f, k in Y_ofk)
 
     # Recycling emissions (per kg recycled -> multiply by weight omega[k])
-    Env_Total += sum(E_r[r] * Y_ork[o, r, k] * omega[k] for o in O for r in R for k in K)
+    Env_Total += sum(E_r[r] * Y_ork[o, r, k] * omega[k] for o, r, k in Y_ork)
 
     # Landfill / Disposal emissions (per kg)
-    Env_Total += sum(E_l[l] * Y_olk[o, l, k] * omega[k] for o in O for l in L for k in K)
+    Env_Total += sum(E_l[l] * Y_olk[o, l, k] * omega[k] for o, l, k in Y_olk)
 
     # Transport emissions (applies to material flows scaled by weight)
-    Env_Total += sum(E_T * get_dist(p, c) * X_pck[p, c, k] * omega[k] for p in P for c in C for k in K)
-    Env_Total += sum(E_T * get_dist(c, o) * Y_cok[c, o, k] * omega[k] for c in C for o in O for k in K)
-    Env_Total += sum(E_T * get_dist(o, c) * Y_ock[o, c, k] * omega[k] for o in O for c in C for k in K)
-    Env_Total += sum(E_T * get_dist(o, f) * Y_ofk[o, f, k] * omega[k] for o in O for f in F for k in K)
-    Env_Total += sum(E_T * get_dist(o, r) * Y_ork[o, r, k] * omega[k] for o in O for r in R for k in K)
-    Env_Total += sum(E_T * get_dist(o, l) * Y_olk[o, l, k] * omega[k] for o in O for l in L for k in K)
-    Env_Total += sum(E_T * get_dist(f, p) * Y_fpk[f, p, k] * omega[k] for f in F for p in P for k in K)
+    Env_Total += sum(E_T * get_dist(p, c) * X_pck[p, c, k] * omega[k] for p, c, k in X_pck)
+    Env_Total += sum(E_T * get_dist(c, o) * Y_cok[c, o, k] * omega[k] for c, o, k in Y_cok)
+    Env_Total += sum(E_T * get_dist(o, c) * Y_ock[o, c, k] * omega[k] for o, c, k in Y_ock)
+    Env_Total += sum(E_T * get_dist(o, f) * Y_ofk[o, f, k] * omega[k] for o, f, k in Y_ofk)
+    Env_Total += sum(E_T * get_dist(o, r) * Y_ork[o, r, k] * omega[k] for o, r, k in Y_ork)
+    Env_Total += sum(E_T * get_dist(o, l) * Y_olk[o, l, k] * omega[k] for o, l, k in Y_olk)
+    Env_Total += sum(E_T * get_dist(f, p) * Y_fpk[f, p, k] * omega[k] for f, p, k in Y_fpk)
     # transport for material flows from recycling centers
-    Env_Total += sum(E_T * get_dist(r, s) * Z_rsm[r, s, mat] for r in R for s in S for mat in M)
+    Env_Total += sum(E_T * get_dist(r, s) * Z_rsm[r, s, mat] for r, s, mat in Z_rsm)
+
+    # Constraint handles by family, keyed like the variables (see updates.py)
+    constrs = {name: {} for name in CONSTRAINT_FAMILIES}
 
     # Objective Setting
     if minimize_emissions_only:
@@ -348,52 +411,171 @@ def solve_circular_supply_chain_model(epsilon_limit=None, minimize_emissions_onl
         print(f"→ Emission Constraint: ≤ {epsilon_limit:,.0f} kg CO2e")
         m.setObjective(Z_Cost, GRB.MINIMIZE)
         # Add environmental limit constraint (user provided)
-        m.addConstr(Env_Total <= epsilon_limit, "Env_Limit")
+        constrs['Env_Limit'][()] = m.addConstr(Env_Total <= epsilon_limit, "Env_Limit")
 
     # --- CONSTRAINTS ---
+    # Sums over the keys present in a group: X.sum('*', c, k) adds X[p, c, k] over p
     # 1. Demand
-    for c in C:
-        for k in K:
-            m.addConstr(sum(X_pck[p, c, k] for p in P) + sum(Y_ock[o, c, k] for o in O) + S_ck[c, k] == DEM[c, k])
+    for c, k in keys('Demand', C, K):
+        constrs['Demand'][c, k] = m.addConstr(
+            X_pck.sum('*', c, k) + Y_ock.sum('*', c, k) + S_ck[c, k] == DEM[c, k],
+            f"Demand[{c},{k}]")
 
     # 2. Returns
-    for c in C:
-        for k in K:
-            m.addConstr(sum(Y_cok[c, o, k] for o in O) <= RET[c, k])
+    for c, k in keys('Returns', C, K):
+        constrs['Returns'][c, k] = m.addConstr(Y_cok.sum(c, '*', k) <= RET[c, k], f"Returns[{c},{k}]")
 
     # 3. Flow Balance (Collection)
-    for o in O:
-        for k in K:
-            Total_In = sum(Y_cok[c, o, k] for c in C)
-            Total_Out = sum(Y_ock[o, c, k] for c in C) + sum(Y_ofk[o, f, k] for f in F) + sum(Y_ork[o, r, k] for r in R) + sum(Y_olk[o, l, k] for l in L)
-            m.addConstr(Total_In == Total_Out)
+    for o, k in keys('Collection_Balance', O, K):
+        Total_In = Y_cok.sum('*', o, k)
+        Total_Out = Y_ock.sum(o, '*', k) + Y_ofk.sum(o, '*', k) + Y_ork.sum(o, '*', k) + Y_olk.sum(o, '*', k)
+        constrs['Collection_Balance'][o, k] = m.addConstr(Total_In == Total_Out, f"Collection_Balance[{o},{k}]")
 
-            # Quality Constraints
-            m.addConstr(sum(Y_ock[o, c, k] for c in C) <= Quality_Mix['Reuse_Cap'] * Total_In)
-            m.addConstr(sum(Y_ofk[o, f, k] for f in F) <= Quality_Mix['Refurb_Cap'] * Total_In)
+        # Quality Constraints
+        constrs['Reuse_Mix'][o, k] = m.addConstr(
+            Y_ock.sum(o, '*', k) <= Quality_Mix['Reuse_Cap'] * Total_In, f"Reuse_Mix[{o},{k}]")
+        constrs['Refurb_Mix'][o, k] = m.addConstr(
+            Y_ofk.sum(o, '*', k) <= Quality_Mix['Refurb_Cap'] * Total_In, f"Refurb_Mix[{o},{k}]")
 
     # 4. Plant Balance
-    for p in P:
-        for k in K:
-            m.addConstr(X_pk[p, k] + sum(Y_fpk[f, p, k] for f in F) == sum(X_pck[p, c, k] for c in C))
+    for p, k in keys('Plant_Balance', P, K):
+        constrs['Plant_Balance'][p, k] = m.addConstr(
+            X_pk.sum(p, k) + Y_fpk.sum('*', p, k) == X_pck.sum(p, '*', k), f"Plant_Balance[{p},{k}]")
 
     # Yields
-    for f in F:
-        for k in K:
-            m.addConstr(sum(Y_fpk[f, p, k] for p in P) == alpha[f] * sum(Y_ofk[o, f, k] for o in O))
+    for f, k in keys('Refurb_Yield', F, K):
+        constrs['Refurb_Yield'][f, k] = m.addConstr(
+            Y_fpk.sum(f, '*', k) == alpha[f] * Y_ofk.sum('*', f, k), f"Refurb_Yield[{f},{k}]")
 
-    for r in R:
-        for mat in M:
-            m.addConstr(sum(Z_rsm[r, s, mat] for s in S) == beta[r] * sum(Y_ork[o, r, k] * gamma[k, mat] for o in O for k in K))
+    for r, mat in keys('Recycle_Yield', R, M):
+        constrs['Recycle_Yield'][r, mat] = m.addConstr(
+            Z_rsm.sum(r, '*', mat) == beta[r] * Y_ork.prod({(o, r, k): gamma[k, mat] for o in O for k in K}, '*', r, '*'),
+            f"Recycle_Yield[{r},{mat}]")
 
     # Capacities
     for o in O: 
-        m.addConstr(sum(Y_cok[c, o, k] for c in C for k in K) * omega[K[0]] <= CAP_o[o] * W_o[o])
+        constrs['Cap_O'][o] = m.addConstr(Y_cok.sum('*', o, '*') * omega[K[0]] <= CAP_o[o] * W_o[o], f"Cap_O[{o}]")
     for f in F: 
-        m.addConstr(sum(Y_ofk[o, f, k] for o in O for k in K) * omega[K[0]] <= CAP_f[f] * W_f[f])
+        constrs['Cap_F'][f] = m.addConstr(Y_ofk.sum('*', f, '*') * omega[K[0]] <= CAP_f[f] * W_f[f], f"Cap_F[{f}]")
     for r in R: 
-        m.addConstr(sum(Y_ork[o, r, k] * omega[K[0]] for o in O for k in K) <= CAP_r[r] * W_r[r])
+        constrs['Cap_R'][r] = m.addConstr(Y_ork.sum('*', r, '*') * omega[K[0]] <= CAP_r[r] * W_r[r], f"Cap_R[{r}]")
+
+    m.update()
+    profile = apply_profile(m, 'integrate')
+
+    return {
+        'm': m,
+        'data': data,
+        'vars': {
+            'X_pk': X_pk, 'X_pck': X_pck, 'Y_cok': Y_cok, 'Y_ock': Y_ock, 'Y_ofk': Y_ofk,
+            'Y_ork': Y_ork, 'Y_olk': Y_olk, 'Y_fpk': Y_fpk, 'S_ck': S_ck, 'Z_rsm': Z_rsm,
+            'W_o': W_o, 'W_f': W_f, 'W_r': W_r,
+        },
+        'constrs': constrs,
+        'dist': dist,
+        'Z_Cost': Z_Cost,
+        'Env_Total': Env_Total,
+        'parts': {
+            'Fixed': Fixed_Cost, 'Op': Op_Cost, 'Transport': Transport_Cost,
+            'Shortage': Shortage_Cost, 'Revenue': Revenue,
+        },
+        'profile': profile,
+    }
+
+
+def solve_circular_supply_chain_model(epsilon_limit=None, minimize_emissions_only=False, excel_file='supply_chain_data.xlsx',
+                                      distance_store=None, solution_path=None, sensitivity_path=None, cuts=False,
+                                      export_path=None, reduce=True, scale=False):
+    """
+    Solve the circular supply chain optimization model.
+    Can read from Excel or use provided parameters.
+    If `solution_path` is given, the optimal flows are written there as Parquet.
+    If `sensitivity_path` is given, the LP sensitivity report of the optimal
+    facility plan (see sensitivity.py) is written to that directory.
+    If `cuts` is set, symmetry-breaking and valid inequalities for the
+    facility binaries are added before solving (see cuts.py).
+    If `export_path` is given, the solution (flows by stage, utilization and
+    cost / emission breakdown) is written there as an Excel workbook (see export.py).
+    Unless `reduce` is False, components that are zero in every feasible
+    solution (pairs without demand or returns, zero-capacity facilities,
+    dead-end flows) are dropped before the build (see reduction.py); not
+    with `sensitivity_path`, whose report covers every row.
+    If `scale` is set, rows, columns and the objective are rescaled to
+    well-conditioned units before solving; results are reported in model
+    units (see scaling.py).
+    """
+    
+    print("="*70)
+    print("CIRCULAR SUPPLY CHAIN OPTIMIZATION MODEL")
+    print("="*70)
+    
+    # Read data from Excel
+    if excel_file:
+        print(f"Reading data from: {excel_file}")
+        data = read_excel_data(excel_file, distance_store=distance_store)
+        
+        # Override with function parameters if provided
+        if epsilon_limit is not None:
+            data['epsilon_limit'] = epsilon_limit
+        if minimize_emissions_only is not None:
+            data['minimize_emissions_only'] = minimize_emissions_only
+        
+        print(f"✓ Data loaded successfully")
+        print(f"  - Plants: {len(data['P'])}")
+        print(f"  - Customers: {len(data['C'])}")
+        print(f"  - Collection Centers: {len(data['O'])}")
+        print(f"  - Refurbishment Centers: {len(data['F'])}")
+        print(f"  - Recycling Centers: {len(data['R'])}")
+        print(f"  - Landfills: {len(data['L'])}")
+        print(f"  - Secondary Markets: {len(data['S'])}")
+        print(f"  - Product Types: {len(data['K'])}")
+        print(f"  - Materials: {len(data['M'])}")
+    
+    from feasibility import (INTEGRATE_SHEET_ROWS, SheetRows, confirm_infeasible, diagnose, has_errors, print_iis,
+                             print_issues, screen_integrate)
+    rows = SheetRows(excel_file, INTEGRATE_SHEET_ROWS) if excel_file else None
+    issues = screen_integrate(data)
+    if issues:
+        print("\nFeasibility screening:")
+        print_issues(issues, rows)
+    if has_errors(issues):
+        print("✗ STATUS: INFEASIBLE (found by screening, model not built)")
+        return "Infeasible", None, None
+    
+    print("\n" + "="*70)
+    print("BUILDING OPTIMIZATION MODEL...")
+    print("="*70)
+    
+    if reduce and not sensitivity_path:
+        from reduction import reduce_data
+        data, reduction = reduce_data(data)
+        v_kept, v_full, c_kept, c_full = reduction.summary()
+        print(f"✓ Reduction: {v_full - v_kept:,} of {v_full:,} variables and "
+              f"{c_full - c_kept:,} of {c_full:,} constraints dropped before the build")
+    
+    model = build_circular_supply_chain_model(data)
+    if cuts:
+        from cuts import add_valid_inequalities
+        added = add_valid_inequalities(model)
+        print(f"✓ Cut stage: {sum(len(added[f]) for f in ('Symmetry', 'Cover', 'VUB'))} valid inequalities, "
+              f"{len(added['Tightened'])} capacity big-Ms tightened")
+    if scale and sensitivity_path:
+        print("! Scaling skipped: the sensitivity report prices the unscaled model")
+    elif scale:
+        from scaling import format_range, scale_model
+        scaling = scale_model(model)
+        print(f"✓ Scaling: matrix range {format_range(scaling.before['matrix'])} → "
+              f"{format_range(scaling.after['matrix'])}, objective {format_range(scaling.before['objective'])} → "
+              f"{format_range(scaling.after['objective'])}")
+    m = model['m']
+    Z_Cost = model['Z_Cost']
+    Env_Total = model['Env_Total']
+    Fixed_Cost, Op_Cost, Transport_Cost, Shortage_Cost, Revenue = (
+        model['parts'][k] for k in ('Fixed', 'Op', 'Transport', 'Shortage', 'Revenue'))
 
+    bucket, params = model['profile']
+    if params:
+        print(f"✓ Solver profile 'integrate/{bucket}': {', '.join(f'{k}={v}' for k, v in params.items())}")
     print(f"✓ Total constraints: {m.NumConstrs}")
     print(f"✓ Total variables: {m.NumVars}")
     
@@ -423,12 +605,33 @@ def solve_circular_supply_chain_model(epsilon_limit=None, minimize_emissions_onl
         print(f"  - Shortage Penalty: €{Shortage_Cost.getValue():,.2f}")
         print(f"  - Revenue: €{Revenue.getValue():,.2f}")
         
+        if solution_path:
+            layout = SolutionLayout(m, model['vars'], VARIABLE_ROLES, Z_Cost, Env_Total)
+            write_flows(layout.extract(m), solution_path)
+            print(f"\n✓ Solution flows written to: {solution_path}")
+        
+        if export_path:
+            from export import CapacityLayout, export_solution
+            layout = SolutionLayout(m, model['vars'], VARIABLE_ROLES, Z_Cost, Env_Total)
+            capacity = CapacityLayout(m, {(family, key): c for family in ('Cap_O', 'Cap_F', 'Cap_R')
+                                          for key, c in model['constrs'][family].items()})
+            summary = [('Total Cost (€)', cost_val), ('Total Emissions (kg CO2e)', env_val)]
+            summary += [(f"{name} (€)", part.getValue()) for name, part in model['parts'].items()]
+            export_solution(export_path, m, layout, VARIABLE_ROLES, capacity, summary)
+            print(f"✓ Results workbook written to: {export_path}")
+        
+        if sensitivity_path:
+            from sensitivity import sensitivity_report, write_report
+            write_report(sensitivity_report(model), sensitivity_path)
+            print(f"✓ Sensitivity report written to: {sensitivity_path}")
+        
         print("\n" + "="*70)
         
         return "Optimal", cost_val, env_val
     else:
-        if m.status == GRB.INFEASIBLE:
+        if confirm_infeasible(m):
             print("✗ STATUS: INFEASIBLE")
+            print_iis(diagnose(m), rows)
             return "Infeasible", None, None
         print(f"✗ STATUS: {m.status}")
         return "Other", None, None
@@ -1,4 +1,4 @@
-from gurobipy import *
+from gurobipy import GRB, Model
 
 def solve_circular_supply_chain_model(epsilon_limit, minimize_emissions_only=False):
     # --- 1. SETS ---
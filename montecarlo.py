@@ -0,0 +1,234 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from integrate import read_excel_data
+from updates import FACILITY_GROUPS, PARAMETERS, build_updater
+
+# ============================================================================
+# MONTE CARLO UNCERTAINTY ANALYSIS
+# ============================================================================
+# Samples parameter vectors of the integrate.py model from user-given
+# distributions (one vectorized NumPy draw per parameter), then solves the
+# samples in worker processes. Each worker builds the model once and runs
+# its batches as in-place updates (updates.ModelUpdater) with warm-started
+# re-solves. Reports distributions of cost and emissions and how often each
+# facility is opened.
+#
+#   python montecarlo.py supply_chain_data.xlsx --spec uncertainty.json -n 2000 --workers 8
+#
+# The spec maps parameters to distributions. Relative forms scale each
+# entry's point estimate; 'keys' restricts a spec to some entries:
+#
+#   {"DEM":   {"dist": "normal", "cv": 0.15},
+#    "RET":   {"dist": "uniform", "spread": 0.2},
+#    "alpha": {"dist": "triangular", "low": 0.8, "mode": 0.9, "high": 0.95},
+#    "E_T":   {"dist": "lognormal", "cv": 0.1},
+#    "E_p":   {"dist": "normal", "cv": 0.05, "keys": ["P1"]}}
+
+DISTRIBUTIONS = ('normal', 'lognormal', 'uniform', 'triangular')
+
+# Parameters that are fractions and are clipped to [0, 1]; all others to >= 0
+FRACTION_PARAMETERS = ('alpha', 'beta', 'Quality_Mix')
+
+BATCH_SIZE = 25             # samples per worker task
+
+
+def parameter_entries(data, name):
+    """Keys (tuples, () for scalars) and point estimates of one parameter."""
+    if name not in PARAMETERS or PARAMETERS[name][1] == 'bounds':
+        raise KeyError(f"'{name}' cannot be sampled (known: {', '.join(n for n in PARAMETERS if n != 'status')})")
+    value = data[name]
+    if PARAMETERS[name][0] == 0:
+        return [()], np.array([float(value)])
+    keys = [k if isinstance(k, tuple) else (k,) for k in value]
+    return keys, np.array([float(v) for v in value.values()])
+
+
+def _spec_keys(spec_keys, keys):
+    wanted = {tuple(k) if isinstance(k, (list, tuple)) else tuple(str(k).split(',')) for k in spec_keys}
+    return [i for i, k in enumerate(keys) if k in wanted]
+
+
+def draw(spec, base, n, rng):
+    """
+    Draw n samples for every entry of `base` (shape (n, len(base))) from one
+    distribution spec; relative parameters ('cv', 'spread') scale `base`.
+    """
+    dist = spec.get('dist', 'normal')
+    size = (n, len(base))
+    if dist == 'normal':
+        sd = spec['cv'] * np.abs(base) if 'cv' in spec else np.full(len(base), spec['sd'])
+        mean = base if 'mean' not in spec else np.full(len(base), spec['mean'])
+        return rng.normal(mean, sd, size)
+    if dist == 'lognormal':
+        # Mean-preserving: E[value] equals the point estimate (or 'mean')
+        mean = base if 'mean' not in spec else np.full(len(base), spec['mean'])
+        sigma = np.sqrt(np.log1p(spec['cv'] ** 2))
+        return mean * rng.lognormal(-sigma ** 2 / 2, sigma, size)
+    if dist == 'uniform':
+        if 'spread' in spec:
+            return base * rng.uniform(1 - spec['spread'], 1 + spec['spread'], size)
+        return rng.uniform(spec['low'], spec['high'], size)
+    if dist == 'triangular':
+        if 'spread' in spec:
+            return base * rng.triangular(1 - spec['spread'], 1, 1 + spec['spread'], size)
+        return rng.triangular(spec['low'], spec['mode'], spec['high'], size)
+    raise ValueError(f"Unknown distribution '{dist}' (use one of {', '.join(DISTRIBUTIONS)})")
+
+
+def sample_parameters(data, spec, n, seed=None):
+    """
+    Sample n parameter vectors. Returns {name: (keys, values)} with values of
+    shape (n, len(keys)); entries not covered by the spec keep their point
+    estimate and are left out.
+    """
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for name, param_spec in spec.items():
+        keys, base = parameter_entries(data, name)
+        if 'keys' in param_spec:
+            pick = _spec_keys(param_spec['keys'], keys)
+            if not pick:
+                raise KeyError(f"No entries of {name} match {param_spec['keys']}")
+            keys, base = [keys[i] for i in pick], base[pick]
+        values = draw(param_spec, base, n, rng)
+        upper = 1.0 if name in FRACTION_PARAMETERS else None
+        samples[name] = (keys, np.clip(values, 0.0, upper))
+    return samples
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+# One built model per worker process, created by the pool initializer.
+
+_worker = {}
+
+
+def _init_worker(workbook, distance_store=None, overrides=None):
+    updater = build_updater(workbook, distance_store, overrides, threads=1)
+    _worker['updater'] = updater
+    _worker['facilities'] = [(g, node) for g in FACILITY_GROUPS.values() for node in updater.var_index[g]]
+
+
+def _solve_batch(batch):
+    """Solve one batch: (sample ids, {name: (keys, values)}) -> list of result rows."""
+    ids, samples = batch
+    updater = _worker['updater']
+    facilities = _worker['facilities']
+    rows = []
+    for r, sample_id in enumerate(ids):
+        changes = [(name, key, values[r, j]) for name, (keys, values) in samples.items()
+                   for j, key in enumerate(keys)]
+        updater.set_many(changes)
+        result = updater.solve()
+        row = {'sample': int(sample_id), 'status': result['status'], 'runtime_ms': result['runtime_ms'],
+               'cost': result.get('cost', np.nan), 'env': result.get('env', np.nan)}
+        opened = {(g, node) for g, nodes in result.get('open', {}).items() for node in nodes}
+        for g, node in facilities:
+            row[node] = (g, node) in opened if 'open' in result else np.nan
+        rows.append(row)
+    return rows
+
+
+def _batches(samples, n, batch_size):
+    for start in range(0, n, batch_size):
+        stop = min(n, start + batch_size)
+        yield (np.arange(start, stop),
+               {name: (keys, values[start:stop]) for name, (keys, values) in samples.items()})
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def run_monte_carlo(workbook, spec, n_samples, seed=None, workers=None, batch_size=BATCH_SIZE,
+                    distance_store=None, overrides=None):
+    """
+    Sample and solve `n_samples` instances. Returns a dictionary with the
+    per-sample results ('samples'), the sampled parameter values ('inputs'),
+    cost / emission statistics ('summary'), facility opening frequencies
+    ('opening') and the throughput in samples per minute.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = read_excel_data(workbook, distance_store=distance_store)
+    data.update(overrides or {})
+    samples = sample_parameters(data, spec, n_samples, seed)
+
+    start = time.perf_counter()
+    init = (workbook, distance_store, overrides)
+    if workers == 1:
+        _init_worker(*init)
+        rows = [row for batch in _batches(samples, n_samples, batch_size) for row in _solve_batch(batch)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init) as pool:
+            rows = [row for batch_rows in pool.map(_solve_batch, _batches(samples, n_samples, batch_size))
+                    for row in batch_rows]
+    elapsed = time.perf_counter() - start
+
+    results = pd.DataFrame(rows).sort_values('sample').reset_index(drop=True)
+    inputs = pd.DataFrame({f"{name}[{','.join(map(str, key))}]" if key else name: values[:, j]
+                           for name, (keys, values) in samples.items() for j, key in enumerate(keys)})
+    solved = results[results['status'] == 'OPTIMAL']
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+    summary = solved[['cost', 'env']].describe(percentiles=quantiles).T
+    facility_cols = [c for c in results.columns if c not in ('sample', 'status', 'runtime_ms', 'cost', 'env')]
+    opening = solved[facility_cols].astype(float).mean().rename('open_frequency')
+    return {
+        'samples': results,
+        'inputs': inputs,
+        'summary': summary,
+        'opening': opening,
+        'status_counts': results['status'].value_counts(),
+        'elapsed_s': elapsed,
+        'samples_per_minute': n_samples / elapsed * 60.0 if elapsed > 0 else float('inf'),
+    }
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Monte Carlo parameter uncertainty for the supply chain model.")
+    parser.add_argument('workbook', nargs='?', default='supply_chain_data.xlsx')
+    parser.add_argument('--spec', required=True, help="JSON file (or inline JSON) with parameter distributions")
+    parser.add_argument('-n', '--samples', type=int, default=1000)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--distance-store', help="on-disk DistanceStore instead of the Distance_Matrix sheet")
+    parser.add_argument('-o', '--output', help="write per-sample results (and inputs) to this CSV")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.spec):
+        with open(args.spec, encoding='utf-8') as fh:
+            spec = json.load(fh)
+    else:
+        spec = json.loads(args.spec)
+
+    mc = run_monte_carlo(args.workbook, spec, args.samples, args.seed, args.workers, args.batch_size,
+                         args.distance_store)
+    print("=" * 70)
+    print(f"MONTE CARLO: {args.samples} samples, {args.workers} workers")
+    print("=" * 70)
+    print(mc['status_counts'].to_string())
+    print("\nCost (€) and emissions (kg CO2e) of optimal samples:")
+    print(mc['summary'].to_string(float_format=lambda v: f'{v:,.2f}'))
+    print("\nFacility opening frequency:")
+    print(mc['opening'].to_string(float_format=lambda v: f'{v:.1%}'))
+    print(f"\n✓ {mc['samples_per_minute']:,.0f} samples/min ({mc['elapsed_s']:.1f}s)")
+    if args.output:
+        mc['samples'].join(mc['inputs']).to_csv(args.output, index=False)
+        print(f"✓ Samples written to: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,8 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import sys
 
+from render import configure_backend
+
 # --- IMPORT THE MODEL ---
 solve_func = None
 try:
@@ -16,7 +17,7 @@ except Exception:
 solve_circular_supply_chain_model = solve_func
 
 
-def generate_pareto_frontier(points=20):
+def generate_pareto_frontier(points=20, show=None):
     print("\n" + "="*70)
     print(f"   STARTING PARETO FRONTIER GENERATION (Constraint Sweep Method)")
     print("="*70 + "\n")
@@ -82,6 +83,9 @@ def generate_pareto_frontier(points=20):
 
     print("\n--> Step 3: Plotting Pareto Frontier...\n")
 
+    interactive = configure_backend()
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(10, 6))
     plt.plot(pareto_emissions, pareto_costs, marker='o', linewidth=2,
              label='Pareto Frontier')
@@ -97,7 +101,10 @@ def generate_pareto_frontier(points=20):
 
     plt.tight_layout()
     plt.savefig("pareto_frontier_constraint_sweep.png")
-    plt.show()
+    show = interactive if show is None else show
+    if show:
+        plt.show()
+    plt.close()
 
     print("Saved as: pareto_frontier_constraint_sweep.png")
 
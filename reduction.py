@@ -0,0 +1,190 @@
+import sys
+from itertools import product
+
+from feasibility import reaching
+
+# ============================================================================
+# PRE-BUILD MODEL REDUCTION
+# ============================================================================
+# Drops model components that are zero in every feasible solution before
+# integrate.build_circular_supply_chain_model creates them, so their build
+# time and memory are never spent (Gurobi presolve would remove them too,
+# but only after they were built):
+#
+# * (customer, product) pairs without demand: no deliveries, shortage or
+#   Demand row; pairs without returns: no collection flows or Returns row
+# * facilities with zero capacity
+# * flows into nodes that cannot pass product on to a sink (customer demand,
+#   landfill, a refurbishment center with zero yield, or a recycling center
+#   with a secondary market or nothing to recover), and flows out of nodes
+#   nothing can reach
+#
+# The per-product flow network is acyclic and every intermediate node
+# conserves flow, so a flow that cannot reach both a source and a sink is
+# zero whenever the model is feasible: the reduced model has the same
+# optimum. Facilities with a negative fixed cost are kept (opening them pays
+# even without flow).
+#
+# The reduction is passed to the builder as data['index'], the keys of each
+# variable group and constraint family. Dropped variables are zero:
+# Reduction.expand maps a group's values back to the full index space, and
+# tidy extracts (extract.py) of a reduced model just have no rows for them.
+#
+# solve_circular_supply_chain_model reduces by default. The other builders
+# are not reduced: multiperiod.py carries inventory between periods, so its
+# flows are not acyclic per period; anu_combine_model.py builds its own
+# network inline from a different workbook; example2.py already creates
+# only the arcs of its transport sheet.
+#
+#   python reduction.py supply_chain_data.xlsx
+
+# Index sets of every variable group and constraint family of integrate.py
+GROUP_SETS = {
+    'X_pk': ('P', 'K'), 'X_pck': ('P', 'C', 'K'), 'Y_cok': ('C', 'O', 'K'), 'Y_ock': ('O', 'C', 'K'),
+    'Y_ofk': ('O', 'F', 'K'), 'Y_ork': ('O', 'R', 'K'), 'Y_olk': ('O', 'L', 'K'), 'Y_fpk': ('F', 'P', 'K'),
+    'S_ck': ('C', 'K'), 'Z_rsm': ('R', 'S', 'M'), 'W_o': ('O',), 'W_f': ('F',), 'W_r': ('R',),
+}
+FAMILY_SETS = {
+    'Demand': ('C', 'K'), 'Returns': ('C', 'K'), 'Collection_Balance': ('O', 'K'), 'Plant_Balance': ('P', 'K'),
+    'Refurb_Yield': ('F', 'K'), 'Recycle_Yield': ('R', 'M'),
+    'Cap_O': ('O',), 'Cap_F': ('F',), 'Cap_R': ('R',),
+}
+# Flow groups as arcs between network nodes: group -> (origin set, destination set)
+FLOW_ARCS = {
+    'X_pck': ('P', 'C'), 'Y_cok': ('C', 'O'), 'Y_ock': ('O', 'C'), 'Y_ofk': ('O', 'F'),
+    'Y_ork': ('O', 'R'), 'Y_olk': ('O', 'L'), 'Y_fpk': ('F', 'P'),
+}
+
+
+def _keys(data, sets):
+    keys = list(product(*(data[s] for s in sets)))
+    return [k[0] for k in keys] if len(sets) == 1 else keys
+
+
+def _live_arcs(data, k):
+    """
+    Arcs able to carry product k in a feasible solution, between nodes
+    (role, node) reachable from a source (plants, customers returning k) and
+    able to reach a sink. Customers are split into a demand node ('C') and a
+    return node ('c'), so the network is acyclic.
+    """
+    DEM, RET = data['DEM'], data['RET']
+    has = {
+        'P': [('P', p) for p in data['P']],
+        'C': [('C', c) for c in data['C'] if DEM.get((c, k), 0) > 0],
+        'c': [('c', c) for c in data['C'] if RET.get((c, k), 0) > 0],
+        'O': [('O', o) for o in data['O'] if data['CAP_o'][o] > 0],
+        'F': [('F', f) for f in data['F'] if data['CAP_f'][f] > 0],
+        'R': [('R', r) for r in data['R'] if data['CAP_r'][r] > 0],
+        'L': [('L', l) for l in data['L']],
+    }
+    mix = data['Quality_Mix']
+    stages = [('P', 'C'), ('c', 'O'), ('O', 'F') if mix['Refurb_Cap'] > 0 else None,
+              ('O', 'C') if mix['Reuse_Cap'] > 0 else None, ('O', 'R'), ('O', 'L')]
+    arcs = [(i, j) for stage in stages if stage for i in has[stage[0]] for j in has[stage[1]]]
+    arcs += [(f, p) for f in has['F'] if data['alpha'][f[1]] > 0 for p in has['P']]
+
+    sinks = has['C'] + has['L'] + [f for f in has['F'] if data['alpha'][f[1]] == 0]
+    # Recycle_Yield sends beta x gamma of the input to the secondary markets.
+    # A recycling center absorbs k freely when nothing of k is recovered (beta
+    # = 0, no material with gamma != 0, no materials at all); otherwise it
+    # needs a market to pass the material on to
+    recovered = any(data['gamma'].get((k, mat), 0) != 0 for mat in data['M'])
+    sinks += [r for r in has['R'] if data['S'] or not recovered or data['beta'][r[1]] == 0]
+    sources = has['P'] + has['c']
+    live = reaching([(j, i) for i, j in arcs], sources) & reaching(arcs, sinks)
+    return live, {(i, j) for i, j in arcs if i in live and j in live}
+
+
+class Reduction:
+    """
+    Keys kept of every variable group and constraint family of a data
+    dictionary; `full` holds the keys of the unreduced model.
+    """
+
+    def __init__(self, data, reduced):
+        self.full = {name: _keys(data, sets) for name, sets in {**GROUP_SETS, **FAMILY_SETS}.items()}
+        # Opening variables and capacity rows follow the reduced facility sets
+        self.index = dict(reduced['index'], W_o=reduced['O'], W_f=reduced['F'], W_r=reduced['R'],
+                          Cap_O=reduced['O'], Cap_F=reduced['F'], Cap_R=reduced['R'])
+
+    def expand(self, group, values):
+        """{key: value} of a reduced variable group over the full index (dropped keys: 0.0)."""
+        return {key: values.get(key, 0.0) for key in self.full[group]}
+
+    def counts(self, names):
+        """{name: (kept, full)} for the given groups or families."""
+        return {n: (len(self.index.get(n, self.full[n])), len(self.full[n])) for n in names}
+
+    def summary(self):
+        """(variables kept, variables, constraints kept, constraints) of the reduced model."""
+        v = self.counts(GROUP_SETS).values()
+        # Reuse_Mix and Refurb_Mix are built alongside Collection_Balance
+        c = {n: kf for n, kf in self.counts(FAMILY_SETS).items()}
+        c['Collection_Balance'] = tuple(3 * x for x in c['Collection_Balance'])
+        return (sum(k for k, _ in v), sum(f for _, f in v),
+                sum(k for k, _ in c.values()), sum(f for _, f in c.values()))
+
+
+def reduce_data(data):
+    """
+    Reduced copy of a data dictionary (see read_excel_data) and its
+    Reduction. The copy's sets hold only the facilities and customers left
+    with a variable, and data['index'] the keys to build.
+    """
+    K = data['K']
+    live, arcs = {}, {}
+    for k in K:
+        live[k], arcs[k] = _live_arcs(data, k)
+    alive = lambda role, node, k: (role, node) in live[k]
+
+    index = {}
+    for name, (a, b) in FLOW_ARCS.items():
+        # Customers are demand nodes as destinations and return nodes as origins
+        a = 'c' if a == 'C' else a
+        index[name] = [(i, j, k) for i, j, k in _keys(data, GROUP_SETS[name]) if ((a, i), (b, j)) in arcs[k]]
+    index['X_pk'] = [(p, k) for p, k in _keys(data, ('P', 'K')) if alive('P', p, k)]
+    index['S_ck'] = [(c, k) for c, k in _keys(data, ('C', 'K')) if data['DEM'].get((c, k), 0) != 0]
+    index['Demand'] = index['S_ck']
+    index['Returns'] = [(c, k) for c, k in _keys(data, ('C', 'K')) if alive('c', c, k)]
+    index['Collection_Balance'] = [(o, k) for o, k in _keys(data, ('O', 'K')) if alive('O', o, k)]
+    index['Plant_Balance'] = [(p, k) for p, k in index['X_pk']]
+    index['Refurb_Yield'] = [(f, k) for f, k in _keys(data, ('F', 'K')) if alive('F', f, k)]
+
+    def kept(role, nodes, fixed):
+        return [n for n in nodes if any(alive(role, n, k) for k in K) or fixed.get(n, 0) < 0]
+
+    reduced = dict(data)
+    reduced['O'] = kept('O', data['O'], data['FixO'])
+    reduced['F'] = kept('F', data['F'], data['FixF'])
+    reduced['R'] = kept('R', data['R'], data['FixR'])
+    reduced['C'] = [c for c in data['C'] if any(data['DEM'].get((c, k), 0) != 0 or alive('c', c, k) for k in K)]
+    reduced['P'] = [p for p in data['P'] if any(alive('P', p, k) for k in K)]
+    reduced['L'] = [l for l in data['L'] if any(alive('L', l, k) for k in K)]
+    live_r = [r for r in reduced['R'] if any(alive('R', r, k) for k in K)]
+    index['Z_rsm'] = [(r, s, mat) for r, s, mat in _keys(data, ('R', 'S', 'M')) if r in live_r]
+    index['Recycle_Yield'] = [(r, mat) for r, mat in _keys(data, ('R', 'M')) if r in live_r]
+    reduced['index'] = index
+    return reduced, Reduction(data, reduced)
+
+def main(argv=None):
+    import argparse
+
+    from integrate import read_excel_data
+
+    parser = argparse.ArgumentParser(description="Report the model components the pre-build reduction drops.")
+    parser.add_argument('workbook', nargs='?', default='supply_chain_data.xlsx')
+    parser.add_argument('--distance-store', help="on-disk DistanceStore instead of the Distance_Matrix sheet")
+    args = parser.parse_args(argv)
+
+    reduction = reduce_data(read_excel_data(args.workbook, distance_store=args.distance_store))[1]
+    print(f"{'':22}{'kept':>12}{'of':>12}")
+    for name, (kept, full) in {**reduction.counts(GROUP_SETS), **reduction.counts(FAMILY_SETS)}.items():
+        print(f"  {name:20}{kept:>12,}{full:>12,}")
+    v_kept, v_full, c_kept, c_full = reduction.summary()
+    print(f"✓ {v_full - v_kept:,} of {v_full:,} variables and {c_full - c_kept:,} of {c_full:,} constraints dropped")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
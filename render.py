@@ -0,0 +1,185 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# ============================================================================
+# HEADLESS / BATCH RENDERING
+# ============================================================================
+# configure_backend() switches matplotlib to the non-interactive Agg backend
+# on servers without a display (or when PARETO_HEADLESS=1), so scripts save
+# their figures without blocking in plt.show(). render_tasks() draws many
+# figures in a process pool, and frontiers with thousands of points are
+# down-sampled (min/max per bucket) and rasterized before drawing.
+#
+#   python render.py                      # latest run in pareto_results.sqlite
+#   python render.py --run 20261019-... --out plots --workers 8 --dpi 150
+
+MAX_PLOT_POINTS = 2000      # frontier points kept per curve after down-sampling
+MARKER_LIMIT = 200          # draw markers only on curves up to this many points
+RASTERIZE_ABOVE = 500       # rasterize curves with more points than this
+
+
+def is_headless():
+    """True when figures cannot (or should not) be shown interactively."""
+    flag = os.environ.get('PARETO_HEADLESS', '').lower()
+    if flag in ('1', 'true', 'yes'):
+        return True
+    if flag in ('0', 'false', 'no'):
+        return False
+    if os.environ.get('MPLBACKEND', '').lower() in ('agg', 'pdf', 'svg', 'ps', 'cairo', 'template'):
+        return True
+    return sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+def configure_backend():
+    """
+    Select the Agg backend when headless. Must run before pyplot is imported.
+    Returns True if figures may be shown interactively.
+    """
+    import matplotlib
+
+    if is_headless():
+        matplotlib.use('Agg')
+        return False
+    return True
+
+
+def pyplot():
+    """Configure the backend, then import matplotlib.pyplot on first use."""
+    configure_backend()
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def downsample_frontier(x, y, max_points=MAX_PLOT_POINTS):
+    """
+    Reduce a curve to at most ~max_points points, sorted by x.
+    Keeps the first and last point and the min / max y of each x bucket,
+    so the visible shape (including kinks) survives.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    order = np.argsort(x, kind='stable')
+    x, y = x[order], y[order]
+    n = len(x)
+    if max_points is None or n <= max_points:
+        return x, y
+    n_buckets = max(1, (max_points - 2) // 2)
+    edges = np.linspace(1, n - 1, n_buckets + 1).astype(int)
+    keep = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            seg = y[lo:hi]
+            keep += [lo + int(seg.argmin()), lo + int(seg.argmax())]
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+
+def curve_style(n_points):
+    """Marker / rasterization settings for a curve of n_points."""
+    return {'marker_on': n_points <= MARKER_LIMIT, 'rasterized': n_points > RASTERIZE_ABOVE}
+
+
+# ============================================================================
+# FIGURES
+# ============================================================================
+
+def plot_scenario(key, entry, out_file, dpi=150, max_points=MAX_PLOT_POINTS):
+    """Both Pareto curves (cost-min and env-min) of one scenario in one figure."""
+    from anu_pareto import format_billions
+
+    plt = pyplot()
+
+    meta = entry["meta"]
+    fig, ax = plt.subplots(figsize=(10, 7))
+    for df, label, marker in ((entry["c_min"], "Min cost (env constrained)", 'o'),
+                              (entry["e_min"], "Min emissions (cost constrained)", 's')):
+        x, y = downsample_frontier(df["env"].values, df["cost"].values, max_points)
+        style = curve_style(len(x))
+        ax.plot(x, y, marker=marker if style['marker_on'] else None, linewidth=2, markersize=5,
+                label=label, rasterized=style['rasterized'])
+    ax.xaxis.set_major_formatter(plt.FuncFormatter(format_billions))
+    ax.yaxis.set_major_formatter(plt.FuncFormatter(format_billions))
+    ax.set_xlabel("Emissions (kg CO2e)", fontsize=12, fontweight='bold')
+    ax.set_ylabel("Total Cost (€)", fontsize=12, fontweight='bold')
+    ax.set_title(f"Pareto Frontier: {meta['name']}", fontsize=14)
+    ax.legend(fontsize=11)
+    ax.grid(True, linestyle='--', alpha=0.6)
+    fig.savefig(out_file, dpi=dpi)
+    plt.close(fig)
+    return out_file
+
+
+def _run_task(task):
+    """Worker entry point: (kind, args) -> saved file name."""
+    import anu_pareto
+
+    kind, args = task
+    if kind == 'scenario':
+        return plot_scenario(*args)
+    if kind == 'env_on_x':
+        return anu_pareto.plot_perspective_env_on_x(*args)
+    if kind == 'cost_on_x':
+        return anu_pareto.plot_perspective_cost_on_x(*args)
+    raise ValueError(f"Unknown render task '{kind}'")
+
+
+def render_tasks(tasks, workers=None):
+    """Render (kind, args) tasks in a process pool; returns the saved files."""
+    tasks = list(tasks)
+    if workers == 1 or len(tasks) <= 1:
+        return [_run_task(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_backend) as pool:
+        return list(pool.map(_run_task, tasks))
+
+
+def comparison_tasks(data, out_dir='.', dpi=300, max_points=MAX_PLOT_POINTS):
+    """Tasks for the two anu_pareto comparison figures."""
+    return [
+        ('env_on_x', (data, os.path.join(out_dir, "Comparison_1_Env_on_X.png"), dpi, max_points)),
+        ('cost_on_x', (data, os.path.join(out_dir, "Comparison_2_Cost_on_X.png"), dpi, max_points)),
+    ]
+
+
+def render_run(db_path=None, run_id=None, out_dir='plots', workers=None, dpi=150,
+               max_points=MAX_PLOT_POINTS, scenarios=None):
+    """Per-scenario and comparison plots of one run in the results store."""
+    import anu_pareto
+
+    data = anu_pareto.load_data(db_path or anu_pareto.RESULTS_DB, run_id=run_id, scenarios=scenarios)
+    if not data:
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [('scenario', (key, entry, os.path.join(out_dir, f"Pareto_{key}.png"), dpi, max_points))
+             for key, entry in data.items()]
+    tasks += comparison_tasks(data, out_dir, dpi, max_points)
+    return render_tasks(tasks, workers)
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Render Pareto plots of a stored run without a display.")
+    parser.add_argument('--db', help="results store (default: pareto_results.sqlite)")
+    parser.add_argument('--run', help="run id (default: latest)")
+    parser.add_argument('--out', default='plots', help="output directory")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--max-points', type=int, default=MAX_PLOT_POINTS,
+                        help="points kept per curve after down-sampling")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('PARETO_HEADLESS', '1')
+    configure_backend()
+    start = time.perf_counter()
+    files = render_run(args.db, args.run, args.out, args.workers, args.dpi, args.max_points)
+    print(f"✓ {len(files)} figures in {time.perf_counter() - start:.1f}s → {args.out}/")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import datetime
+import json
+import os
+import sqlite3
+import uuid
+
+import pandas as pd
+
+from extract import point_path, write_flows
+
+# ============================================================================
+# RESULTS STORE
+# ============================================================================
+# One SQLite file holding every Pareto run instead of one CSV per scenario
+# and curve. Rows are keyed by (run, scenario, curve, point). The flow-level
+# solution of each point (see extract.py) is written to its own Parquet file,
+#
+#   <flows_root>/run=<id>/scenario=<s>/curve=<c>/point=<n>/flows.parquet
+#
+# (extract.point_path; flows_root defaults to <database>_flows next to the
+# database) and the points table holds its path, relative to the database.
+#
+#   runs      run_id, created, source, note
+#   scenarios run_id, scenario, name, params (JSON)
+#   points    run_id, scenario, curve, point, epsilon, cost, env, flows
+#   utilization run_id, scenario, curve, point, family, facility, open,
+#             load, capacity, utilization
+
+DEFAULT_PATH = "pareto_results.sqlite"
+FLOW_COLUMNS = ['group', 'origin', 'destination', 'product', 'flow', 'cost', 'emissions']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created TEXT NOT NULL,
+    source TEXT,
+    note TEXT
+);
+CREATE TABLE IF NOT EXISTS scenarios (
+    run_id TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    name TEXT,
+    params TEXT,
+    PRIMARY KEY (run_id, scenario)
+);
+CREATE TABLE IF NOT EXISTS points (
+    run_id TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    curve TEXT NOT NULL,
+    point INTEGER NOT NULL,
+    epsilon REAL,
+    cost REAL,
+    env REAL,
+    flows TEXT,
+    PRIMARY KEY (run_id, scenario, curve, point)
+);
+CREATE TABLE IF NOT EXISTS utilization (
+    run_id TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    curve TEXT NOT NULL,
+    point INTEGER NOT NULL,
+    family TEXT,
+    facility TEXT,
+    open REAL,
+    load REAL,
+    capacity REAL,
+    utilization REAL
+);
+"""
+
+
+class ResultsStore:
+    """
+    Pareto results of many runs and scenarios in a single SQLite database,
+    with the flows of every point in Parquet under `flows_root`.
+    Usable as a context manager; writes are committed on exit.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, flows_root=None):
+        self.path = path
+        self.base = os.path.dirname(os.path.abspath(path))
+        self.flows_root = flows_root or os.path.splitext(path)[0] + '_flows'
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        # Databases from before the Parquet flows have no points.flows column
+        if 'flows' not in [row[1] for row in self.conn.execute("PRAGMA table_info(points)")]:
+            self.conn.execute("ALTER TABLE points ADD COLUMN flows TEXT")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.commit()
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def new_run(self, source=None, note=None):
+        """Register a run and return its id (timestamp plus a short suffix)."""
+        now = datetime.datetime.now()
+        run_id = f"{now:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.conn.execute("INSERT INTO runs VALUES (?, ?, ?, ?)",
+                          (run_id, now.isoformat(timespec='seconds'),
+                           os.path.basename(source) if source else None, note))
+        return run_id
+
+    def add_scenario(self, run_id, scenario, name=None, params=None):
+        self.conn.execute("INSERT OR REPLACE INTO scenarios VALUES (?, ?, ?, ?)",
+                          (run_id, scenario, name, json.dumps(params or {})))
+
+    def add_point(self, run_id, scenario, curve, point, epsilon, cost, env, flows=None, utilization=None):
+        """
+        Store one Pareto point; `flows` is an optional extract.py DataFrame
+        with the point's flow-level solution (written to Parquet),
+        `utilization` an optional export.CapacityLayout DataFrame with its
+        facility loads.
+        """
+        key = (run_id, scenario, curve, int(point))
+        path = None
+        if flows is not None:
+            path = write_flows(flows, point_path(self.flows_root, run=run_id, scenario=scenario, curve=curve,
+                                                 point=f"{int(point):03d}"))
+            path = os.path.relpath(os.path.abspath(path), self.base)
+        self.conn.execute("INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                          key + (float(epsilon), float(cost), float(env), path))
+        self.conn.execute("DELETE FROM utilization WHERE run_id=? AND scenario=? AND curve=? AND point=?", key)
+        if utilization is not None and len(utilization):
+            cols = [utilization[c].astype(str).tolist() for c in ('family', 'facility')]
+            nums = [utilization[c].astype(float).tolist() for c in ('open', 'load', 'capacity', 'utilization')]
+            self.conn.executemany("INSERT INTO utilization VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  (key + row for row in zip(*cols, *nums)))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def runs(self):
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY created", self.conn)
+
+    def latest_run(self):
+        row = self.conn.execute("SELECT run_id FROM runs ORDER BY created DESC, rowid DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def scenarios(self, run_id=None):
+        run_id = run_id or self.latest_run()
+        df = pd.read_sql_query("SELECT scenario, name, params FROM scenarios WHERE run_id=? ORDER BY scenario",
+                               self.conn, params=(run_id,))
+        df['params'] = df['params'].map(json.loads)
+        return df
+
+    def points(self, run_id=None, scenarios=None, curve=None):
+        """Objective values of a run (latest by default), optionally filtered."""
+        run_id = run_id or self.latest_run()
+        sql = "SELECT scenario, curve, point, epsilon, cost, env FROM points WHERE run_id=?"
+        params = [run_id]
+        if scenarios is not None:
+            scenarios = list(scenarios)
+            sql += f" AND scenario IN ({','.join('?' * len(scenarios))})"
+            params += scenarios
+        if curve is not None:
+            sql += " AND curve=?"
+            params.append(curve)
+        return pd.read_sql_query(sql + " ORDER BY scenario, curve, point", self.conn, params=params)
+
+    def _flow_files(self, run_id):
+        """[(scenario, curve, point, Parquet path)] of the points of a run that have flows."""
+        rows = self.conn.execute("SELECT scenario, curve, point, flows FROM points WHERE run_id=? AND flows IS NOT NULL "
+                                 "ORDER BY scenario, curve, point", (run_id,))
+        return [(sc, cv, pt, os.path.join(self.base, path)) for sc, cv, pt, path in rows]
+
+    def flows(self, scenario, curve, point, run_id=None):
+        """Flow-level solution of one Pareto point."""
+        run_id = run_id or self.latest_run()
+        row = self.conn.execute("SELECT flows FROM points WHERE run_id=? AND scenario=? AND curve=? AND point=?",
+                                (run_id, scenario, curve, int(point))).fetchone()
+        if not row or row[0] is None:
+            return pd.DataFrame(columns=FLOW_COLUMNS)
+        return pd.read_parquet(os.path.join(self.base, row[0]))
+
+    def flow_groups(self, run_id=None):
+        """Variable groups with stored flows in a run."""
+        run_id = run_id or self.latest_run()
+        groups = set()
+        for *_, path in self._flow_files(run_id):
+            groups.update(pd.read_parquet(path, columns=['group'])['group'].unique())
+        return sorted(groups)
+
+    def iter_flows(self, group, run_id=None, chunk_rows=100_000):
+        """
+        Stored flows of one variable group over all points of a run, as
+        tuples (scenario, curve, point, origin, destination, product, flow,
+        cost, emissions) read `chunk_rows` at a time.
+        """
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        run_id = run_id or self.latest_run()
+        columns = ['origin', 'destination', 'product', 'flow', 'cost', 'emissions']
+        for scenario, curve, point, path in self._flow_files(run_id):
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=['group'] + columns):
+                batch = batch.filter(pc.equal(batch.column('group'), group))
+                values = [batch.column(c).to_pylist() for c in columns]
+                yield from ((scenario, curve, point) + row for row in zip(*values))
+
+    def breakdown(self, run_id=None):
+        """Cost and emissions of every point of a run summed by variable group."""
+        run_id = run_id or self.latest_run()
+        parts = []
+        for scenario, curve, point, path in self._flow_files(run_id):
+            sums = pd.read_parquet(path, columns=['group', 'cost', 'emissions']).groupby('group', as_index=False).sum()
+            parts.append(sums.assign(scenario=scenario, curve=curve, point=point))
+        columns = ['scenario', 'curve', 'point', 'group', 'cost', 'emissions']
+        return pd.concat(parts, ignore_index=True)[columns] if parts else pd.DataFrame(columns=columns)
+
+    def utilization(self, run_id=None):
+        """Facility loads of every point of a run."""
+        run_id = run_id or self.latest_run()
+        return pd.read_sql_query(
+            "SELECT scenario, curve, point, family, facility, open, load, capacity, utilization FROM utilization "
+            "WHERE run_id=? ORDER BY scenario, curve, point, family, facility",
+            self.conn, params=(run_id,))
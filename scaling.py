@@ -0,0 +1,238 @@
+import contextlib
+import io
+import math
+import sys
+import time
+
+import numpy as np
+
+# ============================================================================
+# COEFFICIENT SCALING
+# ============================================================================
+# Pre-solve stage that brings a built model to well-conditioned units. The
+# formulations mix 1e-4 €/kg-km transport rates with 2e4 € penalties and
+# 3e4 € fixed costs, and emissions run into the 1e9 kg CO2e, so the raw
+# matrix spans many orders of magnitude.
+#
+# Rows and continuous columns are equilibrated by geometric-mean scaling:
+# each pass divides every row, then every column, by the geometric mean of
+# its largest and smallest coefficient. The objective gets one factor of its
+# own. All factors are powers of two, so scaling adds no rounding error, and
+# binaries are never scaled, so integrality and big-M logic are untouched.
+# A column scaled by s holds x / s, and a row scaled by r holds r x (a x <= b),
+# including the epsilon row and its RHS.
+#
+# Results come back in model units:
+#   * objective / emission expressions are rewritten term by term, so
+#     getValue() is in € and kg CO2e as before
+#   * m._scaling holds the factors; extract.SolutionLayout and
+#     export.CapacityLayout unscale flows and capacity rows with them
+#   * Scaling.set_objective / Scaling.add_limit scale objectives and epsilon
+#     rows added after the model was scaled (ObjVal is then in scaled units)
+#
+#   python scaling.py supply_chain_data.xlsx
+
+SCALE_PASSES = 8            # geometric-mean passes (stops early once the range settles)
+
+
+def _pow2(x):
+    """Nearest power of two of positive factors (elementwise)."""
+    return np.exp2(np.round(np.log2(x)))
+
+
+def _range(values):
+    a = np.abs(np.asarray(values, dtype=np.float64))
+    a = a[(a > 0) & np.isfinite(a)]
+    return (float(a.min()), float(a.max())) if len(a) else (0.0, 0.0)
+
+
+def coefficient_ranges(m):
+    """Smallest and largest nonzero |value| of the matrix, objective, RHS and bounds of `m`."""
+    m.update()
+    matrix = [row.getCoeff(i) for row in map(m.getRow, m.getConstrs()) for i in range(row.size())]
+    variables = m.getVars()
+    return {
+        'matrix': _range(matrix),
+        'objective': _range(m.getAttr('Obj', variables)),
+        'rhs': _range(m.getAttr('RHS', m.getConstrs())),
+        'bounds': _range(m.getAttr('LB', variables) + m.getAttr('UB', variables)),
+    }
+
+
+def format_range(r):
+    return f"[{r[0]:.0e}, {r[1]:.0e}]" if r[1] else "-"
+
+
+class Scaling:
+    """
+    Scale a built model in place and keep the factors: `col` (by Var.index,
+    1 for binaries and integers), `row` (by Constr.index) and `obj`.
+    Rows and columns added later count as unscaled.
+    """
+
+    def __init__(self, m, passes=SCALE_PASSES):
+        from gurobipy import GRB
+
+        m.update()
+        self.before = coefficient_ranges(m)
+        constrs, variables = m.getConstrs(), m.getVars()
+        rows, cols, vals = [], [], []
+        for constr in constrs:
+            row = m.getRow(constr)
+            for i in range(row.size()):
+                rows.append(constr.index)
+                cols.append(row.getVar(i).index)
+                vals.append(row.getCoeff(i))
+        rows, cols, vals = np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64), np.array(vals)
+        nz = vals != 0
+        rows, cols, vals = rows[nz], cols[nz], vals[nz]
+        a = np.abs(vals)
+
+        self.row = np.ones(len(constrs))
+        self.col = np.ones(len(variables))
+        free = np.array([v.VType == GRB.CONTINUOUS for v in variables], dtype=bool)
+        spread = np.inf
+        for _ in range(passes):
+            for idx, factor, n, mask in ((rows, self.row, len(constrs), None), (cols, self.col, len(variables), free)):
+                scaled = a * self.row[rows] * self.col[cols]
+                hi = np.zeros(n)
+                lo = np.full(n, np.inf)
+                np.maximum.at(hi, idx, scaled)
+                np.minimum.at(lo, idx, scaled)
+                has = hi > 0 if mask is None else (hi > 0) & mask
+                factor[has] /= _pow2(np.sqrt(hi[has] * lo[has]))
+            scaled = a * self.row[rows] * self.col[cols]
+            new_spread = scaled.max() / scaled.min() if len(scaled) else 1.0
+            if new_spread >= spread * 0.99:
+                break
+            spread = new_spread
+
+        obj = np.array(m.getAttr('Obj', variables)) * self.col
+        self.obj = float(self._objective_factor(obj))
+
+        # Write the scaled coefficients, RHS, bounds and objective back
+        for r, c, v in zip(rows, cols, vals * self.row[rows] * self.col[cols]):
+            m.chgCoeff(constrs[r], variables[c], float(v))
+        m.setAttr('RHS', constrs, (np.array(m.getAttr('RHS', constrs)) * self.row).tolist())
+        for attr in ('LB', 'UB'):
+            bound = np.array(m.getAttr(attr, variables))
+            finite = np.abs(bound) < GRB.INFINITY
+            bound[finite] /= self.col[finite]
+            m.setAttr(attr, variables, bound.tolist())
+        m.setAttr('Obj', variables, (obj * self.obj).tolist())
+        m.ObjCon = m.ObjCon * self.obj
+        m.update()
+        self.after = coefficient_ranges(m)
+        m._scaling = self
+
+    @staticmethod
+    def _objective_factor(coef):
+        lo, hi = _range(coef)
+        return _pow2(1.0 / math.sqrt(lo * hi)) if hi else 1.0
+
+    def column(self, idx):
+        """Column factors of the variables at `idx` (Var.index values)."""
+        idx = np.asarray(idx, dtype=np.int64)
+        out = np.ones(len(idx))
+        known = idx < len(self.col)
+        out[known] = self.col[idx[known]]
+        return out
+
+    def rows(self, idx):
+        """Row factors of the constraints at `idx` (Constr.index values)."""
+        idx = np.asarray(idx, dtype=np.int64)
+        out = np.ones(len(idx))
+        known = idx < len(self.row)
+        out[known] = self.row[idx[known]]
+        return out
+
+    def expr(self, expr):
+        """An expression over the original variables, rewritten over the scaled ones."""
+        from gurobipy import LinExpr
+
+        n = expr.size()
+        variables = [expr.getVar(i) for i in range(n)]
+        coef = np.array([expr.getCoeff(i) for i in range(n)]) * self.column([v.index for v in variables])
+        return LinExpr(coef.tolist(), variables) + expr.getConstant()
+
+    def _factor(self, expr):
+        return float(self._objective_factor([expr.getCoeff(i) for i in range(expr.size())]))
+
+    def set_objective(self, m, expr, sense=None):
+        """Set a (rewritten) expression as objective, scaled; returns the factor of ObjVal."""
+        from gurobipy import GRB
+
+        factor = self._factor(expr)
+        m.setObjective(expr * factor, GRB.MINIMIZE if sense is None else sense)
+        return factor
+
+    def add_limit(self, m, expr, rhs, name=""):
+        """Add the epsilon row `expr <= rhs` for a (rewritten) expression, row-scaled."""
+        factor = self._factor(expr)
+        return m.addConstr(expr * factor <= rhs * factor, name)
+
+def column_scale(m, idx):
+    """Column factors of `m` at `idx` (ones for an unscaled model)."""
+    scaling = getattr(m, '_scaling', None)
+    return scaling.column(idx) if scaling is not None else np.ones(len(idx))
+
+
+def row_scale(m, idx):
+    """Row factors of `m` at `idx` (ones for an unscaled model)."""
+    scaling = getattr(m, '_scaling', None)
+    return scaling.rows(idx) if scaling is not None else np.ones(len(idx))
+
+
+def scale_model(model):
+    """
+    Scale a model built by integrate.build_circular_supply_chain_model in
+    place. The objective expressions and cost parts are rewritten over the
+    scaled variables; the Scaling is stored under model['scaling'].
+    """
+    scaling = Scaling(model['m'])
+    model['Z_Cost'] = scaling.expr(model['Z_Cost'])
+    model['Env_Total'] = scaling.expr(model['Env_Total'])
+    model['parts'] = {name: scaling.expr(part) for name, part in model['parts'].items()}
+    model['scaling'] = scaling
+    return scaling
+
+
+def main(argv=None):
+    import argparse
+
+    from integrate import build_circular_supply_chain_model, read_excel_data
+
+    parser = argparse.ArgumentParser(description="Coefficient ranges and solve time of integrate.py, unscaled vs scaled.")
+    parser.add_argument('workbook', nargs='?', default='supply_chain_data.xlsx')
+    parser.add_argument('--distance-store', help="on-disk DistanceStore instead of the Distance_Matrix sheet")
+    parser.add_argument('--epsilon', type=float, help="emission limit (default: the workbook's)")
+    args = parser.parse_args(argv)
+
+    data = read_excel_data(args.workbook, distance_store=args.distance_store)
+    if args.epsilon is not None:
+        data['epsilon_limit'] = args.epsilon
+    results = {}
+    for scaled in (False, True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = build_circular_supply_chain_model(data)
+        scaling = scale_model(model) if scaled else None
+        ranges = scaling.after if scaled else coefficient_ranges(model['m'])
+        start = time.perf_counter()
+        model['m'].optimize()
+        seconds = time.perf_counter() - start
+        ok = model['m'].SolCount > 0
+        results[scaled] = (ranges, seconds, model['Z_Cost'].getValue() if ok else None,
+                           model['Env_Total'].getValue() if ok else None)
+
+    print(f"{'':12}{'unscaled':>22}{'scaled':>22}")
+    for item in ('matrix', 'objective', 'rhs', 'bounds'):
+        print(f"  {item:10}{format_range(results[False][0][item]):>22}{format_range(results[True][0][item]):>22}")
+    print(f"  {'solve (s)':10}{results[False][1]:>22.3f}{results[True][1]:>22.3f}")
+    for n, label in ((2, 'cost (€)'), (3, 'env (kg)')):
+        print(f"  {label:10}" + "".join(f"{r[n]:>22,.2f}" if r[n] is not None else f"{'-':>22}"
+                                        for r in results.values()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from gurobipy import GRB
+
+from extract import expression_coefficients
+
+# ============================================================================
+# LP SENSITIVITY REPORT
+# ============================================================================
+# Post-solve stage for a model built by integrate.build_circular_supply_chain_model:
+# the facility decisions of the optimal MIP solution are fixed (Model.fixed())
+# and the resulting LP is re-solved. Its optimal basis gives, per named
+# constraint, the dual price and the right-hand-side range over which that
+# price holds (SARHSLow / SARHSUp), and per variable the reduced cost and
+# objective-coefficient range (SAObjLow / SAObjUp).
+#
+# Duals price the model's own objective. The other objective (emissions when
+# minimizing cost, cost when minimizing emissions) is priced on the same
+# basis by a sparse solve of B' y = c_B (scipy), so every constraint gets
+# both a marginal cost and a marginal emission figure.
+#
+#   python sensitivity.py supply_chain_data.xlsx -o sensitivity
+#
+# writes constraints.csv, variables.csv and parameters.csv.
+
+# parameter -> (constraint family, how the parameter enters the row)
+#   'rhs':      the parameter is the right-hand side
+#   'capacity': the row reads load <= CAP * W, so CAP acts as the RHS while W = 1
+PARAMETER_ROWS = {
+    'DEM': ('Demand', 'rhs'),
+    'RET': ('Returns', 'rhs'),
+    'epsilon_limit': ('Env_Limit', 'rhs'),
+    'CAP_o': ('Cap_O', 'capacity'),
+    'CAP_f': ('Cap_F', 'capacity'),
+    'CAP_r': ('Cap_R', 'capacity'),
+}
+CAPACITY_BINARIES = {'Cap_O': 'W_o', 'Cap_F': 'W_f', 'Cap_R': 'W_r'}
+
+# Basis prices below this (relative to the largest) are round-off and reported as 0
+PRICE_TOL = 1e-12
+
+
+def fixed_lp(model):
+    """
+    Solve the LP obtained by fixing the binaries of the solved MIP `model`.
+    Variables and constraints keep the order (and indices) of the MIP.
+    """
+    m = model['m']
+    if m.SolCount == 0:
+        raise ValueError("Model has no solution; solve it before the sensitivity stage")
+    lp = m.fixed() if m.IsMIP else m.copy()
+    lp.setParam('OutputFlag', 0)
+    lp.setParam('Method', 0)        # primal simplex: a vertex basis for ranging
+    lp.optimize()
+    if lp.Status != GRB.OPTIMAL:
+        raise ValueError(f"Fixed LP did not solve to optimality (status {lp.Status})")
+    return lp
+
+
+def basis_prices(lp, coef):
+    """
+    Dual prices y of objective coefficients `coef` on the LP's optimal basis
+    (B' y = c_B), i.e. d(coef . x) / d(rhs) for every row while the basis holds.
+    Returns (y, reduced costs coef - A' y).
+    """
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import spsolve
+
+    constrs = lp.getConstrs()
+    variables = lp.getVars()
+    A = lp.getA().tocsc()
+
+    vbasis = np.asarray(lp.getAttr('VBasis', variables))
+    cbasis = np.asarray(lp.getAttr('CBasis', constrs))
+    basic_vars = np.flatnonzero(vbasis == 0)
+    basic_slacks = np.flatnonzero(cbasis == 0)
+    slacks = sp.csc_matrix((np.ones(len(basic_slacks)), (basic_slacks, np.arange(len(basic_slacks)))),
+                           shape=(len(constrs), len(basic_slacks)))
+    B = sp.hstack([A[:, basic_vars], slacks], format='csc')
+    c_B = np.concatenate([coef[basic_vars], np.zeros(len(basic_slacks))])
+    y = np.atleast_1d(spsolve(B.T.tocsc(), c_B))
+    y[np.abs(y) <= PRICE_TOL * max(1.0, np.abs(y).max(initial=0.0))] = 0.0
+    return y, coef - A.T @ y
+
+
+def _key_label(key):
+    if key == ():
+        return ''
+    return ','.join(map(str, key)) if isinstance(key, tuple) else str(key)
+
+
+def sensitivity_report(model):
+    """
+    Fix the binaries of the solved `model`, re-solve the LP and return
+    {'constraints', 'variables', 'parameters'} DataFrames.
+    """
+    lp = fixed_lp(model)
+    data = model['data']
+    cost_coef = expression_coefficients(model['Z_Cost'], lp.NumVars)
+    env_coef = expression_coefficients(model['Env_Total'], lp.NumVars)
+    minimize_env = data['minimize_emissions_only']
+
+    constrs = lp.getConstrs()
+    variables = lp.getVars()
+    pi = np.asarray(lp.getAttr('Pi', constrs))
+    rc = np.asarray(lp.getAttr('RC', variables))
+    other_y, other_rc = basis_prices(lp, cost_coef if minimize_env else env_coef)
+    y_cost, rc_cost = (other_y, other_rc) if minimize_env else (pi, rc)
+    y_env, rc_env = (pi, rc) if minimize_env else (other_y, other_rc)
+
+    families = {}
+    for family, rows in model['constrs'].items():
+        for key, c in rows.items():
+            families[c.index] = (family, key)
+    cons = pd.DataFrame({
+        'constraint': lp.getAttr('ConstrName', constrs),
+        'family': [families.get(i, ('', ()))[0] for i in range(len(constrs))],
+        'key': [_key_label(families.get(i, ('', ()))[1]) for i in range(len(constrs))],
+        'sense': lp.getAttr('Sense', constrs),
+        'rhs': lp.getAttr('RHS', constrs),
+        'slack': lp.getAttr('Slack', constrs),
+        'dual': pi,
+        'marginal_cost': y_cost,
+        'marginal_env': y_env,
+        'rhs_low': lp.getAttr('SARHSLow', constrs),
+        'rhs_up': lp.getAttr('SARHSUp', constrs),
+    })
+
+    groups = {}
+    for group, td in model['vars'].items():
+        for key, v in td.items():
+            groups[v.index] = (group, key)
+    var = pd.DataFrame({
+        'variable': lp.getAttr('VarName', variables),
+        'group': [groups.get(j, ('', ()))[0] for j in range(len(variables))],
+        'key': [_key_label(groups.get(j, ('', ()))[1]) for j in range(len(variables))],
+        'value': lp.getAttr('X', variables),
+        'obj': lp.getAttr('Obj', variables),
+        'reduced_cost': rc,
+        'rc_cost': rc_cost,
+        'rc_env': rc_env,
+        'obj_low': lp.getAttr('SAObjLow', variables),
+        'obj_up': lp.getAttr('SAObjUp', variables),
+    })
+
+    rows = []
+    x = np.asarray(lp.getAttr('X', variables))
+    for name, (family, kind) in PARAMETER_ROWS.items():
+        for key, c in model['constrs'][family].items():
+            i = c.index
+            value = data[name] if key == () else data[name][key]
+            low, up = cons.at[i, 'rhs_low'], cons.at[i, 'rhs_up']
+            scale = 1.0
+            if kind == 'capacity':
+                # Only an open facility's capacity binds; its range is CAP + the RHS range
+                scale = float(round(x[model['vars'][CAPACITY_BINARIES[family]][key].index]))
+                low, up = (value + low, value + up) if scale else (-np.inf, np.inf)
+            rows.append({
+                'parameter': name, 'key': _key_label(key), 'value': float(value),
+                'marginal_cost': y_cost[i] * scale + 0.0, 'marginal_env': y_env[i] * scale + 0.0,
+                'valid_low': low, 'valid_up': up,
+            })
+    params = pd.DataFrame(rows, columns=['parameter', 'key', 'value', 'marginal_cost', 'marginal_env',
+                                         'valid_low', 'valid_up'])
+    return {'constraints': cons, 'variables': var, 'parameters': params, 'objective': lp.ObjVal}
+
+
+def write_report(report, out_dir):
+    """Write the report tables as CSV files into `out_dir`."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for name in ('constraints', 'variables', 'parameters'):
+        path = os.path.join(out_dir, f'{name}.csv')
+        report[name].to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    import argparse
+    import contextlib
+    import io
+
+    from integrate import build_circular_supply_chain_model, read_excel_data
+
+    parser = argparse.ArgumentParser(description="Duals, reduced costs and ranging of the fixed-facility LP.")
+    parser.add_argument('workbook', nargs='?', default='supply_chain_data.xlsx')
+    parser.add_argument('-o', '--output', default='sensitivity', help="output directory")
+    parser.add_argument('--distance-store', help="on-disk DistanceStore instead of the Distance_Matrix sheet")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = build_circular_supply_chain_model(read_excel_data(args.workbook, args.distance_store))
+    model['m'].optimize()
+    report = sensitivity_report(model)
+    write_report(report, args.output)
+
+    params = report['parameters']
+    print(f"✓ Fixed-facility LP objective: {report['objective']:,.2f}")
+    print(params.to_string(index=False, float_format=lambda v: f'{v:,.4g}'))
+    print(f"✓ Report written to: {args.output}/")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
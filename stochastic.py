@@ -0,0 +1,271 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from integrate import read_excel_data
+from montecarlo import sample_parameters
+from updates import FACILITY_GROUPS, build_updater
+
+# ============================================================================
+# TWO-STAGE STOCHASTIC MODEL (PROGRESSIVE HEDGING)
+# ============================================================================
+# Facility opening (W_o, W_f, W_r) is decided here-and-now; all flows are
+# recourse decisions made once a demand / return scenario is known. The
+# extensive form (one copy of the flows per scenario) is never built.
+# Instead each scenario is solved as its own copy of the integrate.py model,
+# and progressive hedging drives the scenario copies of W to consensus:
+#
+#   min  cost_s(x_s) + w_s . W_s + rho/2 |W_s - W_bar|^2
+#
+# For binary W the proximal term is linear (W^2 = W), so every subproblem
+# is the original MIP with changed objective coefficients on W. Subproblems
+# are solved in worker processes, each of which builds the model once and
+# re-solves scenarios in place, warm-started from that scenario's previous
+# solution.
+#
+#   python stochastic.py supply_chain_data.xlsx -n 200 --workers 8
+#   python stochastic.py supply_chain_data.xlsx --spec scenarios.json --rho 0.5
+
+# Default scenario distributions for the second-stage uncertainty
+DEFAULT_SCENARIO_SPEC = {
+    'DEM': {'dist': 'normal', 'cv': 0.2},
+    'RET': {'dist': 'uniform', 'spread': 0.2},
+}
+RHO_FACTOR = 0.5            # rho per facility = factor x its fixed cost (cost-proportional rho)
+MAX_ITERATIONS = 50
+CONSENSUS_TOL = 1e-3        # stop when the expected deviation sum_s p_s |W_s - W_bar| is below this
+BATCH_SIZE = 10             # scenarios per worker task
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+# One built model per worker process, created by the pool initializer.
+
+_worker = {}
+
+
+def _init_worker(workbook, distance_store=None, overrides=None):
+    updater = build_updater(workbook, distance_store, overrides, threads=1)
+    facilities = [(g, node) for g in FACILITY_GROUPS.values() for node in updater.var_index[g]]
+    _worker['updater'] = updater
+    _worker['w_index'] = np.array([updater.var_index[g][node] for g, node in facilities], dtype=np.int64)
+    _worker['w_vars'] = [updater._vars[i] for i in _worker['w_index']]
+    _worker['last_x'] = {}
+
+
+def _solve_batch(task):
+    """
+    Solve the scenario subproblems of one batch.
+    task = (scenario ids, {name: (keys, values)}, PH weights (n, n_fac),
+    W_bar, rho, fixed W or None). Returns (ids, W (n, n_fac), cost, env, status).
+    """
+    ids, scenarios, weights, w_bar, rho, fixed = task
+    updater = _worker['updater']
+    w_index, w_vars = _worker['w_index'], _worker['w_vars']
+    if fixed is not None:
+        updater.m.setAttr('LB', w_vars, fixed.tolist())
+        updater.m.setAttr('UB', w_vars, fixed.tolist())
+
+    W = np.full((len(ids), len(w_index)), np.nan)
+    cost, env = np.full(len(ids), np.nan), np.full(len(ids), np.nan)
+    status = []
+    for r, sid in enumerate(ids):
+        updater.set_many([(name, key, values[r, j]) for name, (keys, values) in scenarios.items()
+                          for j, key in enumerate(keys)])
+        coef = updater.cost_coef if updater.objective == 'cost' else updater.env_coef
+        obj = coef[w_index] + weights[r] + rho / 2.0 * (1.0 - 2.0 * w_bar)
+        updater.m.setAttr('Obj', w_vars, obj.tolist())
+        updater.last_x = _worker['last_x'].get(sid, updater.last_x)
+        result = updater.solve()
+        status.append(result['status'])
+        if 'cost' in result:
+            _worker['last_x'][sid] = updater.last_x
+            W[r] = np.round(np.asarray(updater.last_x)[w_index])
+            cost[r], env[r] = result['cost'], result['env']
+
+    coef = updater.cost_coef if updater.objective == 'cost' else updater.env_coef
+    updater.m.setAttr('Obj', w_vars, coef[w_index].tolist())
+    if fixed is not None:
+        updater.m.setAttr('LB', w_vars, [0.0] * len(w_vars))
+        updater.m.setAttr('UB', w_vars, [1.0] * len(w_vars))
+    return ids, W, cost, env, status
+
+
+class _Runner:
+    """Runs batches inline (workers=1) or in a persistent process pool."""
+
+    def __init__(self, init, workers):
+        self.pool = None
+        if workers == 1:
+            _init_worker(*init)
+        else:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init)
+
+    def map(self, tasks):
+        return list(self.pool.map(_solve_batch, tasks)) if self.pool else [_solve_batch(t) for t in tasks]
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+
+
+def _solve_all(runner, scenarios, n, weights, w_bar, rho, fixed=None, batch_size=BATCH_SIZE):
+    tasks = []
+    for start in range(0, n, batch_size):
+        stop = min(n, start + batch_size)
+        tasks.append((np.arange(start, stop),
+                      {name: (keys, values[start:stop]) for name, (keys, values) in scenarios.items()},
+                      weights[start:stop], w_bar, rho, fixed))
+    n_fac = len(w_bar)
+    W, cost, env = np.full((n, n_fac), np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    status = [None] * n
+    for ids, w, c, e, s in runner.map(tasks):
+        W[ids], cost[ids], env[ids] = w, c, e
+        for i, st in zip(ids, s):
+            status[i] = st
+    return W, cost, env, status
+
+
+def _drop_failed(status, active, p):
+    """
+    Deactivate scenarios whose subproblem was not solved to optimality (their
+    rows of W are NaN) and return the probabilities renormalised over the rest.
+    """
+    active &= np.array([st == 'OPTIMAL' for st in status], dtype=bool)
+    if not active.any():
+        raise RuntimeError("No scenario subproblem solved to optimality")
+    q = np.where(active, p, 0.0)
+    return q / q.sum()
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def progressive_hedging(workbook, scenarios, n_scenarios, probabilities=None, rho_factor=RHO_FACTOR,
+                        max_iterations=MAX_ITERATIONS, tol=CONSENSUS_TOL, workers=None,
+                        batch_size=BATCH_SIZE, distance_store=None, overrides=None):
+    """
+    Solve the two-stage model over `scenarios` ({name: (keys, values)} as from
+    montecarlo.sample_parameters) by progressive hedging.
+    Returns a dictionary with the consensus facility decision ('decision'),
+    its expected cost / emissions, per-scenario results and the iteration history.
+    Scenarios whose subproblem is not solved to optimality (time limit,
+    infeasible) are dropped from then on and listed under 'failed'; the
+    probabilities are renormalised over the remaining ones.
+    """
+    p = np.full(n_scenarios, 1.0 / n_scenarios) if probabilities is None else np.asarray(probabilities, float)
+    p = p / p.sum()
+    base = build_updater(workbook, distance_store, overrides)
+    facilities = [(g, node) for g in FACILITY_GROUPS.values() for node in base.var_index[g]]
+    coef = base.cost_coef if base.objective == 'cost' else base.env_coef
+    fixed_cost = np.array([coef[base.var_index[g][node]] for g, node in facilities])
+    rho = rho_factor * np.maximum(np.abs(fixed_cost), 1.0)
+    n_fac = len(facilities)
+
+    start = time.perf_counter()
+    runner = _Runner((workbook, distance_store, overrides), workers)
+    history = []
+    active = np.ones(n_scenarios, dtype=bool)
+    try:
+        # Iteration 0: scenarios solved independently
+        weights = np.zeros((n_scenarios, n_fac))
+        W, cost, env, status = _solve_all(runner, scenarios, n_scenarios, weights, np.zeros(n_fac),
+                                          np.zeros(n_fac), batch_size=batch_size)
+        q = _drop_failed(status, active, p)
+        w_bar = q[active] @ W[active]
+        weights = rho * (np.nan_to_num(W) - w_bar)
+        converged = False
+        for it in range(1, max_iterations + 1):
+            W, cost, env, status = _solve_all(runner, scenarios, n_scenarios, weights, w_bar, rho,
+                                              batch_size=batch_size)
+            q = _drop_failed(status, active, p)
+            w_bar = q[active] @ W[active]
+            weights[active] += rho * (W[active] - w_bar)
+            deviation = float(q[active] @ np.abs(W[active] - w_bar).sum(axis=1))
+            history.append({'iteration': it, 'deviation': deviation, 'expected_cost': float(q[active] @ cost[active]),
+                            **{node: w_bar[i] for i, (_, node) in enumerate(facilities)}})
+            if deviation <= tol:
+                converged = True
+                break
+
+        # Evaluate the consensus decision in every scenario
+        decision = (w_bar >= 0.5).astype(float)
+        W, cost, env, status = _solve_all(runner, scenarios, n_scenarios, np.zeros((n_scenarios, n_fac)),
+                                          np.zeros(n_fac), np.zeros(n_fac), fixed=decision,
+                                          batch_size=batch_size)
+        q = _drop_failed(status, active, p)
+    finally:
+        runner.close()
+
+    per_scenario = pd.DataFrame({'scenario': np.arange(n_scenarios), 'probability': q, 'status': status,
+                                 'cost': cost, 'env': env})
+    return {
+        'decision': {node: bool(decision[i]) for i, (_, node) in enumerate(facilities)},
+        'expected_cost': float(q[active] @ cost[active]),
+        'expected_env': float(q[active] @ env[active]),
+        'scenarios': per_scenario,
+        'failed': np.flatnonzero(~active).tolist(),
+        'history': pd.DataFrame(history),
+        'iterations': len(history),
+        'converged': converged,
+        'elapsed_s': time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    import argparse
+    import contextlib
+    import io
+
+    parser = argparse.ArgumentParser(description="Two-stage stochastic facility plan by progressive hedging.")
+    parser.add_argument('workbook', nargs='?', default='supply_chain_data.xlsx')
+    parser.add_argument('--spec', help="JSON file (or inline JSON) with scenario distributions "
+                                       "(default: DEM normal cv 0.2, RET uniform +-20%%)")
+    parser.add_argument('-n', '--scenarios', type=int, default=100)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--rho', type=float, default=RHO_FACTOR, help="rho as a multiple of each fixed cost")
+    parser.add_argument('--max-iterations', type=int, default=MAX_ITERATIONS)
+    parser.add_argument('--tol', type=float, default=CONSENSUS_TOL)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--distance-store', help="on-disk DistanceStore instead of the Distance_Matrix sheet")
+    args = parser.parse_args(argv)
+
+    spec = DEFAULT_SCENARIO_SPEC
+    if args.spec:
+        if os.path.exists(args.spec):
+            with open(args.spec, encoding='utf-8') as fh:
+                spec = json.load(fh)
+        else:
+            spec = json.loads(args.spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = read_excel_data(args.workbook, distance_store=args.distance_store)
+    scenarios = sample_parameters(data, spec, args.scenarios, args.seed)
+
+    ph = progressive_hedging(args.workbook, scenarios, args.scenarios, rho_factor=args.rho,
+                             max_iterations=args.max_iterations, tol=args.tol, workers=args.workers,
+                             batch_size=args.batch_size, distance_store=args.distance_store)
+    print("=" * 70)
+    print(f"PROGRESSIVE HEDGING: {args.scenarios} scenarios, {ph['iterations']} iterations "
+          f"({'converged' if ph['converged'] else 'not converged'}, {ph['elapsed_s']:.1f}s)")
+    print("=" * 70)
+    print("First-stage decision: " + ', '.join(f"{n} {'open' if v else 'closed'}" for n, v in ph['decision'].items()))
+    print(f"→ Expected cost: €{ph['expected_cost']:,.2f}")
+    print(f"→ Expected emissions: {ph['expected_env']:,.2f} kg CO2e")
+    if ph['failed']:
+        print(f"✗ {len(ph['failed'])} scenarios dropped (not solved to optimality): "
+              f"{', '.join(map(str, ph['failed']))}")
+    if len(ph['history']):
+        print("\n" + ph['history'][['iteration', 'deviation', 'expected_cost']].to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
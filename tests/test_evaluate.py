@@ -0,0 +1,62 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+pytest.importorskip("gurobipy")
+
+from evaluate import PlanEvaluator
+from extract import SolutionLayout
+from integrate import VARIABLE_ROLES, build_circular_supply_chain_model, read_excel_data
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'supply_chain_data.xlsx')
+
+OVERRIDES = [
+    {},
+    {'omega': {'Monocrystalline': 30.0}},
+    {'T': 0.01, 'E_T': 9e-5},
+    {'Penalty': 5000.0},
+    {'Rev_reuse': {'Monocrystalline': 60.0}, 'Rev_recycle': {'Aluminum': 2.5}},
+    {'E_r': {'R1': 3.0}, 'FixO': {'O1': 20000}, 'RC': {'R2': 1.0}},
+    {'omega': {'Monocrystalline': 14.0}, 'PC': {'P1': 150}, 'E_p': {'P2': 500}},
+]
+
+
+def build(data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = build_circular_supply_chain_model(data)
+    model['m'].setParam('OutputFlag', 0)
+    return model
+
+
+@pytest.fixture(scope='module')
+def solved():
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = read_excel_data(WORKBOOK)
+    model = build(data)
+    model['m'].optimize()
+    layout = SolutionLayout(model['m'], model['vars'], VARIABLE_ROLES, model['Z_Cost'], model['Env_Total'])
+    return data, layout.extract(model['m']), model['m'].getAttr('X', model['m'].getVars())
+
+
+@pytest.mark.parametrize('params', OVERRIDES)
+def test_evaluator_matches_the_fixed_model(solved, params):
+    data, plan, x = solved
+    scores = PlanEvaluator(data).evaluate(plan, params)
+
+    # The same plan, fixed in a model rebuilt from the overridden data (heavier
+    # panels may exceed the emission limit, which prices nothing)
+    rebuilt = build(dict(PlanEvaluator(data).resolve(params), epsilon_limit=float('inf')))
+    m = rebuilt['m']
+    m.setAttr('LB', m.getVars(), x)
+    m.setAttr('UB', m.getVars(), x)
+    m.optimize()
+    assert scores.loc[0, 'Z_Cost'] == pytest.approx(rebuilt['Z_Cost'].getValue(), rel=1e-9)
+    assert scores.loc[0, 'Env_Total'] == pytest.approx(rebuilt['Env_Total'].getValue(), rel=1e-9)
+
+
+@pytest.mark.parametrize('name', ['DIST', 'K', 'C'])
+def test_network_cannot_be_overridden(solved, name):
+    with pytest.raises(KeyError):
+        PlanEvaluator(solved[0]).evaluate(solved[1], {name: solved[0][name]})
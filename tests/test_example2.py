@@ -0,0 +1,53 @@
+import os
+import re
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from dataset import convert_workbook
+
+pytest.importorskip("gurobipy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bom_sheets():
+    """Suppliers ship materials Q1 / Q2 only; plants turn them into P1 / P2 through the BOM."""
+    arcs = ([(s, m, q, 2) for s in ('S1', 'S2') for m in ('M1', 'M2') for q in ('Q1', 'Q2')]
+            + [(m, 'W1', p, 5) for m in ('M1', 'M2') for p in ('P1', 'P2')]
+            + [('W1', c, p, 1) for c in ('C1', 'C2') for p in ('P1', 'P2')])
+    return {
+        'bS_supply_capacity': pd.DataFrame({'supplier': ['S1', 'S1', 'S2', 'S2'], 'product': ['Q1', 'Q2', 'Q1', 'Q2'],
+                                            'capacity': [2000, 3000, 2000, 3000]}),
+        'bMH_facility_capacity': pd.DataFrame({'facility': ['M1', 'M2', 'W1'], 'capacity': [1500, 1500, 3000]}),
+        'demand': pd.DataFrame({'customer': ['C1', 'C1', 'C2', 'C2'], 'product': ['P1', 'P2', 'P1', 'P2'],
+                                'demand': [500, 600, 700, 800]}),
+        'BOM': pd.DataFrame({'material_q': ['Q1', 'Q2', 'Q1', 'Q2'], 'product_p': ['P1', 'P1', 'P2', 'P2'],
+                             'amount': [1, 2, 1, 1]}),
+        'r': pd.DataFrame({'facility': ['M1', 'M1', 'M2', 'M2', 'W1', 'W1'], 'product': ['P1', 'P2'] * 3,
+                           'r': [1] * 6}),
+        'transport_cost': pd.DataFrame(arcs, columns=['i', 'j', 'product', 'cost']),
+        'procurement_cost': pd.DataFrame({'supplier': ['S1', 'S1', 'S2', 'S2'], 'product': ['Q1', 'Q2', 'Q1', 'Q2'],
+                                          'cost': [3, 4, 3, 5]}),
+        'manufacturing_cost': pd.DataFrame({'facility': ['M1', 'M1', 'M2', 'M2'], 'product': ['P1', 'P2'] * 2,
+                                            'cost': [10, 12, 11, 11]}),
+        'fixed_cost': pd.DataFrame({'facility': ['M1', 'M2', 'W1'], 'fixed_cost': [1000, 1200, 500]}),
+    }
+
+
+def test_bom_materials_from_suppliers(tmp_path):
+    with pd.ExcelWriter(tmp_path / 'bom.xlsx') as writer:
+        for name, frame in bom_sheets().items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+    dataset = convert_workbook(str(tmp_path / 'bom.xlsx'), str(tmp_path / 'bom_dataset'))
+
+    proc = subprocess.run([sys.executable, os.path.join(ROOT, 'example2.py'), dataset], cwd=tmp_path,
+                          capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': ROOT})
+    assert proc.returncode == 0, proc.stderr
+    assert 'Falling back to identity-BOM' not in proc.stdout
+    # Q1 7,800 + Q2 16,000 procurement, 28,400 transport, 27,400 manufacturing, 2,700 fixed
+    optimum = re.search(r"MIP optimum:\s*([\d,.]+)", proc.stdout)
+    assert optimum, proc.stdout
+    assert float(optimum.group(1).replace(',', '')) == pytest.approx(82300)
@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+from bench_imports import ENTRY_POINTS, LAZY_MODULES, import_profile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('module', ENTRY_POINTS)
+def test_entry_point_loads_no_lazy_module(module):
+    loaded = import_profile(module, ROOT)
+    assert module in loaded
+    assert [lib for lib in LAZY_MODULES if lib in loaded] == []
@@ -0,0 +1,56 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+pytest.importorskip("gurobipy")
+
+from integrate import build_circular_supply_chain_model, read_excel_data
+from reduction import reduce_data
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'supply_chain_data.xlsx')
+
+
+@pytest.fixture(scope='module')
+def data():
+    with contextlib.redirect_stdout(io.StringIO()):
+        return read_excel_data(WORKBOOK)
+
+
+def objective(data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        m = build_circular_supply_chain_model(data)['m']
+    m.setParam('OutputFlag', 0)
+    m.optimize()
+    return m.Status, m.ObjVal if m.SolCount else None
+
+
+# Without landfills, recycling centers are the only outlet for returns beyond refurbishment and reuse
+CASES = {
+    'shipped': lambda d: {},
+    'no recovered material': lambda d: {'L': [], 'gamma': {key: 0.0 for key in d['gamma']}},
+    'no materials': lambda d: {'L': [], 'M': []},
+    'no secondary markets': lambda d: {'L': [], 'S': []},
+    'zero recycling yield': lambda d: {'L': [], 'S': [], 'beta': {r: 0.0 for r in d['beta']}},
+}
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_reduced_model_has_the_same_optimum(data, case):
+    variant = dict(data, **CASES[case](data))
+    status, full = objective(variant)
+    assert objective(reduce_data(variant)[0]) == (status, pytest.approx(full, rel=1e-9))
+
+
+def test_expand_maps_a_reduced_group_back_to_the_full_index(data):
+    variant = dict(data, L=[], S=[])
+    reduced, reduction = reduce_data(variant)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = build_circular_supply_chain_model(reduced)
+    model['m'].setParam('OutputFlag', 0)
+    model['m'].optimize()
+    name, group = next((n, g) for n, g in model['vars'].items() if len(g) < len(reduction.full.get(n, g)))
+    values = reduction.expand(name, {key: var.X for key, var in group.items()})
+    assert set(values) == set(reduction.full[name])
+    assert all(values[key] == 0.0 for key in set(values) - set(group))
@@ -0,0 +1,275 @@
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# ============================================================================
+# SOLVER PARAMETER TUNING
+# ============================================================================
+# Tunes Gurobi parameters on generated instances and keeps the best set per
+# instance class, (formulation, size bucket), in PROFILE_PATH. Builders call
+# apply_profile() on every model they create, so a tuned class runs with its
+# parameters automatically; classes without a profile keep the defaults.
+#
+# Instances are the workbook's network with every facility split into 1, 2,
+# 4, ... identical modules (cuts.split_facilities), which multiplies the
+# facility binaries, and demand / returns perturbed by +-SPREAD. Candidates
+# come from Gurobi's tuner (one tune run per instance) or from GRID, and are
+# all scored on every instance of the class: the shifted geometric mean of
+# Gurobi's deterministic work units, doubled for runs that hit the time
+# limit. Work units do not depend on machine load, so a profile tuned on a
+# busy machine still ranks the candidates correctly.
+#
+#   python tuning.py supply_chain_data.xlsx --formulation integrate --units 1 2 4 --per-size 3
+#   python tuning.py supply_chain_data.xlsx --method grid --time-limit 10
+#   python tuning.py --show
+
+PROFILE_PATH = 'solver_profiles.json'
+FORMULATIONS = ('integrate', 'multiperiod')
+
+# Size bucket of a model by its number of variables: (upper bound, name)
+SIZE_BUCKETS = ((1_000, 'tiny'), (10_000, 'small'), (100_000, 'medium'), (1_000_000, 'large'), (math.inf, 'huge'))
+
+SPREAD = 0.2                # relative perturbation of demand and returns
+TUNE_TIME_LIMIT = 60.0      # seconds of Gurobi tuning per instance
+RUN_TIME_LIMIT = 30.0       # seconds per scoring solve
+WORK_SHIFT = 0.01           # work units added before the geometric mean
+GRID = {'MIPFocus': [0, 1, 2], 'Cuts': [-1, 0, 2], 'Presolve': [-1, 2]}
+
+# Parameters never taken into a profile: output, limits and resources are the caller's
+IGNORED_PARAMS = {
+    'OutputFlag', 'LogToConsole', 'LogFile', 'TimeLimit', 'WorkLimit', 'Threads', 'SoftMemLimit', 'NodefileDir',
+    'TuneTimeLimit', 'TuneOutput', 'TuneResults', 'TuneTrials', 'TuneCriterion',
+}
+
+_profiles = {}      # path -> (mtime, profiles)
+
+
+def size_bucket(num_vars):
+    return next(name for bound, name in SIZE_BUCKETS if num_vars < bound)
+
+
+def load_profiles(path=PROFILE_PATH):
+    """{formulation: {bucket: profile}} from `path` ({} if there is none); re-read when the file changes."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    if path not in _profiles or _profiles[path][0] != mtime:
+        with open(path) as fh:
+            _profiles[path] = (mtime, json.load(fh))
+    return _profiles[path][1]
+
+
+def save_profile(formulation, bucket, profile, path=PROFILE_PATH):
+    profiles = dict(load_profiles(path))
+    profiles.setdefault(formulation, {})[bucket] = profile
+    with open(path, 'w') as fh:
+        json.dump(profiles, fh, indent=2, sort_keys=True)
+    return profiles
+
+
+def apply_profile(m, formulation, path=PROFILE_PATH):
+    """
+    Set the tuned parameters of the class of `m` (see module header).
+    Returns (bucket, parameters applied); the parameters are {} without a profile.
+    """
+    m.update()
+    bucket = size_bucket(m.NumVars)
+    params = load_profiles(path).get(formulation, {}).get(bucket, {}).get('params', {})
+    for name, value in params.items():
+        m.setParam(name, value)
+    return bucket, params
+
+
+def changed_params(m):
+    """Non-default parameters of `m` (as written to a .prm file), minus IGNORED_PARAMS."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'params.prm')
+        m.write(path)
+        with open(path) as fh:
+            lines = [line.split() for line in fh if line.strip() and not line.startswith('#')]
+    params = {}
+    for name, value in lines:
+        if name not in IGNORED_PARAMS:
+            number = float(value)
+            params[name] = int(number) if number.is_integer() and '.' not in value else number
+    return params
+
+
+def _defaults(m):
+    """Reset `m` to Gurobi's default parameters, with output off."""
+    m.setParam('OutputFlag', 0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        m.resetParams()
+    m.setParam('OutputFlag', 0)
+
+
+# ============================================================================
+# INSTANCES
+# ============================================================================
+
+def generate_instances(data, units=(1, 2, 4), per_size=2, seed=0):
+    """Data dictionaries: `per_size` perturbed copies of `data` per facility split in `units`."""
+    from cuts import split_facilities
+
+    rng = np.random.default_rng(seed)
+    instances = []
+    for u in units:
+        split = split_facilities(data, u) if u > 1 else data
+        for _ in range(per_size):
+            inst = dict(split)
+            for name in ('DEM', 'RET'):
+                inst[name] = {k: v * rng.uniform(1 - SPREAD, 1 + SPREAD) for k, v in split[name].items()}
+            instances.append(inst)
+    return instances
+
+
+def build(formulation, data):
+    """Model of `formulation` for a data dictionary, with default parameters."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        if formulation == 'integrate':
+            from integrate import build_circular_supply_chain_model
+            m = build_circular_supply_chain_model(data)['m']
+        elif formulation == 'multiperiod':
+            from multiperiod import ROLLING_WINDOW, build_multiperiod_model, period_profile
+            m = build_multiperiod_model(data, period_profile(ROLLING_WINDOW, return_growth=0.1))['m']
+        else:
+            raise ValueError(f"Unknown formulation '{formulation}' (use one of {', '.join(FORMULATIONS)})")
+    _defaults(m)
+    return m
+
+
+# ============================================================================
+# SCORING AND TUNING
+# ============================================================================
+
+def score(models, params, time_limit=RUN_TIME_LIMIT):
+    """Shifted geometric mean of work units of `models` solved from scratch with `params`."""
+    from gurobipy import GRB
+
+    logs = []
+    for m in models:
+        _defaults(m)
+        m.setParam('TimeLimit', time_limit)
+        for name, value in params.items():
+            m.setParam(name, value)
+        m.reset(1)
+        m.optimize()
+        work = m.Work * (1 if m.Status == GRB.OPTIMAL else 2)
+        logs.append(math.log(work + WORK_SHIFT))
+    return math.exp(sum(logs) / len(logs)) - WORK_SHIFT
+
+
+def tuner_candidates(m, tune_time=TUNE_TIME_LIMIT):
+    """Parameter sets Gurobi's tuner found for `m`, best first (the baseline excluded)."""
+    _defaults(m)
+    m.setParam('TuneOutput', 0)
+    m.setParam('TuneTimeLimit', tune_time)
+    m.tune()
+    candidates = []
+    for i in range(1, m.TuneResultCount):
+        m.getTuneResult(i)
+        candidates.append(changed_params(m))
+    _defaults(m)
+    return candidates
+
+
+def grid_candidates(grid=GRID):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def tune_class(models, method='tune', tune_time=TUNE_TIME_LIMIT, time_limit=RUN_TIME_LIMIT):
+    """
+    Best parameter set for the models of one class. Returns a profile
+    {'params', 'score', 'default_score', 'instances', 'method', 'tuned'}.
+    """
+    candidates = []
+    if method == 'tune':
+        for m in models:
+            candidates += tuner_candidates(m, tune_time)
+    elif method == 'grid':
+        candidates = grid_candidates()
+    else:
+        raise ValueError(f"Unknown method '{method}' (use 'tune' or 'grid')")
+    unique = {json.dumps(c, sort_keys=True): c for c in candidates if c}
+    default = score(models, {}, time_limit)
+    best, best_score = {}, default
+    for params in unique.values():
+        s = score(models, params, time_limit)
+        if s < best_score:
+            best, best_score = params, s
+    return {'params': best, 'score': best_score, 'default_score': default, 'instances': len(models),
+            'method': method, 'tuned': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def tune(data, formulation='integrate', units=(1, 2, 4), per_size=2, method='tune', seed=0,
+         tune_time=TUNE_TIME_LIMIT, time_limit=RUN_TIME_LIMIT, path=PROFILE_PATH):
+    """Generate instances, tune every size bucket they fall in and store the profiles. Returns {bucket: profile}."""
+    classes = {}
+    for inst in generate_instances(data, units, per_size, seed):
+        m = build(formulation, inst)
+        classes.setdefault(size_bucket(m.NumVars), []).append(m)
+    results = {}
+    for bucket, models in classes.items():
+        results[bucket] = tune_class(models, method, tune_time, time_limit)
+        save_profile(formulation, bucket, results[bucket], path)
+    return results
+
+
+def _print_profiles(profiles):
+    for formulation, buckets in profiles.items():
+        for bucket, p in buckets.items():
+            gain = 1 - p['score'] / p['default_score'] if p['default_score'] else 0.0
+            params = ', '.join(f"{k}={v}" for k, v in p['params'].items()) or 'defaults'
+            print(f"  {formulation:12} {bucket:8} {p['instances']:>3} instances  work {p['default_score']:,.3f} → "
+                  f"{p['score']:,.3f} ({gain:.0%} less)  {params}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tune Gurobi parameters per instance class and store the profiles.")
+    parser.add_argument('workbook', nargs='?', default='supply_chain_data.xlsx')
+    parser.add_argument('--formulation', choices=FORMULATIONS, default='integrate')
+    parser.add_argument('--units', type=int, nargs='+', default=[1, 2, 4],
+                        help="facility splits of the generated instances (sets the size range)")
+    parser.add_argument('--per-size', type=int, default=2, help="perturbed instances per split")
+    parser.add_argument('--method', choices=('tune', 'grid'), default='tune',
+                        help="Gurobi's tuner, or a grid search over GRID")
+    parser.add_argument('--tune-time', type=float, default=TUNE_TIME_LIMIT, help="tuner seconds per instance")
+    parser.add_argument('--time-limit', type=float, default=RUN_TIME_LIMIT, help="seconds per scoring solve")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profiles', default=PROFILE_PATH)
+    parser.add_argument('--show', action='store_true', help="print the stored profiles and exit")
+    parser.add_argument('--distance-store', help="on-disk DistanceStore instead of the Distance_Matrix sheet")
+    args = parser.parse_args(argv)
+
+    if not args.show:
+        from integrate import read_excel_data
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = read_excel_data(args.workbook, distance_store=args.distance_store)
+        start = time.perf_counter()
+        results = tune(data, args.formulation, args.units, args.per_size, args.method, args.seed,
+                       args.tune_time, args.time_limit, args.profiles)
+        print(f"✓ Tuned {len(results)} size buckets of '{args.formulation}' in {time.perf_counter() - start:,.0f}s")
+    profiles = load_profiles(args.profiles)
+    if not profiles:
+        print(f"✗ No profiles in {args.profiles}")
+        return 1
+    print(f"Profiles ({os.path.abspath(args.profiles)}):")
+    _print_profiles(profiles)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
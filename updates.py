@@ -0,0 +1,387 @@
+import contextlib
+import copy
+import io
+
+import numpy as np
+from gurobipy import GRB
+
+from evaluate import TRANSPORT_GROUPS, PlanEvaluator
+from extract import expression_coefficients
+from integrate import build_circular_supply_chain_model, read_excel_data
+
+# ============================================================================
+# IN-PLACE PARAMETER UPDATES
+# ============================================================================
+# ModelUpdater changes parameters of a model built by
+# integrate.build_circular_supply_chain_model without rebuilding it: each
+# parameter is mapped (PARAMETERS) to the objective coefficients, matrix
+# coefficients, right-hand sides or bounds it touches, and only those are
+# changed before re-solving from the previous solution.
+#
+# The updater addresses variables and constraints by index, so the same
+# layout can drive independent copies of the model (see copy(); used by the
+# what-if server's model pool).
+#
+#   upd = ModelUpdater(build_circular_supply_chain_model(data))
+#   undo = upd.apply({'Penalty': 5000, 'alpha': {'F1': 0.8}, 'close': ['O2']})
+#   result = upd.solve()
+#   upd.restore(undo)
+#
+#   for value, result in upd.sweep('CAP_o', 'O1', [50000, 80000, 110000]):
+#       ...
+
+STATUS_NAMES = {getattr(GRB.Status, name): name for name in dir(GRB.Status) if name.isupper()}
+
+# Facility set -> binary variable group
+FACILITY_GROUPS = {'O': 'W_o', 'F': 'W_f', 'R': 'W_r'}
+
+# parameter -> (number of index positions, kind, target)
+#   'objective': target = variable groups whose cost / emission coefficients use it
+#   'rhs':       target = constraint family whose right-hand side it is
+#   'matrix':    target = constraint families whose coefficients it sets
+#   'bounds':    target = variable groups whose bounds it fixes
+PARAMETERS = {
+    'PC': (1, 'objective', ('X_pk',)),
+    'CC': (1, 'objective', ('Y_cok',)),
+    'FC': (1, 'objective', ('Y_ofk',)),
+    'RC': (1, 'objective', ('Y_ork',)),
+    'DC': (1, 'objective', ('Y_olk',)),
+    'T': (0, 'objective', tuple(TRANSPORT_GROUPS)),
+    'Penalty': (0, 'objective', ('S_ck',)),
+    'FixO': (1, 'objective', ('W_o',)),
+    'FixF': (1, 'objective', ('W_f',)),
+    'FixR': (1, 'objective', ('W_r',)),
+    'Rev_reuse': (1, 'objective', ('Y_ock',)),
+    'Rev_refurb': (1, 'objective', ('Y_fpk',)),
+    'Rev_recycle': (1, 'objective', ('Z_rsm',)),
+    'E_p': (1, 'objective', ('X_pk',)),
+    'E_o': (1, 'objective', ('Y_cok',)),
+    'E_f': (1, 'objective', ('Y_ofk',)),
+    'E_r': (1, 'objective', ('Y_ork',)),
+    'E_l': (1, 'objective', ('Y_olk',)),
+    'E_T': (0, 'objective', tuple(TRANSPORT_GROUPS)),
+    'DEM': (2, 'rhs', ('Demand',)),
+    'RET': (2, 'rhs', ('Returns',)),
+    'epsilon_limit': (0, 'rhs', ('Env_Limit',)),
+    'alpha': (1, 'matrix', ('Refurb_Yield',)),
+    'beta': (1, 'matrix', ('Recycle_Yield',)),
+    'gamma': (2, 'matrix', ('Recycle_Yield',)),
+    'Quality_Mix': (1, 'matrix', ('Reuse_Mix', 'Refurb_Mix')),
+    'CAP_o': (1, 'matrix', ('Cap_O',)),
+    'CAP_f': (1, 'matrix', ('Cap_F',)),
+    'CAP_r': (1, 'matrix', ('Cap_R',)),
+    'status': (1, 'bounds', tuple(FACILITY_GROUPS.values())),
+}
+PARAMETER_SHAPES = {name: spec[0] for name, spec in PARAMETERS.items()}
+
+
+def build_updater(workbook, distance_store=None, overrides=None, threads=None):
+    """
+    Read a workbook, build the model (build output suppressed) and wrap it
+    in a ModelUpdater. `overrides` replace entries of the data dictionary.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = read_excel_data(workbook, distance_store=distance_store)
+        data.update(overrides or {})
+        model = build_circular_supply_chain_model(data)
+    updater = ModelUpdater(model)
+    if threads is not None:
+        updater.m.setParam('Threads', int(threads))
+    return updater
+
+
+def flatten_keys(values, depth):
+    """
+    Turn nested JSON-style dicts ({'C1': {'Mono': 10}}) into {('C1', 'Mono'): 10}.
+    Tuple keys are passed through unchanged.
+    """
+    if depth <= 1:
+        return dict(values)
+    flat = {}
+    for key, value in values.items():
+        if isinstance(key, tuple):
+            flat[key] = value
+        else:
+            for sub, v in flatten_keys(value, depth - 1).items():
+                flat[(key,) + (sub if isinstance(sub, tuple) else (sub,))] = v
+    return flat
+
+
+class ModelUpdater:
+    """
+    Parameter updates and warm-started re-solves on a built model.
+    `model` is the dictionary returned by build_circular_supply_chain_model.
+    """
+
+    def __init__(self, model):
+        m = model['m']
+        m.update()
+        data = model['data']
+        self.sets = {s: list(data[s]) for s in ('P', 'C', 'O', 'F', 'R', 'L', 'S', 'K', 'M')}
+        self.params = {name: copy.deepcopy(data[name]) for name in PARAMETERS if name in data}
+        self.params['status'] = {}
+        self.evaluator = PlanEvaluator(data)
+        self.var_keys = {g: list(td.keys()) for g, td in model['vars'].items()}
+        self.var_index = {g: {k: v.index for k, v in td.items()} for g, td in model['vars'].items()}
+        self.constr_index = {fam: {k: c.index for k, c in d.items()} for fam, d in model['constrs'].items()}
+        self.cost_coef = expression_coefficients(model['Z_Cost'], m.NumVars)
+        self.env_coef = expression_coefficients(model['Env_Total'], m.NumVars)
+        self.cost_const = model['Z_Cost'].getConstant()
+        self.env_const = model['Env_Total'].getConstant() if hasattr(model['Env_Total'], 'getConstant') else 0.0
+        self.objective = 'env' if data['minimize_emissions_only'] else 'cost'
+        self.attach(m)
+
+    def attach(self, m):
+        """Point the updater at model `m` (the original or an exact copy)."""
+        self.m = m
+        self._vars = m.getVars()
+        self._constrs = m.getConstrs()
+        self.last_x = None
+
+    def copy(self, env=None):
+        """Independent updater on a copy of the model (in `env` if given)."""
+        other = copy.copy(self)
+        other.params = copy.deepcopy(self.params)
+        other.cost_coef = self.cost_coef.copy()
+        other.env_coef = self.env_coef.copy()
+        other.attach(self.m.copy(env) if env is not None else self.m.copy())
+        # A copy in another environment starts from that environment's parameters
+        other.m.setParam('Threads', self.m.Params.Threads)
+        other.last_x = self.last_x
+        return other
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def var(self, group, key):
+        return self._vars[self.var_index[group][key]]
+
+    def constr(self, family, key=()):
+        index = self.constr_index[family]
+        if key not in index:
+            raise KeyError(f"Model has no constraint {family}{list(key) if key != () else ''}")
+        return self._constrs[index[key]]
+
+    def facility_group(self, node):
+        for s, group in FACILITY_GROUPS.items():
+            if node in self.sets[s]:
+                return group
+        raise KeyError(f"'{node}' is not a collection, refurbishment or recycling center")
+
+    def get(self, name, key=()):
+        """Current value of a parameter."""
+        if name not in PARAMETERS:
+            raise KeyError(f"Unknown parameter '{name}' (known: {', '.join(PARAMETERS)})")
+        if PARAMETERS[name][0] == 0:
+            return self.params[name]
+        values = self.params[name]
+        key = key if PARAMETERS[name][0] > 1 else key[0]
+        if name == 'status':
+            return values.get(key)
+        if key not in values:
+            raise KeyError(f"Parameter {name} has no entry {key}")
+        return values[key]
+
+    # ------------------------------------------------------------------
+    # Objective coefficients
+    # ------------------------------------------------------------------
+    def group_coefficients(self, group):
+        """
+        Cost and emission coefficients of one variable group from the current
+        parameters (model variable order; see evaluate.PlanEvaluator).
+        """
+        return self.evaluator.group_coefficients(group, self.params)
+
+    def _refresh_objective(self, groups):
+        """Recompute the coefficients of `groups` and push the changed ones."""
+        for group in groups:
+            idx = np.fromiter(self.var_index[group].values(), dtype=np.int64, count=len(self.var_index[group]))
+            cost, env = self.group_coefficients(group)
+            changed_cost = np.flatnonzero(cost != self.cost_coef[idx])
+            changed_env = np.flatnonzero(env != self.env_coef[idx])
+            self.cost_coef[idx] = cost
+            self.env_coef[idx] = env
+
+            obj_changed = changed_cost if self.objective == 'cost' else changed_env
+            if len(obj_changed):
+                coef = self.cost_coef if self.objective == 'cost' else self.env_coef
+                self.m.setAttr('Obj', [self._vars[i] for i in idx[obj_changed]], coef[idx[obj_changed]].tolist())
+            if self.objective == 'cost' and len(changed_env) and self.constr_index['Env_Limit']:
+                row = self.constr('Env_Limit')
+                for i in idx[changed_env]:
+                    self.m.chgCoeff(row, self._vars[i], float(self.env_coef[i]))
+
+    # ------------------------------------------------------------------
+    # Matrix coefficients
+    # ------------------------------------------------------------------
+    def _refresh_matrix(self, name, key):
+        p, sets = self.params, self.sets
+        if name == 'alpha':
+            f = key[0]
+            for k in sets['K']:
+                row = self.constr('Refurb_Yield', (f, k))
+                for o in sets['O']:
+                    self.m.chgCoeff(row, self.var('Y_ofk', (o, f, k)), -p['alpha'][f])
+        elif name in ('beta', 'gamma'):
+            recyclers = [key[0]] if name == 'beta' else sets['R']
+            materials = sets['M'] if name == 'beta' else [key[1]]
+            products = sets['K'] if name == 'beta' else [key[0]]
+            for r in recyclers:
+                for mat in materials:
+                    row = self.constr('Recycle_Yield', (r, mat))
+                    for o in sets['O']:
+                        for k in products:
+                            self.m.chgCoeff(row, self.var('Y_ork', (o, r, k)), -(p['beta'][r] * p['gamma'][k, mat]))
+        elif name == 'Quality_Mix':
+            family = {'Reuse_Cap': 'Reuse_Mix', 'Refurb_Cap': 'Refurb_Mix'}[key[0]]
+            for o in sets['O']:
+                for k in sets['K']:
+                    row = self.constr(family, (o, k))
+                    for c in sets['C']:
+                        self.m.chgCoeff(row, self.var('Y_cok', (c, o, k)), -p['Quality_Mix'][key[0]])
+        else:
+            family, group = {'CAP_o': ('Cap_O', 'W_o'), 'CAP_f': ('Cap_F', 'W_f'), 'CAP_r': ('Cap_R', 'W_r')}[name]
+            node = key[0]
+            self.m.chgCoeff(self.constr(family, node), self.var(group, node), -p[name][node])
+
+    # ------------------------------------------------------------------
+    # Setting parameters
+    # ------------------------------------------------------------------
+    def _set_status(self, node, value):
+        """Force a facility open (True), closed (False) or free (None)."""
+        w = self.var(self.facility_group(node), node)
+        w.LB = 1.0 if value is True else 0.0
+        w.UB = 0.0 if value is False else 1.0
+        if value is None:
+            self.params['status'].pop(node, None)
+        else:
+            self.params['status'][node] = bool(value)
+
+    def set(self, name, key, value, refresh=True):
+        """
+        Set one parameter value in the model; `key` is () for scalars and a
+        tuple of index values otherwise. Returns the previous value.
+        With refresh=False objective coefficients are left for the caller to
+        refresh (see set_many).
+        """
+        old = self.get(name, key)
+        shape, kind, target = PARAMETERS[name]
+        if kind == 'bounds':
+            self._set_status(key[0], value)
+            return old
+
+        value = float(value)
+        if shape == 0:
+            self.params[name] = value
+        else:
+            self.params[name][key if shape > 1 else key[0]] = value
+
+        if kind == 'objective':
+            if refresh:
+                self._refresh_objective(target)
+        elif kind == 'rhs':
+            self.constr(target[0], key).RHS = value
+        else:
+            self._refresh_matrix(name, key)
+        return old
+
+    def set_many(self, changes, undo=None):
+        """
+        Set several (name, key, value) changes, refreshing each touched
+        variable group's objective coefficients once at the end. Previous
+        values are appended to `undo` as (name, key, old) as they are set.
+        """
+        undo = [] if undo is None else undo
+        stale = set()
+        try:
+            for name, key, value in changes:
+                undo.append((name, key, self.set(name, key, value, refresh=False)))
+                if PARAMETERS[name][1] == 'objective':
+                    stale.update(PARAMETERS[name][2])
+        finally:
+            self._refresh_objective(sorted(stale))
+        return undo
+
+    # ------------------------------------------------------------------
+    # Deltas
+    # ------------------------------------------------------------------
+    def normalize(self, deltas):
+        """
+        Expand a delta dictionary into [(name, key, value)].
+        Scalars are given directly, indexed parameters as (nested) dicts;
+        'open' / 'close' / 'free' take lists of facility codes.
+        """
+        changes = []
+        for name, value in deltas.items():
+            if name in ('open', 'close', 'free'):
+                state = {'open': True, 'close': False, 'free': None}[name]
+                changes += [('status', (node,), state) for node in value]
+            elif name not in PARAMETERS:
+                raise KeyError(f"Unknown parameter '{name}' (known: {', '.join(PARAMETERS)})")
+            elif PARAMETERS[name][0] == 0:
+                changes.append((name, (), value))
+            else:
+                for key, v in flatten_keys(value, PARAMETERS[name][0]).items():
+                    changes.append((name, key if isinstance(key, tuple) else (key,), v))
+        return changes
+
+    def apply(self, deltas):
+        """Apply a delta dictionary in place; returns an undo log for restore()."""
+        undo = []
+        try:
+            self.set_many(self.normalize(deltas), undo)
+        except Exception:
+            self.restore(undo)
+            raise
+        return undo
+
+    def restore(self, undo):
+        """Revert the changes recorded by apply()."""
+        self.set_many(list(reversed(undo)))
+
+    # ------------------------------------------------------------------
+    # Solving
+    # ------------------------------------------------------------------
+    def solve(self, warm_start=True, time_limit=None):
+        """
+        Re-optimize, starting from the previous solution when there is one
+        (MIP start; LPs keep their last basis). Returns a JSON-ready result.
+        """
+        m = self.m
+        if warm_start and self.last_x is not None and m.IsMIP:
+            m.setAttr('Start', self._vars, self.last_x)
+        if time_limit is not None:
+            m.setParam('TimeLimit', float(time_limit))
+        m.optimize()
+
+        result = {'status': STATUS_NAMES.get(m.Status, str(m.Status)), 'runtime_ms': m.Runtime * 1000.0}
+        if m.SolCount == 0:
+            return result
+        x = np.asarray(m.getAttr('X', self._vars))
+        self.last_x = x.tolist()
+        result['cost'] = float(self.cost_coef @ x + self.cost_const)
+        result['env'] = float(self.env_coef @ x + self.env_const)
+        if m.IsMIP:
+            result['mip_gap'] = m.MIPGap
+        result['open'] = {group: [node for node, i in self.var_index[group].items() if x[i] > 0.5]
+                          for group in FACILITY_GROUPS.values()}
+        shortage = {c: 0.0 for c in self.sets['C']}
+        for (c, k), i in self.var_index['S_ck'].items():
+            shortage[c] += float(x[i])
+        result['shortage'] = shortage
+        return result
+
+    def sweep(self, name, key, values, warm_start=True):
+        """
+        Re-solve for each value of one parameter, yielding (value, result).
+        Each step is an incremental update; the original value is restored
+        at the end.
+        """
+        key = key if isinstance(key, tuple) else (key,)
+        original = self.get(name, key)
+        try:
+            for value in values:
+                self.set(name, key, value)
+                yield value, self.solve(warm_start=warm_start)
+        finally:
+            self.set(name, key, original)
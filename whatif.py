@@ -0,0 +1,192 @@
+import contextlib
+import json
+import os
+import queue
+import socketserver
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from gurobipy import GRB, Env
+
+from updates import PARAMETERS, build_updater
+
+# ============================================================================
+# WHAT-IF SERVER
+# ============================================================================
+# Loads the dataset and builds the integrate.py model once, then answers
+# what-if questions over HTTP (TCP or a Unix socket). Each request's deltas
+# are applied in place to one model of a pool, re-optimized from the previous
+# solution, and reverted afterwards. Every pool model lives in its own Gurobi
+# environment, so requests run concurrently up to the pool size and queue
+# beyond it.
+#
+#   python whatif.py supply_chain_data.xlsx --port 8765 --workers 4
+#   curl -s localhost:8765/solve -d '{"deltas": {"Penalty": 5000, "close": ["O2"]}}'
+#   curl -s --unix-socket /tmp/whatif.sock http://x/solve -d '{"deltas": {"alpha": {"F1": 0.8}}}'
+#
+# Endpoints: GET /health, GET /parameters, POST /solve
+# {"deltas": {...}, "time_limit": seconds, "warm_start": true}
+
+DEFAULT_PORT = 8765
+QUEUE_TIMEOUT = 300.0       # seconds a request may wait for a free model
+
+
+def quiet_env():
+    """A started Gurobi environment with solver output switched off."""
+    env = Env(empty=True)
+    env.setParam('OutputFlag', 0)
+    env.start()
+    return env
+
+
+class ModelPool:
+    """
+    Fixed set of independent model copies handed out one request at a time.
+    """
+
+    def __init__(self, updater, size=1):
+        self.size = max(1, int(size))
+        self.threads = updater.m.Params.Threads
+        self._idle = queue.Queue()
+        self._envs = []
+        self._idle.put(updater)
+        for _ in range(self.size - 1):
+            env = quiet_env()
+            self._envs.append(env)
+            self._idle.put(updater.copy(env))
+
+    @classmethod
+    def from_workbook(cls, path, size=1, distance_store=None, threads=None):
+        """
+        Read the data and build the base model once (build output is suppressed).
+        Each copy solves with `threads` threads, by default an equal share of the cores.
+        """
+        size = max(1, int(size))
+        threads = threads or max(1, (os.cpu_count() or 1) // size)
+        updater = build_updater(path, distance_store, threads=threads)
+        updater.solve()
+        return cls(updater, size)
+
+    @property
+    def idle(self):
+        return self._idle.qsize()
+
+    @contextlib.contextmanager
+    def acquire(self, timeout=QUEUE_TIMEOUT):
+        try:
+            updater = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No model became free within {timeout:g}s")
+        try:
+            yield updater
+        finally:
+            self._idle.put(updater)
+
+    def solve(self, deltas=None, time_limit=None, warm_start=True):
+        """Apply `deltas`, re-optimize and revert; returns the result dictionary."""
+        start = time.perf_counter()
+        with self.acquire() as updater:
+            waited = time.perf_counter() - start
+            undo = updater.apply(deltas or {})
+            try:
+                result = updater.solve(warm_start=warm_start, time_limit=time_limit)
+            finally:
+                updater.restore(undo)
+                if time_limit is not None:
+                    updater.m.setParam('TimeLimit', GRB.INFINITY)
+        result['queue_ms'] = waited * 1000.0
+        result['total_ms'] = (time.perf_counter() - start) * 1000.0
+        return result
+
+
+class WhatIfHandler(BaseHTTPRequestHandler):
+    server_version = 'WhatIf/1.0'
+    pool = None
+
+    def address_string(self):
+        # Unix-socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def _send(self, code, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok', 'pool': self.pool.size, 'idle': self.pool.idle})
+        elif self.path == '/parameters':
+            params = {name: {'indices': shape, 'kind': kind, 'touches': list(target)}
+                      for name, (shape, kind, target) in PARAMETERS.items()}
+            self._send(200, {'parameters': params, 'facility_actions': ['open', 'close', 'free']})
+        else:
+            self._send(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/solve':
+            self._send(404, {'error': f'unknown path {self.path}'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            result = self.pool.solve(request.get('deltas'), request.get('time_limit'),
+                                     request.get('warm_start', True))
+        except (ValueError, KeyError, TypeError) as exc:
+            self._send(400, {'error': str(exc.args[0] if exc.args else exc)})
+        except TimeoutError as exc:
+            self._send(503, {'error': str(exc)})
+        else:
+            self._send(200, result)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(pool, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None):
+    handler = type('BoundWhatIfHandler', (WhatIfHandler,), {'pool': pool})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve what-if re-optimizations of the supply chain model.")
+    parser.add_argument('workbook', nargs='?', default='supply_chain_data.xlsx',
+                        help="workbook or dataset directory (see dataset.py)")
+    parser.add_argument('--distance-store', help="on-disk DistanceStore instead of the Distance_Matrix sheet")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', help="listen on this Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="model copies (concurrent solves)")
+    parser.add_argument('--threads', type=int, help="Gurobi threads per copy (default: cores / workers)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    pool = ModelPool.from_workbook(args.workbook, args.workers, args.distance_store, args.threads)
+    server = make_server(pool, args.host, args.port, args.socket)
+    where = args.socket or f"http://{args.host}:{args.port}"
+    print(f"✓ Model built in {time.perf_counter() - start:.1f}s, {pool.size} copies "
+          f"({pool.threads} threads each); listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())